@@ -0,0 +1,238 @@
+# function/analytics.py
+"""
+退货分析 - 跨分销商汇总一个期间的退货情况，直接读取对账结果缓存，不打开任何工作簿
+
+生成 汇总表\\{年}-{月}退货分析.xlsx，包含以下工作表：
+    退货排行      按编码汇总的退货数量 / 金额 / 涉及分销商数，按数量排序取前 N 名
+    类型占比      按产品类型（以及 普通 / 赠品 两大类）汇总的数量、金额与占全部退货的比例
+    赠品分摊      每个赠品编码出现的数量、计入退货的数量、被正常商品分摊吸收的数量与吸收比例
+    分销商        各分销商的退货数量、金额、编码数，以及占全部退货件数的比例（退货占比，不是退货率）
+
+数量、金额与对账表一致（退货为负数），排序与占比按件数（正数）计算。
+赠品分摊依赖结果缓存中的 gifts 字段，旧版本生成的缓存需重新对账后才有数据。
+
+汇总（run_summary）结束时自动生成（settings.reconciliation.analytics_top_n > 0 时），也可单独运行：
+    python -m function.analytics [--folder D:\\分销对账] [--period 2026-09] [--top 20]
+"""
+import os
+import sys
+import tempfile
+
+GIFT_TYPE = "赠品"
+DEFAULT_TOP_N = 20
+
+
+def frames_from_results(results):
+    """
+    结果缓存 → 两个 DataFrame
+
+    Returns:
+        (codes, gifts)：codes 每行为 分销商 × 结果行 × 编码（distributor, code, name, type, count, amount）；
+        gifts 每行为 分销商 × 赠品编码（distributor, code, seen）
+    """
+    import pandas as pd
+
+    columns = {"distributor": [], "code": [], "name": [], "type": [], "count": [], "price": []}
+    gift_columns = {"distributor": [], "code": [], "seen": []}
+    for result in results:
+        distributor = result["distributor"]
+        for row in result["rows"]:
+            price = row["price"] if isinstance(row["price"], (int, float)) else None
+            for code, count in row.get("codes", {}).items():
+                columns["distributor"].append(distributor)
+                columns["code"].append(code)
+                columns["name"].append(row["name"])
+                columns["type"].append(row.get("type") or "")
+                columns["count"].append(count)
+                columns["price"].append(price)
+        for code, seen in (result.get("gifts") or {}).items():
+            gift_columns["distributor"].append(distributor)
+            gift_columns["code"].append(code)
+            gift_columns["seen"].append(seen)
+
+    codes = pd.DataFrame(columns)
+    codes["price"] = codes["price"].astype(float)
+    # 与对账表的公式一致：数量 = -件数，金额 = 供货价 × 数量 - 售后处理费（售后处理费 = 数量 × 1）
+    codes["quantity"] = -codes["count"]
+    codes["amount"] = codes["price"] * codes["quantity"] - codes["quantity"]
+    return codes, pd.DataFrame(gift_columns)
+
+
+def top_skus(codes, top_n=DEFAULT_TOP_N):
+    """退货数量最多的编码"""
+    grouped = codes.groupby("code", sort=False).agg(
+        名称=("name", "first"),
+        产品类型=("type", "first"),
+        件数=("count", "sum"),
+        数量=("quantity", "sum"),
+        金额=("amount", "sum"),
+        分销商数=("distributor", "nunique"),
+    )
+    grouped = grouped.sort_values("件数", ascending=False, kind="stable").head(top_n)
+    return grouped.reset_index().rename(columns={"code": "编码"})
+
+
+def by_type(codes):
+    """按产品类型与 普通 / 赠品 大类汇总的退货占比"""
+    import pandas as pd
+
+    total = codes["count"].sum()
+    frames = []
+    for column, label in (("type", "产品类型"), ("category", "大类")):
+        data = codes.assign(category=codes["type"].eq(GIFT_TYPE).map({True: "赠品", False: "普通"}))
+        grouped = data.groupby(column, sort=False).agg(
+            件数=("count", "sum"), 数量=("quantity", "sum"), 金额=("amount", "sum"), 编码数=("code", "nunique")
+        )
+        grouped["件数占比"] = grouped["件数"] / total if total else 0.0
+        grouped = grouped.sort_values("件数", ascending=False, kind="stable").reset_index()
+        frames.append(grouped.rename(columns={column: "分类"}).assign(维度=label))
+    result = pd.concat(frames, ignore_index=True)
+    return result[["维度", "分类", "件数", "件数占比", "数量", "金额", "编码数"]]
+
+
+def gift_absorption(codes, gifts):
+    """
+    赠品分摊：出现数量、计入退货的数量、被吸收的数量
+
+    Returns:
+        (按赠品编码, 按分销商) 两个 DataFrame
+    """
+    import pandas as pd
+
+    if gifts.empty:
+        empty = pd.DataFrame(columns=["出现件数", "计入件数", "吸收件数", "吸收比例"])
+        return empty, empty
+
+    counted = (codes[codes["type"] == GIFT_TYPE]
+               .groupby(["distributor", "code"], sort=False)["count"].sum()
+               .rename("counted"))
+    merged = gifts.merge(counted, how="left", left_on=["distributor", "code"], right_index=True)
+    merged["counted"] = merged["counted"].fillna(0).astype("int64")
+    merged["absorbed"] = merged["seen"] - merged["counted"]
+
+    names = codes.drop_duplicates("code").set_index("code")["name"]
+
+    def summarize(key):
+        grouped = merged.groupby(key, sort=False)[["seen", "counted", "absorbed"]].sum()
+        grouped["吸收比例"] = grouped["absorbed"] / grouped["seen"].where(grouped["seen"] != 0)
+        grouped = grouped.rename(columns={"seen": "出现件数", "counted": "计入件数", "absorbed": "吸收件数"})
+        return grouped.sort_values("出现件数", ascending=False, kind="stable").reset_index()
+
+    by_code = summarize("code")
+    by_code.insert(1, "名称", by_code["code"].map(names).fillna(""))
+    by_code = by_code.rename(columns={"code": "编码"})
+    by_distributor = summarize("distributor").rename(columns={"distributor": "分销商"})
+    return by_code, by_distributor
+
+
+def by_distributor(codes):
+    """各分销商的退货汇总；退货占比 = 该分销商的退货件数 / 全部分销商的退货件数"""
+    total = codes["count"].sum()
+    grouped = codes.groupby("distributor", sort=False).agg(
+        件数=("count", "sum"), 数量=("quantity", "sum"), 金额=("amount", "sum"), 编码数=("code", "nunique")
+    )
+    grouped["退货占比"] = grouped["件数"] / total if total else 0.0
+    grouped = grouped.sort_values("件数", ascending=False, kind="stable").reset_index().rename(
+        columns={"distributor": "分销商"}
+    )
+    return grouped[["分销商", "件数", "退货占比", "数量", "金额", "编码数"]]
+
+
+def analyze(results, top_n=DEFAULT_TOP_N):
+    """
+    计算全部分析表
+
+    Returns:
+        {工作表名: DataFrame}，按写入顺序排列
+    """
+    codes, gifts = frames_from_results(results)
+    gift_codes, gift_distributors = gift_absorption(codes, gifts)
+    return {
+        "退货排行": top_skus(codes, top_n),
+        "类型占比": by_type(codes),
+        "赠品分摊": gift_codes,
+        "赠品分摊-分销商": gift_distributors,
+        "分销商": by_distributor(codes),
+    }
+
+
+def analytics_file(data_folder, period):
+    year, month = period.split("-")
+    return os.path.join(data_folder, "汇总表", f"{year}-{int(month)}月退货分析.xlsx")
+
+
+def write_analytics(tables, output_file):
+    """写入分析工作簿（每个表一个工作表，冻结表头、设置列宽）"""
+    import pandas as pd
+
+    folder = os.path.dirname(output_file)
+    os.makedirs(folder, exist_ok=True)
+    # 先写入同目录下唯一的临时文件再替换（ExcelWriter 按扩展名选择引擎，所以传入文件对象）
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(output_file) + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f, pd.ExcelWriter(f, engine="openpyxl") as writer:
+            for sheet_name, frame in tables.items():
+                frame.to_excel(writer, sheet_name=sheet_name, index=False)
+                ws = writer.sheets[sheet_name]
+                ws.freeze_panes = "A2"
+                for column_cells in ws.iter_cols(min_row=1, max_row=1):
+                    header = column_cells[0]
+                    ws.column_dimensions[header.column_letter].width = max(10, len(str(header.value)) * 2 + 4)
+                for column_name in ("件数占比", "退货占比", "吸收比例"):
+                    if column_name in frame.columns:
+                        col_idx = frame.columns.get_loc(column_name) + 1
+                        for row in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
+                            row[0].number_format = "0.0%"
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_file
+
+
+def run_analytics(data_folder=None, period=None, top_n=DEFAULT_TOP_N, log=print):
+    """
+    读取结果缓存并生成退货分析工作簿
+
+    Returns:
+        生成的文件路径；没有结果缓存时返回 None
+    """
+    import time
+    from function.result_store import load_results, current_period
+
+    if data_folder is None:
+        from function.reconciliation import DATA_FOLDER
+        data_folder = DATA_FOLDER
+    period = period or current_period()
+
+    started = time.perf_counter()
+    results = load_results(data_folder, period)
+    if not results:
+        log(f"⚠ 没有 {period} 的对账结果缓存，跳过退货分析")
+        return None
+
+    tables = analyze(results, top_n)
+    output_file = write_analytics(tables, analytics_file(data_folder, period))
+    missing_gifts = sum(1 for result in results if "gifts" not in result)
+    if missing_gifts:
+        log(f"⚠ {missing_gifts} 个文件的结果缓存没有赠品记录，赠品分摊不完整（重新对账后补齐）")
+    log(f"📊 退货分析：{len(results)} 个分销商，{time.perf_counter() - started:.2f} 秒 → {output_file}")
+    return output_file
+
+
+def main(argv=None):
+    import argparse
+    from function.reconciliation import DATA_FOLDER
+
+    parser = argparse.ArgumentParser(description="跨分销商退货分析")
+    parser.add_argument("--folder", default=DATA_FOLDER, help="数据文件夹")
+    parser.add_argument("--period", default=None, help="期间 YYYY-MM，默认上个月")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="退货排行的条数")
+    args = parser.parse_args(argv)
+
+    return 0 if run_analytics(args.folder, args.period, args.top) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
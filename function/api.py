@@ -0,0 +1,176 @@
+# function/api.py
+"""
+对账计算接口 - 纯内存计算，不读写文件、不打印
+
+供其他服务直接调用（例如订单处理服务手里已有 DataFrame）；界面与命令行的对账流程
+（reconciliation.process_file）只负责读取与写回工作簿，计算同样调用 reconcile（边读边逐块传入商家编码）。
+
+用法：
+    from function.api import build_mapping, reconcile
+
+    mapping = build_mapping(mapping_df)              # 编码表 DataFrame，可复用
+    result = reconcile(orders_df, mapping, "36号")   # 订单 DataFrame 或 商家编码序列
+    for row in result["rows"]:
+        print(row["name"], row["price"], row["count"])
+
+返回结构与对账结果缓存一致（见 result_store），另加 totals 合计。
+"""
+import math
+
+from function.reconciliation import MULTIPLE_CODE_REASON, count_codes
+
+CODE_COLUMN = "商家编码"
+
+
+def build_mapping(map_df):
+    """
+    由编码表 DataFrame 建立映射
+
+    Args:
+        map_df: 列为 货品商家编码 / 名称 / 产品类型 / 供货价 / 供货价（含税） / 含税分销商（可选）
+
+    Returns:
+        (tax_distributor_map, code_info)：含税分销商集合（字典）与编码表（CodeTable）
+    """
+    import pandas as pd
+    from function.mapping import CodeTable
+
+    tax_distributor_map = {}
+    if "含税分销商" in map_df.columns:
+        for tax_distributor in map_df["含税分销商"]:
+            if pd.notna(tax_distributor):
+                # 清理分销商名称，去掉空格
+                tax_distributor_map[str(tax_distributor).strip()] = True
+
+    return tax_distributor_map, CodeTable.from_dataframe(map_df)
+
+
+def uses_tax_price(distributor_code, tax_distributor_map):
+    """该分销商是否使用含税价格"""
+    return distributor_code in tax_distributor_map
+
+
+def _code_values(orders, code_column):
+    """取出非空的商家编码：支持 DataFrame（按列名）、Series、数组或任意可迭代对象"""
+    columns = getattr(orders, "columns", None)
+    if columns is not None:
+        matches = [col for col in columns if str(col).strip() == code_column]
+        if len(matches) > 1:
+            raise ValueError(MULTIPLE_CODE_REASON)
+        if not matches:
+            raise KeyError(f"未找到'{code_column}'列")
+        orders = orders[matches[0]]
+
+    if hasattr(orders, "dropna"):
+        return orders.dropna()
+    return [value for value in orders
+            if value is not None and not (isinstance(value, float) and math.isnan(value))]
+
+
+def count_order_codes(codes, code_info, version=None, code_counter=None, unmatched_codes=None, gift_counter=None):
+    """
+    统计商家编码（含组合拆分与赠品分摊）
+
+    Args:
+        codes: 非空的商家编码序列
+        version: 编码表版本，传入时使用跨文件的解析缓存
+        code_counter / unmatched_codes: 累加目标，不传时新建（分块统计时传入同一对象）
+        gift_counter: 累加出现的赠品数量（含被分摊吸收的部分），为 None 时不统计
+
+    Returns:
+        (code_counter, unmatched_codes)
+    """
+    if code_counter is None:
+        code_counter = code_info.new_counter()
+    if unmatched_codes is None:
+        unmatched_codes = set()
+    count_codes(codes, code_info, code_counter, unmatched_codes, version, gift_counter)
+    return code_counter, unmatched_codes
+
+
+def summarize(code_counter, code_info, use_tax_price):
+    """
+    按【名称】汇总编码统计并选择价格
+
+    Returns:
+        (final, missing_price_names)：final 为 {名称: {"数量", "供货价", "类型", "编码": {编码: 数量}}}，
+        按编码首次出现的顺序排列；缺失（或为 0）供货价的名称集合
+    """
+    final = {}
+    missing_price_names = set()
+    for code_id, qty in code_counter.items():
+        name = code_info.name(code_id)
+
+        # 根据是否使用含税价格选择价格（含税价缺失时使用标准价）
+        price = code_info.price(code_id, use_tax_price)
+        missing = math.isnan(price)
+
+        # 供货价缺失判断
+        if missing or price == 0:
+            missing_price_names.add(name)
+
+        entry = final.get(name)
+        if entry is None:
+            entry = final[name] = {
+                "数量": 0,
+                "供货价": "" if missing else price,
+                "类型": code_info.type(code_id),
+                "编码": {}
+            }
+
+        entry["数量"] += qty
+        entry["编码"][code_info.codes[code_id]] = qty
+
+    return final, missing_price_names
+
+
+def totals(result):
+    """结果合计：数量、售后处理费、金额（缺失供货价的行不计入金额）"""
+    from function.result_store import sheet_values
+
+    quantity = fee = amount = 0
+    for row in result["rows"]:
+        _, row_qty, row_fee, row_amount = sheet_values(row)
+        quantity += row_qty
+        fee += row_fee
+        if row_amount is not None:
+            amount += row_amount
+    return {"quantity": quantity, "fee": fee, "amount": amount}
+
+
+def reconcile(orders, mapping, distributor_code, code_column=CODE_COLUMN, file_name=None, period=None,
+              version=None, chunked=False):
+    """
+    对一个分销商的订单数据完成对账计算
+
+    Args:
+        orders: 订单 DataFrame（含 商家编码 列），或商家编码的 Series / 数组 / 列表；
+                chunked 为 True 时为逐块产生非空商家编码的可迭代对象（流式读取时边读边统计）
+        mapping: build_mapping 的返回值，或编码表 DataFrame
+        distributor_code: 分销商编号，例如 "36号"，决定是否使用含税价格
+        file_name: 写入结果的文件名，默认为分销商编号
+        period: 对账期间 YYYY-MM，默认上个月
+        version: 编码表版本，传入时使用跨调用的解析缓存
+
+    Returns:
+        结果字典（结构见 result_store，含 gifts），另含 totals；商家编码列重复时抛出 ValueError
+    """
+    from function.result_store import build_result
+
+    if hasattr(mapping, "columns"):
+        mapping = build_mapping(mapping)
+    tax_distributor_map, code_info = mapping
+
+    use_tax_price = uses_tax_price(distributor_code, tax_distributor_map)
+    code_counter, gift_counter, unmatched_codes = code_info.new_counter(), code_info.new_counter(), set()
+    for codes in orders if chunked else [_code_values(orders, code_column)]:
+        count_order_codes(codes, code_info, version, code_counter, unmatched_codes, gift_counter)
+    final, missing_price_names = summarize(code_counter, code_info, use_tax_price)
+
+    result = build_result(
+        file_name or distributor_code, distributor_code, use_tax_price, final, unmatched_codes,
+        missing_price_names, period
+    )
+    result["gifts"] = {code_info.codes[code_id]: qty for code_id, qty in gift_counter.items()}
+    result["totals"] = totals(result)
+    return result
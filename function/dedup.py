@@ -0,0 +1,240 @@
+# function/dedup.py
+"""
+重复订单 / 重复导出检测 - 跨文件、跨期间的磁盘索引
+
+索引保存在 数据文件夹\\.对账缓存\\dedup.sqlite3，随每次对账增量更新：
+    sources   (id, file, period)               一个来源 = 某期间的某个对账文件（期间只用于显示）
+    orders    (order_key, source_id)           订单号的 64 位哈希 → 首次出现的来源
+    files     (fingerprint, source_id)         文件内容指纹（按行的 单号 + 商家编码）→ 来源
+
+订单号以 64 位整数作为主键存放（INTEGER PRIMARY KEY 即行号，无额外索引），
+数百万条历史订单只占几十 MB，每批最多 500 个订单号一次查询，单个文件的检查在毫秒级完成。
+
+来源按文件名识别：同一文件重新对账（无论在哪个期间运行）不算重复，订单号已属于其他文件时视为重复订单，
+内容指纹与其他文件相同时视为重复导出（同一份文件换了名字或重复发送）。
+
+处理文件期间只读索引，新来源、订单号与内容指纹在 finish 时一次短事务写入，
+多个进程共用同一索引时不会长时间占用写锁。
+
+配置（settings.reconciliation）：
+    dedup_mode         off：不检测；report：检测并写入运行报告；exclude：检测并从统计中剔除重复订单
+    order_id_columns   依次尝试的订单号列名
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+
+from function.result_store import cache_folder
+
+INDEX_FILE_NAME = "dedup.sqlite3"
+QUERY_BATCH = 500       # 每次 IN 查询的订单号个数（低于 SQLite 的参数上限）
+BUSY_TIMEOUT = 30       # 其他进程正在写入时等待的最长时间（秒）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    period TEXT NOT NULL,
+    UNIQUE (file, period)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_key INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    fingerprint TEXT PRIMARY KEY,
+    source_id INTEGER NOT NULL
+);
+"""
+
+
+def normalize_order_id(value):
+    """统一订单号格式：去空白；整数值的浮点数（pandas 读取的 123.0）按整数处理。空值返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def order_key(order_id):
+    """订单号的 64 位有符号哈希，作为索引主键"""
+    digest = hashlib.blake2b(order_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def find_order_column(header_values, candidates):
+    """在表头中查找订单号列，返回列号（从 1 开始）与表头中的原始列名；找不到时返回 (None, None)"""
+    for candidate in candidates:
+        for col_idx, value in enumerate(header_values, 1):
+            if value is not None and str(value).strip() == candidate:
+                return col_idx, value
+    return None, None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def open_index(data_folder):
+    """按数据文件夹共享的索引实例（进程内复用同一个连接）"""
+    key = os.path.abspath(data_folder)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = DedupIndex(data_folder)
+        return _indexes[key]
+
+
+class DedupIndex:
+    """重复订单 / 重复导出索引"""
+
+    def __init__(self, data_folder):
+        folder = cache_folder(data_folder)
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, INDEX_FILE_NAME)
+        self._conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        # 索引通常放在共享文件夹中：WAL 依赖共享内存，不能跨电脑使用，这里用默认的回滚日志，
+        # 写锁冲突时按 timeout 等待（显式设置，以便把旧版本建成 WAL 的索引切换回来）
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._source_names = {}
+
+    def close(self):
+        self._conn.close()
+
+    def source_ids(self, file_name):
+        """同一文件（任何期间）的全部来源，只读查询"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM sources WHERE file = ?", (file_name,)).fetchall()
+        return {row[0] for row in rows}
+
+    def _add_source(self, file_name, period):
+        """在调用方的事务中新建来源（已存在时直接返回），返回来源 id"""
+        self._conn.execute("INSERT OR IGNORE INTO sources (file, period) VALUES (?, ?)", (file_name, period))
+        return self._conn.execute(
+            "SELECT id FROM sources WHERE file = ? AND period = ?", (file_name, period)
+        ).fetchone()[0]
+
+    def source_name(self, source_id):
+        """来源的显示名：文件名（期间）"""
+        if source_id not in self._source_names:
+            row = self._conn.execute("SELECT file, period FROM sources WHERE id = ?", (source_id,)).fetchone()
+            self._source_names[source_id] = f"{row[0]}（{row[1]}）" if row else str(source_id)
+        return self._source_names[source_id]
+
+    def owners(self, keys):
+        """查询订单号哈希的所属来源：{order_key: source_id}"""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            for start in range(0, len(keys), QUERY_BATCH):
+                batch = keys[start:start + QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT order_key, source_id FROM orders WHERE order_key IN ({placeholders})", batch
+                ).fetchall())
+        return found
+
+    def begin_file(self, file_name, period):
+        return DedupSession(self, file_name, period)
+
+
+class DedupSession:
+    """单个文件的检测过程：逐块检查订单号（只读），结束时写入索引"""
+
+    def __init__(self, index, file_name, period):
+        self.index = index
+        self.file_name = file_name
+        self.period = period
+        self._own_sources = index.source_ids(file_name)    # 同一文件以前的来源，其中的订单号不算重复
+        self._hasher = hashlib.blake2b(digest_size=16)
+        self._new_keys = set()
+        self.rows = 0
+        self.duplicate_rows = 0
+        self.duplicate_orders = set()
+        self.duplicate_of = {}      # {来源显示名: 重复订单数}
+
+    def check(self, order_ids, codes):
+        """
+        检查一块数据（订单号与商家编码逐行对应），同时累计内容指纹
+
+        Returns:
+            与输入等长的布尔列表，True 表示该行的订单号已属于其他文件（重复）
+        """
+        hasher = self._hasher
+        keys = []
+        for order_id, code in zip(order_ids, codes):
+            order_id = normalize_order_id(order_id)
+            hasher.update(f"{order_id or ''}\x1f{normalize_order_id(code)}\x1e".encode("utf-8"))
+            keys.append(order_key(order_id) if order_id is not None else None)
+        self.rows += len(keys)
+
+        lookup = {key for key in keys if key is not None and key not in self._new_keys}
+        owners = self.index.owners(lookup) if lookup else {}
+
+        flags = []
+        for order_id, key in zip(order_ids, keys):
+            if key is None:
+                flags.append(False)
+                continue
+            if key in self._new_keys:
+                flags.append(False)
+                continue
+            owner = owners.get(key)
+            if owner is None:
+                self._new_keys.add(key)
+            duplicate = owner is not None and owner not in self._own_sources
+            if duplicate:
+                self.duplicate_rows += 1
+                normalized = normalize_order_id(order_id)
+                if normalized not in self.duplicate_orders:
+                    self.duplicate_orders.add(normalized)
+                    name = self.index.source_name(owner)
+                    self.duplicate_of[name] = self.duplicate_of.get(name, 0) + 1
+            flags.append(duplicate)
+        return flags
+
+    def add_codes(self, codes):
+        """没有订单号列时，只把商家编码计入内容指纹"""
+        hasher = self._hasher
+        for code in codes:
+            hasher.update(f"\x1f{normalize_order_id(code)}\x1e".encode("utf-8"))
+        self.rows += len(codes)
+
+    def finish(self):
+        """
+        写入新订单号与内容指纹
+
+        Returns:
+            检测结果 {"rows", "duplicate_rows", "duplicate_orders", "duplicate_of", "duplicate_file"}
+        """
+        fingerprint = self._hasher.hexdigest()
+        index = self.index
+        conn = index._conn
+        with index._lock, conn:
+            source_id = index._add_source(self.file_name, self.period)
+            own_sources = self._own_sources | {source_id}
+            row = conn.execute("SELECT source_id FROM files WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            duplicate_file = row[0] if row and row[0] not in own_sources else None
+            conn.execute("DELETE FROM files WHERE source_id = ?", (source_id,))
+            conn.execute("INSERT OR IGNORE INTO files (fingerprint, source_id) VALUES (?, ?)",
+                         (fingerprint, source_id))
+            conn.executemany(
+                "INSERT OR IGNORE INTO orders (order_key, source_id) VALUES (?, ?)",
+                ((key, source_id) for key in self._new_keys)
+            )
+
+        return {
+            "rows": self.rows,
+            "duplicate_rows": self.duplicate_rows,
+            "duplicate_orders": len(self.duplicate_orders),
+            "duplicate_of": self.duplicate_of,
+            "duplicate_file": self.index.source_name(duplicate_file) if duplicate_file else None,
+        }
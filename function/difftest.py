@@ -0,0 +1,405 @@
+# function/difftest.py
+"""
+差分测试 - 随机生成编码表与商家编码列，比较当前实现与参考实现（function/reference.py）的结果
+
+比较内容：
+    code_counter      编码 → 数量（含顺序，决定写入对账表的行顺序）
+    unmatched_codes   未匹配编码
+    结果行            名称、供货价、数量（含顺序）与缺失供货价的名称
+    合计              数量、售后处理费、金额（api.totals）
+
+当前实现按三种方式各跑一遍：随机分块累加（同流式模式）、使用解析缓存（连续两次，第二次全部命中缓存）、
+api.reconcile 直接传入订单 DataFrame（含空值）。
+加 --files 时，另把商家编码列写成订单文件，按对账的两种读取方式（流式逐行读取 / pandas 读取）各统计一遍，
+两种读取方式得到的单元格类型不同（如含空行的数字列，pandas 读成 1001.0，流式读取为 1001），结果必须一致。
+
+生成的数据覆盖各种边界情况：整单都是赠品、赠品数量超过正常商品、「*数量」（含 *0、多位数）、
+未匹配编码、空项与多余的分号、数字编码（单元格为整数 / 浮点数）、编码表中重复的编码、
+多个编码共用一个名称、供货价缺失或为 0、含税价缺失。
+
+发现差异时会逐步删减数据，输出能复现差异的最小商家编码列。
+
+命令行用法：
+    python -m function.difftest [--cases 500] [--seed 1] [--rows 60] [--files]
+    python -m function.difftest --folder D:\\分销对账        # 用实际对账文件比较
+有差异时退出码为 1。
+"""
+import sys
+import math
+import random
+
+import pandas as pd
+
+from function import api, reference
+
+CODE_COLUMN = "商家编码"
+TYPES = ["成品", "成品", "配件", "赠品"]
+NOISE_ITEMS = ["", " ", "*", "*3", "**2", " *1"]
+
+
+# ===============================
+# 数据生成
+# ===============================
+def random_mapping(rng):
+    """随机编码表 DataFrame 与其中的编码列表"""
+    count = rng.randint(3, 25)
+    names = [f"货品{i}" for i in range(max(count // 2, 1))]
+    codes = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.15:
+            codes.append(str(1000 + i))         # 数字编码，订单中可能读成整数
+        elif kind < 0.2:
+            codes.append(f"K*X{i}")             # 编码中带 *（不是数量）
+        else:
+            codes.append(f"{rng.choice(['A', 'G', 'SKU-'])}{i:02d}")
+
+    rows = []
+    for code in codes:
+        rows.append(_mapping_row(rng, code, names))
+    # 重复的编码：以后出现的为准
+    for code in rng.sample(codes, k=min(2, len(codes)) if rng.random() < 0.3 else 0):
+        rows.append(_mapping_row(rng, code, names))
+
+    return pd.DataFrame(rows, columns=["货品商家编码", "名称", "产品类型", "供货价", "供货价（含税）"]), codes
+
+
+def _mapping_row(rng, code, names):
+    price = rng.choice([round(rng.uniform(1, 200), 2)] * 4 + [0.0, math.nan])
+    tax_price = round(rng.uniform(1, 200), 2) if rng.random() < 0.5 else math.nan
+    return [code, rng.choice(names), rng.choice(TYPES), price, tax_price]
+
+
+def random_cells(rng, map_df, codes, rows):
+    """随机商家编码列（含空值）"""
+    types = dict(zip(map_df["货品商家编码"], map_df["产品类型"]))
+    gifts = [code for code in codes if types[code] == "赠品"] or codes
+    normals = [code for code in codes if types[code] != "赠品"] or codes
+
+    def item(code):
+        roll = rng.random()
+        if roll < 0.5:
+            return code
+        if roll < 0.9:
+            return f"{code}*{rng.randint(1, 5)}"
+        return f"{code}*{rng.choice([0, 12, 100])}"
+
+    cells = []
+    for _ in range(rows):
+        profile = rng.random()
+        if profile < 0.05:
+            cells.append(None)
+            continue
+        if profile < 0.2:          # 整单都是赠品
+            items = [item(rng.choice(gifts)) for _ in range(rng.randint(1, 3))]
+        elif profile < 0.35:       # 赠品多于正常商品
+            items = [item(rng.choice(normals))] + [f"{rng.choice(gifts)}*{rng.randint(2, 6)}"
+                                                   for _ in range(rng.randint(1, 3))]
+        elif profile < 0.45:       # 未匹配编码
+            items = [item(rng.choice(codes)), item(f"未知{rng.randint(1, 5)}")]
+        elif profile < 0.5:        # 数字单元格
+            numeric = [code for code in codes if code.isdigit()]
+            if numeric:
+                value = int(rng.choice(numeric))
+                cells.append(value if rng.random() < 0.7 else float(value))
+                continue
+            items = [item(rng.choice(codes))]
+        else:
+            items = [item(rng.choice(codes)) for _ in range(rng.randint(1, 4))]
+
+        if rng.random() < 0.15:
+            items.insert(rng.randint(0, len(items)), rng.choice(NOISE_ITEMS))
+        rng.shuffle(items)
+        separator = rng.choice([";", ";", "; "])
+        cells.append(separator.join(items) + (";" if rng.random() < 0.05 else ""))
+    return cells
+
+
+# ===============================
+# 两种实现
+# ===============================
+def _outcome(counter_items, unmatched, final, missing, use_tax_price):
+    from function.result_store import build_result
+
+    result = build_result("差分测试", "差分测试", use_tax_price, final, unmatched, missing)
+    return {
+        "code_counter": list(counter_items),
+        "unmatched_codes": sorted(unmatched),
+        "rows": [(row["name"], row["price"], row["count"]) for row in result["rows"]],
+        "missing_price": result["missing_price"],
+        "totals": api.totals(result),
+    }
+
+
+def reference_cells(cells):
+    """
+    参考实现的输入：整数值的浮点数先转成整数
+
+    这是当前实现与最初版本之间唯一一处有意的差异（见 reconciliation.code_text）：含空行的纯数字商家编码列
+    经 pandas 读取为 1001.0，最初版本按 "1001.0" 处理、报未匹配，流式读取却得到 1001。
+    参考实现保持原样不改，差异只在这里的输入端体现，其余解析规则仍由参考实现独立给出。
+    """
+    return [int(cell) if isinstance(cell, float) and cell.is_integer() else cell for cell in cells]
+
+
+def run_reference(map_df, cells, use_tax_price):
+    code_info = reference.build_code_info(map_df)
+    cells = pd.Series(reference_cells(cells), dtype=object).dropna()
+    code_counter, unmatched = reference.count_codes(cells, code_info)
+    final, missing = reference.summarize(code_counter, code_info, use_tax_price)
+    return _outcome(code_counter.items(), unmatched, final, missing, use_tax_price)
+
+
+def run_current(map_df, cells, use_tax_price, variant, rng=None, version=None):
+    """
+    当前实现
+
+    Args:
+        variant: "chunks" 随机分块累加；"cached" 使用解析缓存；"reconcile" 调用 api.reconcile
+        version: 解析缓存的编码表版本（仅 "cached" 使用），同一编码表的用例共用
+    """
+    mapping = api.build_mapping(map_df)
+    tax_distributor_map, code_info = mapping
+
+    if variant == "reconcile":
+        distributor = "含税" if use_tax_price else "标准"
+        mapping = ({"含税": True}, code_info)
+        result = api.reconcile(pd.DataFrame({CODE_COLUMN: cells}, dtype=object), mapping, distributor)
+        final = {row["name"]: {"数量": row["count"], "供货价": row["price"]} for row in result["rows"]}
+        # reconcile 不返回编码计数，由结果行中的编码还原
+        counter_items = [(code, qty) for row in result["rows"] for code, qty in row["codes"].items()]
+        outcome = _outcome(counter_items, set(result["unmatched"]), final, set(result["missing_price"]),
+                           use_tax_price)
+        outcome["code_counter"] = _reference_order(outcome["code_counter"], map_df, cells, use_tax_price)
+        return outcome
+
+    values = [cell for cell in cells if cell is not None]
+    code_counter, unmatched = code_info.new_counter(), set()
+    if variant == "cached":
+        for _ in range(2):
+            code_counter, unmatched = api.count_order_codes(values, code_info, version)
+    else:
+        start = 0
+        while start < len(values):
+            size = rng.randint(1, 16)
+            api.count_order_codes(values[start:start + size], code_info, None, code_counter, unmatched)
+            start += size
+
+    final, missing = api.summarize(code_counter, code_info, use_tax_price)
+    counter_items = [(code_info.codes[code_id], qty) for code_id, qty in code_counter.items()]
+    return _outcome(counter_items, unmatched, final, missing, use_tax_price)
+
+
+def _reference_order(items, map_df, cells, use_tax_price):
+    """结果行按名称分组，编码计数的原始顺序无法还原：按参考实现的顺序排列后比较内容"""
+    order = {code: i for i, (code, _) in enumerate(run_reference(map_df, cells, use_tax_price)["code_counter"])}
+    return sorted(items, key=lambda item: order.get(item[0], len(order)))
+
+
+def write_orders(cells, file_path):
+    """把商家编码列写成订单文件（Sheet1，空值为空单元格）"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    ws.append([CODE_COLUMN])
+    for cell in cells:
+        ws.append([cell])
+    wb.save(file_path)
+
+
+def run_file(map_df, file_path, use_tax_price, variant, rng=None):
+    """
+    按对账的读取方式统计订单文件
+
+    Args:
+        variant: "stream" 只读工作簿逐行读取、随机大小分块（iter_code_chunks）；"pandas" pd.read_excel 后去除空值
+    """
+    from function.reconciliation import iter_code_chunks
+
+    _, code_info = api.build_mapping(map_df)
+    code_counter, unmatched = code_info.new_counter(), set()
+
+    if variant == "stream":
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True)
+        for chunk in iter_code_chunks(wb["Sheet1"], 1, rng.randint(1, 16), 1):
+            api.count_order_codes(chunk, code_info, None, code_counter, unmatched)
+        wb.close()
+    else:
+        codes = pd.read_excel(file_path, sheet_name="Sheet1")[CODE_COLUMN].dropna()
+        api.count_order_codes(codes, code_info, None, code_counter, unmatched)
+
+    final, missing = api.summarize(code_counter, code_info, use_tax_price)
+    counter_items = [(code_info.codes[code_id], qty) for code_id, qty in code_counter.items()]
+    return _outcome(counter_items, unmatched, final, missing, use_tax_price)
+
+
+VARIANTS = ["chunks", "cached", "reconcile"]
+FILE_VARIANTS = ["stream", "pandas"]
+
+
+def compare(map_df, cells, use_tax_price, seed=0, files=False):
+    """
+    比较参考实现与当前实现的所有变体
+
+    Args:
+        files: 同时比较写成订单文件后两种读取方式的结果（较慢）
+
+    Returns:
+        差异列表 [(变体, 字段, 参考值, 当前值), ...]
+    """
+    expected = run_reference(map_df, cells, use_tax_price)
+    actuals = [(variant, run_current(map_df, cells, use_tax_price, variant, random.Random(seed),
+                                     f"difftest:{seed}"))
+               for variant in VARIANTS]
+
+    if files:
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "差分测试.xlsx")
+            write_orders(cells, file_path)
+            actuals += [(variant, run_file(map_df, file_path, use_tax_price, variant, random.Random(seed)))
+                        for variant in FILE_VARIANTS]
+
+    differences = []
+    for variant, actual in actuals:
+        for key, value in expected.items():
+            if actual[key] != value:
+                differences.append((variant, key, value, actual[key]))
+    return differences
+
+
+def shrink(map_df, cells, use_tax_price, seed=0, files=False):
+    """逐步删减单元格与单元格中的编码，保留仍有差异的最小商家编码列"""
+    def failing(candidate):
+        return bool(compare(map_df, candidate, use_tax_price, seed, files))
+
+    cells = list(cells)
+    i = 0
+    while i < len(cells):
+        candidate = cells[:i] + cells[i + 1:]
+        if failing(candidate):
+            cells = candidate
+        else:
+            i += 1
+
+    for i, cell in enumerate(cells):
+        if not isinstance(cell, str):
+            continue
+        items = cell.split(";")
+        j = 0
+        while len(items) > 1 and j < len(items):
+            candidate_items = items[:j] + items[j + 1:]
+            candidate = cells[:i] + [";".join(candidate_items)] + cells[i + 1:]
+            if failing(candidate):
+                items = candidate_items
+                cells = candidate
+            else:
+                j += 1
+    return cells
+
+
+def run(cases=500, seed=1, rows=60, files=False):
+    """
+    运行随机差分测试（files 见 compare）
+
+    Returns:
+        第一个差异 {"case", "seed", "mapping", "cells", "use_tax_price", "differences"}；全部一致时返回 None
+    """
+    for case in range(cases):
+        case_seed = seed * 1_000_003 + case
+        rng = random.Random(case_seed)
+        map_df, codes = random_mapping(rng)
+        cells = random_cells(rng, map_df, codes, rng.randint(1, rows))
+        use_tax_price = rng.random() < 0.5
+
+        if compare(map_df, cells, use_tax_price, case_seed, files):
+            cells = shrink(map_df, cells, use_tax_price, case_seed, files)
+            return {
+                "case": case,
+                "seed": case_seed,
+                "mapping": map_df,
+                "cells": cells,
+                "use_tax_price": use_tax_price,
+                "differences": compare(map_df, cells, use_tax_price, case_seed, files),
+            }
+    return None
+
+
+def run_folder(data_folder, mapping_file=None):
+    """用数据文件夹中的实际对账文件比较，返回有差异的文件 {文件名: 差异列表}"""
+    import os
+    from function.reconciliation import list_excel_files, parse_distributor_code, MAPPING_FOLDER
+
+    if mapping_file is None:
+        mapping_file = os.path.join(data_folder, "编码表", "编码.xlsx")
+        if not os.path.exists(mapping_file):
+            mapping_file = os.path.join(MAPPING_FOLDER, "编码.xlsx")
+    map_df = pd.read_excel(mapping_file)
+    tax_distributor_map, _ = api.build_mapping(map_df)
+
+    failures = {}
+    for file_path in list_excel_files(data_folder):
+        file_name = os.path.basename(file_path)
+        df = pd.read_excel(file_path, sheet_name="Sheet1")
+        columns = [col for col in df.columns if str(col).strip() == CODE_COLUMN]
+        if len(columns) != 1:
+            print(f"跳过 {file_name}：商家编码列数为 {len(columns)}")
+            continue
+        distributor_code = parse_distributor_code(os.path.splitext(file_name)[0])
+        use_tax_price = api.uses_tax_price(distributor_code, tax_distributor_map)
+        cells = [None if pd.isna(cell) else cell for cell in df[columns[0]]]
+
+        differences = compare(map_df, cells, use_tax_price)
+        print(f"{'❌' if differences else '✅'} {file_name}：{len(cells)} 行")
+        if differences:
+            failures[file_name] = differences
+    return failures
+
+
+def _print_differences(differences):
+    for variant, key, expected, actual in differences:
+        print(f"  [{variant}] {key}")
+        print(f"    参考实现：{expected}")
+        print(f"    当前实现：{actual}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="当前实现与参考实现的差分测试")
+    parser.add_argument("--cases", type=int, default=500, help="随机用例数")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--rows", type=int, default=60, help="每个用例最多的行数")
+    parser.add_argument("--files", action="store_true", help="同时写成订单文件，比较流式与 pandas 两种读取方式")
+    parser.add_argument("--folder", help="改为使用该数据文件夹中的实际对账文件比较")
+    args = parser.parse_args(argv)
+
+    if args.folder:
+        failures = run_folder(args.folder)
+        for file_name, differences in failures.items():
+            print(f"❌ {file_name}")
+            _print_differences(differences)
+        return 1 if failures else 0
+
+    failure = run(args.cases, args.seed, args.rows, args.files)
+    if failure is None:
+        print(f"✅ {args.cases} 个随机用例全部一致（种子 {args.seed}）")
+        return 0
+
+    print(f"❌ 第 {failure['case']} 个用例出现差异（用例种子 {failure['seed']}，"
+          f"{'含税价' if failure['use_tax_price'] else '标准价'}）")
+    map_df, cells = failure["mapping"], failure["cells"]
+    used = map_df["货品商家编码"].map(lambda code: any(code in str(cell) for cell in cells))
+    print("编码表（仅列出用到的编码）：")
+    print(map_df[used].to_string(index=False))
+    print(f"最小商家编码列：{failure['cells']}")
+    _print_differences(failure["differences"])
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
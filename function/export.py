@@ -0,0 +1,198 @@
+# function/export.py
+"""
+结果导出 - 把对账 / 汇总结果按列写成 Parquet 与 CSV，供 BI 等下游工具直接读取
+
+每行是一个分销商的一个商品，列为：
+    period, distributor, distributor_code, name, type, price, quantity, fee, amount
+数值的换算与表格中的公式一致（见 result_store.sheet_values），不含合并单元格与公式。
+
+导出文件位于 数据文件夹\\导出\\ 下：
+    对账结果-<期间>.parquet / .csv    来自对账结果缓存（result_store）
+    售后汇总-<期间>.parquet / .csv    来自汇总时读取的各对账文件结果区
+
+Parquet 与列式 CSV 写入依赖 pyarrow（可选）；未安装时 Parquet 跳过，CSV 改用 csv 模块逐行写入。
+
+配置（settings.reconciliation.export_formats）：例如 ["parquet", "csv"]，为空时不自动导出。
+命令行用法：
+    python -m function.export [--folder D:\\分销对账] [--period 2026-09] [--format parquet csv]
+"""
+import os
+import sys
+import tempfile
+
+EXPORT_FOLDER_NAME = "导出"
+COLUMNS = ["period", "distributor", "distributor_code", "name", "type", "price", "quantity", "fee", "amount"]
+SUPPORTED_FORMATS = ("parquet", "csv")
+
+
+def export_folder(data_folder):
+    return os.path.join(data_folder, EXPORT_FOLDER_NAME)
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def columns_from_results(results):
+    """从结果缓存（load_results 的返回值）构建按列存放的数据"""
+    from function.reconciliation import parse_distributor_code
+    from function.result_store import sheet_values
+
+    columns = {name: [] for name in COLUMNS}
+    for result in results:
+        distributor = result["distributor"]
+        distributor_code = result.get("distributor_code") or parse_distributor_code(distributor)
+        for row in result["rows"]:
+            price, qty, fee, amount = sheet_values(row)
+            columns["period"].append(result.get("period"))
+            columns["distributor"].append(distributor)
+            columns["distributor_code"].append(distributor_code)
+            columns["name"].append(row["name"])
+            columns["type"].append(row.get("type"))
+            columns["price"].append(_number(price))
+            columns["quantity"].append(int(qty))
+            columns["fee"].append(_number(fee))
+            columns["amount"].append(_number(amount))
+    return columns
+
+
+def columns_from_rows(rows, period):
+    """从结果区的行 [(分销商, 名称, 供货价, 数量), ...] 构建按列存放的数据（汇总使用）"""
+    from function.reconciliation import parse_distributor_code
+
+    columns = {name: [] for name in COLUMNS}
+    for distributor, name, price, qty in rows:
+        price = _number(price)
+        qty = _number(qty)
+        fee = qty * 1 if qty is not None else None
+        columns["period"].append(period)
+        columns["distributor"].append(distributor)
+        columns["distributor_code"].append(parse_distributor_code(str(distributor)) if distributor else None)
+        columns["name"].append(name)
+        columns["type"].append(None)
+        columns["price"].append(price)
+        columns["quantity"].append(int(qty) if qty is not None else None)
+        columns["fee"].append(fee)
+        columns["amount"].append(price * qty - fee if price is not None and qty is not None else None)
+    return columns
+
+
+def _arrow_table(columns):
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("period", pa.string()),
+        ("distributor", pa.string()),
+        ("distributor_code", pa.string()),
+        ("name", pa.string()),
+        ("type", pa.string()),
+        ("price", pa.float64()),
+        ("quantity", pa.int64()),
+        ("fee", pa.float64()),
+        ("amount", pa.float64()),
+    ])
+    return pa.table({name: columns[name] for name in COLUMNS}, schema=schema)
+
+
+def _write_csv_rows(columns, path):
+    """未安装 pyarrow 时的 CSV 写入"""
+    import csv
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(columns[name] for name in COLUMNS)))
+
+
+def write_columns(columns, output_stem, formats=SUPPORTED_FORMATS, log=print):
+    """
+    写出按列存放的数据
+
+    Args:
+        output_stem: 输出路径（不含扩展名）
+        formats: 需要的格式，可选 parquet / csv
+
+    Returns:
+        写出的文件路径列表
+    """
+    try:
+        import pyarrow  # noqa: F401
+        has_arrow = True
+    except ImportError:
+        has_arrow = False
+
+    os.makedirs(os.path.dirname(output_stem), exist_ok=True)
+    table = _arrow_table(columns) if has_arrow else None
+    written = []
+
+    for fmt in formats:
+        fmt = str(fmt).lower()
+        if fmt not in SUPPORTED_FORMATS:
+            log(f"⚠ 不支持的导出格式：{fmt}")
+            continue
+        if fmt == "parquet" and not has_arrow:
+            log("⚠ 未安装 pyarrow，跳过 Parquet 导出（pip install pyarrow）")
+            continue
+
+        path = f"{output_stem}.{fmt}"
+        # 先写入同目录下唯一的临时文件再替换：下游读取时不会读到半截文件，多个进程同时导出也不会互相覆盖
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            if fmt == "parquet":
+                import pyarrow.parquet as pq
+                pq.write_table(table, tmp_path)
+            elif has_arrow:
+                import pyarrow.csv as pacsv
+                pacsv.write_csv(table, tmp_path)
+            else:
+                _write_csv_rows(columns, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        written.append(path)
+
+    return written
+
+
+def export_results(data_folder, period=None, formats=SUPPORTED_FORMATS, log=print):
+    """
+    导出对账结果缓存中某期间的全部行
+
+    Returns:
+        写出的文件路径列表
+    """
+    from function.result_store import current_period, load_results
+    from function.summary import distributor_sort_key
+
+    period = period or current_period()
+    results = sorted(load_results(data_folder, period), key=lambda r: distributor_sort_key(r["file"]))
+    if not results:
+        log(f"⚠ 没有期间 {period} 的对账结果，未导出")
+        return []
+
+    columns = columns_from_results(results)
+    stem = os.path.join(export_folder(data_folder), f"对账结果-{period}")
+    written = write_columns(columns, stem, formats, log)
+    for path in written:
+        log(f"📤 已导出 {len(columns['name'])} 行：{path}")
+    return written
+
+
+def main(argv=None):
+    import argparse
+    from function.reconciliation import DATA_FOLDER
+
+    parser = argparse.ArgumentParser(description="导出对账结果（Parquet / CSV）")
+    parser.add_argument("--folder", default=DATA_FOLDER, help="数据文件夹")
+    parser.add_argument("--period", default=None, help="期间 YYYY-MM（默认上个月）")
+    parser.add_argument("--format", nargs="+", default=list(SUPPORTED_FORMATS), choices=SUPPORTED_FORMATS)
+    args = parser.parse_args(argv)
+
+    return 0 if export_results(args.folder, args.period, args.format) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
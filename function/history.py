@@ -0,0 +1,161 @@
+# function/history.py
+"""
+运行历史 - 每次对账 / 汇总结束时追加一条性能指标，用于观察耗时随数据量的变化
+
+历史保存在 数据文件夹\\.对账缓存\\history.jsonl，每行一次运行（由 RunReport.save 自动写入）：
+    {"kind": "对账", "started_at": ..., "elapsed_seconds": 总耗时, "files": 文件数, "rows": 结果行数,
+     "success": 成功数, "errors": 失败数, "stages": {阶段: 秒}, "peak_rss_mb": 峰值内存,
+     "cache_hit_rate": 解析缓存命中率, "unchanged": 未变化文件数}
+
+回归检查：最近一次运行的各项指标与之前若干次（默认 10 次）同类运行的中位数比较，
+超过中位数的 1.25 倍（且差值超过最小幅度，避免毫秒级波动误报）时视为回归。
+
+命令行用法：
+    python -m function.history [--folder D:\\分销对账] [--kind 对账] [--last 10] [--window 10] [--ratio 1.25]
+有回归时退出码为 1。
+"""
+import os
+import sys
+import json
+import statistics
+
+from function.result_store import cache_folder
+
+HISTORY_FILE_NAME = "history.jsonl"
+DEFAULT_WINDOW = 10
+DEFAULT_RATIO = 1.25
+
+# 参与回归检查的指标：(指标名, 显示名, 单位, 最小差值)
+CHECKED_METRICS = [
+    ("elapsed_seconds", "总耗时", "秒", 1.0),
+    ("seconds_per_file", "每个文件耗时", "秒", 0.2),
+    ("peak_rss_mb", "峰值内存", "MB", 50.0),
+]
+STAGE_MIN_DELTA = 0.5   # 阶段耗时的最小差值（秒）
+
+
+def history_path(data_folder):
+    return os.path.join(cache_folder(data_folder), HISTORY_FILE_NAME)
+
+
+def metrics_from_report(data):
+    """从运行报告（RunReport.data）提取指标"""
+    files = data.get("files", {})
+    memory = data.get("memory", {})
+    statuses = [entry.get("status") for entry in files.values()]
+    elapsed = data.get("elapsed_seconds") or 0.0
+    processed = sum(1 for status in statuses if status)
+
+    return {
+        "kind": data.get("kind"),
+        "started_at": data.get("started_at"),
+        "elapsed_seconds": round(elapsed, 3),
+        "files": len(files),
+        "rows": sum(int(entry.get("rows") or 0) for entry in files.values()),
+        "success": statuses.count("成功"),
+        "errors": statuses.count("失败"),
+        "seconds_per_file": round(elapsed / processed, 4) if processed else None,
+        "stages": memory.get("stage_totals", {}),
+        "peak_rss_mb": memory.get("peak_rss_mb"),
+        "cache_hit_rate": (data.get("bundle_cache") or {}).get("hit_rate"),
+        "unchanged": data.get("unchanged_count"),
+    }
+
+
+def record_run(data_folder, data):
+    """把一次运行的指标追加到历史文件"""
+    path = history_path(data_folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(metrics_from_report(data), ensure_ascii=False) + "\n")
+
+
+def load_history(data_folder, kind=None):
+    """读取历史（按时间先后），kind 为 None 时返回全部"""
+    path = history_path(data_folder)
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if kind is None or run.get("kind") == kind:
+                runs.append(run)
+    return runs
+
+
+def find_regressions(runs, window=DEFAULT_WINDOW, ratio=DEFAULT_RATIO):
+    """
+    最近一次运行与之前 window 次运行的中位数比较
+
+    Returns:
+        [{"metric", "label", "value", "median", "ratio", "unit"}, ...]
+    """
+    if len(runs) < 2:
+        return []
+    latest, previous = runs[-1], runs[-window - 1:-1]
+
+    checks = [(key, label, unit, min_delta, lambda run, key=key: run.get(key))
+              for key, label, unit, min_delta in CHECKED_METRICS]
+    for stage in latest.get("stages", {}):
+        checks.append((f"stage:{stage}", f"阶段「{stage}」", "秒", STAGE_MIN_DELTA,
+                       lambda run, stage=stage: (run.get("stages") or {}).get(stage)))
+
+    regressions = []
+    for key, label, unit, min_delta, getter in checks:
+        value = getter(latest)
+        history = [v for v in map(getter, previous) if isinstance(v, (int, float))]
+        if not isinstance(value, (int, float)) or not history:
+            continue
+        median = statistics.median(history)
+        if value > median * ratio and value - median >= min_delta:
+            regressions.append({
+                "metric": key,
+                "label": label,
+                "value": value,
+                "median": round(median, 4),
+                "ratio": round(value / median, 2) if median else None,
+                "unit": unit,
+            })
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+    from function.reconciliation import DATA_FOLDER
+
+    parser = argparse.ArgumentParser(description="运行历史与性能回归报告")
+    parser.add_argument("--folder", default=DATA_FOLDER, help="数据文件夹")
+    parser.add_argument("--kind", default="对账", help="运行类型：对账 / 汇总")
+    parser.add_argument("--last", type=int, default=10, help="列出最近几次运行")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="计算中位数的历史运行次数")
+    parser.add_argument("--ratio", type=float, default=DEFAULT_RATIO, help="超过中位数的倍数视为回归")
+    args = parser.parse_args(argv)
+
+    runs = load_history(args.folder, args.kind)
+    if not runs:
+        print(f"暂无「{args.kind}」的运行历史")
+        return 0
+
+    print(f"{'开始时间':<20}{'文件':>6}{'行数':>8}{'耗时(秒)':>10}{'秒/文件':>9}{'内存(MB)':>10}{'命中率':>8}")
+    for run in runs[-args.last:]:
+        hit_rate = run.get("cache_hit_rate")
+        print(f"{run.get('started_at') or '':<20}{run.get('files', 0):>6}{run.get('rows', 0):>8}"
+              f"{run.get('elapsed_seconds') or 0:>10.2f}{run.get('seconds_per_file') or 0:>9.3f}"
+              f"{run.get('peak_rss_mb') or 0:>10.1f}{'' if hit_rate is None else f'{hit_rate:.0%}':>8}")
+
+    regressions = find_regressions(runs, args.window, args.ratio)
+    if not regressions:
+        print(f"✅ 最近一次运行未发现性能回归（与前 {args.window} 次的中位数比较）")
+        return 0
+    for item in regressions:
+        print(f"⚠ {item['label']}：{item['value']} {item['unit']}，中位数 {item['median']} {item['unit']}"
+              f"（{item['ratio']} 倍）")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# function/job_queue.py
+"""
+共享文件夹任务队列 - 多个进程 / 多台电脑协同处理同一个数据文件夹
+
+队列状态全部保存在 数据文件夹\\.对账缓存\\queue\\<批次号>\\ 下：
+    <文件名>.lease.<代数>   租约文件，以 O_CREAT | O_EXCL 原子创建，谁创建成功谁处理该文件；
+                            持有者定期刷新修改时间作为心跳
+    <文件名>.done           完成标记，记录处理者与结果
+    finished-<哈希>         收尾标记：全部文件完成后只由一个进程导出、生成查询索引（见 claim_finish）
+
+每个文件的当前租约是代数最大的那个。领取时创建 当前代数 + 1 的租约（没有租约时为 0），
+只有当前租约已失效（超过租约时长未刷新，或已被放弃）时才会尝试；同一代数只有一个进程能创建成功，
+因此回收失效租约与领取是同一个原子操作，不存在改名、放回等中间状态。
+租约文件在批次内从不删除（删除后较小的代数可被再次创建，造成两个进程同时持有），放弃时把修改时间设为 0。
+持有者发现更高代数的租约时即知道自己的租约已被回收。
+
+进程崩溃后其租约不再刷新，超过租约时长即视为失效，由其他进程领取下一代租约。
+同一批次内已完成的文件不会重复处理；需要重新处理时更换批次号或执行 reset。
+
+命令行用法（在同一台电脑上启动多个进程，可用于本机测试）：
+    python -m function.job_queue run --workers 4 [--batch 20260131]
+    python -m function.job_queue status [--batch 20260131]
+    python -m function.job_queue reset [--batch 20260131]
+多台电脑挂载同一共享文件夹时，各自执行 run（或在配置中开启 queue_mode 后点击"开始对账"），
+并使用相同的批次号即可。
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import hashlib
+import threading
+from datetime import datetime
+
+from function.result_store import cache_folder
+
+QUEUE_FOLDER_NAME = "queue"
+LEASE_SUFFIX = ".lease."
+DONE_SUFFIX = ".done"
+FINISH_PREFIX = "finished-"
+
+
+def default_batch():
+    """默认批次号：当天日期"""
+    return datetime.now().strftime("%Y%m%d")
+
+
+class JobQueue:
+    """基于租约文件的共享文件夹任务队列"""
+
+    def __init__(self, data_folder, batch=None, lease_seconds=120, worker_id=None):
+        self.batch = batch or default_batch()
+        self.folder = os.path.join(cache_folder(data_folder), QUEUE_FOLDER_NAME, self.batch)
+        self.lease_seconds = float(lease_seconds)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+        self._held = {}     # {文件名: 持有的租约代数}
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._stop_event = threading.Event()
+
+        os.makedirs(self.folder, exist_ok=True)
+
+    # ===============================
+    # 路径
+    # ===============================
+    def _lease_path(self, file_name, generation):
+        return os.path.join(self.folder, f"{file_name}{LEASE_SUFFIX}{generation}")
+
+    def _done_path(self, file_name):
+        return os.path.join(self.folder, file_name + DONE_SUFFIX)
+
+    def _lease_content(self):
+        return json.dumps({
+            "worker": self.worker_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "claimed_at": datetime.now().isoformat(timespec="seconds"),
+        }, ensure_ascii=False).encode("utf-8")
+
+    def _generations(self):
+        """各文件当前租约的代数：{文件名: 最大代数}"""
+        current = {}
+        for entry in os.listdir(self.folder):
+            name, sep, generation = entry.rpartition(LEASE_SUFFIX)
+            if not sep or not generation.isdigit():
+                continue
+            current[name] = max(current.get(name, -1), int(generation))
+        return current
+
+    def _current_generation(self, file_name):
+        """文件当前租约的代数，没有租约时返回 None"""
+        return self._generations().get(file_name)
+
+    # ===============================
+    # 领取 / 完成
+    # ===============================
+    def is_done(self, file_name):
+        return os.path.exists(self._done_path(file_name))
+
+    def _is_stale(self, lease_path):
+        try:
+            return time.time() - os.path.getmtime(lease_path) > self.lease_seconds
+        except FileNotFoundError:
+            return False
+
+    def _create_lease(self, file_name, generation):
+        try:
+            fd = os.open(self._lease_path(file_name, generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        try:
+            os.write(fd, self._lease_content())
+        finally:
+            os.close(fd)
+        return True
+
+    def _lease_owner(self, lease_path):
+        try:
+            with open(lease_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("worker", "未知")
+        except Exception:
+            return "未知"
+
+    def claim(self, file_name):
+        """尝试领取文件，成功返回 True"""
+        if self.is_done(file_name):
+            return False
+
+        current = self._current_generation(file_name)
+        if current is None:
+            generation = 0
+        else:
+            previous = self._lease_path(file_name, current)
+            if not self._is_stale(previous):
+                return False
+            generation = current + 1
+
+        # 同一代数只有一个进程能创建成功；目录列表过时（例如共享文件夹的缓存）时创建失败，下一轮再试
+        if not self._create_lease(file_name, generation):
+            return False
+        if current is not None:
+            print(f"  ↻ 回收失效租约：{file_name}（原处理者 {self._lease_owner(previous)}）")
+
+        with self._lock:
+            self._held[file_name] = generation
+
+        # 创建租约前后别人可能刚好完成
+        if self.is_done(file_name):
+            self._remove_lease(file_name)
+            return False
+
+        self._ensure_heartbeat()
+        return True
+
+    def complete(self, file_name, status, reason=None):
+        """写入完成标记并释放租约"""
+        done_path = self._done_path(file_name)
+        tmp_path = f"{done_path}.{self.worker_id}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "worker": self.worker_id,
+                "status": status,
+                "reason": reason,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, done_path)
+        self._remove_lease(file_name)
+
+    def release(self, file_name):
+        """放弃已领取的文件（不写完成标记），其他进程可立即领取"""
+        self._remove_lease(file_name)
+
+    def _remove_lease(self, file_name):
+        """放弃租约：不删除文件，只把修改时间设为 0，使其立即失效"""
+        with self._lock:
+            generation = self._held.pop(file_name, None)
+        if generation is None:
+            return
+        try:
+            os.utime(self._lease_path(file_name, generation), (0, 0))
+        except OSError:
+            pass
+
+    # ===============================
+    # 心跳
+    # ===============================
+    def _ensure_heartbeat(self):
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            return
+        self._stop_event.clear()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        interval = max(self.lease_seconds / 3, 0.5)
+        while not self._stop_event.wait(interval):
+            with self._lock:
+                held = list(self._held.items())
+            for file_name, generation in held:
+                # 出现下一代租约说明本租约已因心跳超时被其他进程回收
+                lost = os.path.exists(self._lease_path(file_name, generation + 1))
+                if not lost:
+                    try:
+                        os.utime(self._lease_path(file_name, generation))
+                    except OSError:
+                        lost = True
+                if lost:
+                    print(f"  ⚠ 租约丢失：{file_name}（可能因心跳超时被其他进程回收）")
+                    with self._lock:
+                        if self._held.get(file_name) == generation:
+                            del self._held[file_name]
+
+    def close(self):
+        """停止心跳并释放所有未完成的租约"""
+        self._stop_event.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=1)
+            self._heartbeat = None
+        with self._lock:
+            held = list(self._held)
+        for file_name in held:
+            self._remove_lease(file_name)
+
+    # ===============================
+    # 状态
+    # ===============================
+    def status(self, file_names):
+        """统计各文件状态：done / leased / pending"""
+        counts = {"done": [], "leased": [], "pending": []}
+        generations = self._generations()
+        for file_name in file_names:
+            generation = generations.get(file_name)
+            if self.is_done(file_name):
+                counts["done"].append(file_name)
+            elif generation is not None and not self._is_stale(self._lease_path(file_name, generation)):
+                counts["leased"].append(file_name)
+            else:
+                counts["pending"].append(file_name)
+        return counts
+
+    def results(self):
+        """读取所有完成标记：{文件名: 完成信息}"""
+        done = {}
+        for entry in os.listdir(self.folder):
+            if not entry.endswith(DONE_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.folder, entry), "r", encoding="utf-8") as f:
+                    done[entry[:-len(DONE_SUFFIX)]] = json.load(f)
+            except Exception:
+                continue
+        return done
+
+    def claim_finish(self):
+        """
+        批次中的文件全部完成后，只有一个进程执行收尾（导出、生成查询索引），该进程返回 True
+
+        标记文件名取已完成文件列表的哈希，以 O_EXCL 创建；同一批次之后又完成了新文件时会再收尾一次
+        """
+        names = "\n".join(sorted(self.results()))
+        digest = hashlib.blake2b(names.encode("utf-8"), digest_size=8).hexdigest()
+        try:
+            fd = os.open(os.path.join(self.folder, FINISH_PREFIX + digest), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        try:
+            os.write(fd, self.worker_id.encode("utf-8"))
+        finally:
+            os.close(fd)
+        return True
+
+    def reset(self):
+        """清除本批次的所有队列状态"""
+        for entry in os.listdir(self.folder):
+            try:
+                os.remove(os.path.join(self.folder, entry))
+            except OSError:
+                pass
+
+
+# ===============================
+# 命令行：本机多进程
+# ===============================
+def _run_worker(index, batch, data_folder):
+    """子进程入口：输出加上进程编号前缀，并以队列模式运行对账"""
+    from function.reconciliation import OutputRedirector, process_all_files
+
+    stdout = sys.stdout
+    sys.stdout = OutputRedirector(lambda line: stdout.write(f"[worker-{index}] {line}\n"))
+    try:
+        process_all_files(data_folder=data_folder, queue_batch=batch)
+    finally:
+        sys.stdout.flush()
+        sys.stdout = stdout
+
+
+def main(argv=None):
+    import argparse
+    import multiprocessing
+
+    from function.reconciliation import DATA_FOLDER, list_excel_files
+
+    parser = argparse.ArgumentParser(description="共享文件夹对账任务队列")
+    parser.add_argument("command", choices=["run", "status", "reset"])
+    parser.add_argument("--workers", type=int, default=2, help="本机启动的工作进程数")
+    parser.add_argument("--batch", default=None, help="批次号（默认当天日期）")
+    parser.add_argument("--folder", default=DATA_FOLDER, help="数据文件夹")
+    args = parser.parse_args(argv)
+
+    batch = args.batch or default_batch()
+    queue = JobQueue(args.folder, batch)
+
+    if args.command == "reset":
+        queue.reset()
+        print(f"已清除批次 {batch} 的队列状态")
+        return 0
+
+    if args.command == "run":
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=_run_worker, args=(i + 1, batch, args.folder))
+                     for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    file_names = [os.path.basename(f) for f in list_excel_files(args.folder)
+                  if not os.path.basename(f).startswith("~$")]
+    state = queue.status(file_names)
+    print(f"批次 {batch}：完成 {len(state['done'])}，处理中 {len(state['leased'])}，待处理 {len(state['pending'])}")
+    for file_name, info in sorted(queue.results().items()):
+        print(f"  • {file_name}：{info.get('status')}（{info.get('worker')}）")
+    return 0 if not state["pending"] and not state["leased"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
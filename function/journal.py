@@ -0,0 +1,285 @@
+# function/journal.py
+"""
+运行日志（journal）- 只追加的 JSONL 文件，记录一次对账中每个文件的进度
+
+文件位于 数据文件夹\\.对账缓存\\journal\\对账-<开始时间>-<进程号>.jsonl，每行一个事件：
+    {"event": "run_started", "time": ..., "files": [文件名, ...], "batch": 队列批次, "worker": 队列进程,
+     "host": 主机名, "pid": 进程号}
+    {"event": "run_resumed", "time": ..., "host": ..., "pid": ...}   续跑时追加，此后由该进程持有
+    {"event": "started",  "file": 文件名, "time": ...}   开始处理
+    {"event": "computed", "file": 文件名, "time": ...}   结果已计算
+    {"event": "saved",    "file": 文件名, "time": ..., "unchanged": bool}   工作簿已保存（或无需保存）
+    {"event": "skipped" | "failed", "file": 文件名, "reason": ...}
+    {"event": "run_finished", "time": ...}
+每行写入后立即 flush + fsync；进程崩溃时最多丢失正在写的那一行，且读取时会忽略不完整的行。
+
+没有 run_finished 的日志即为中断的运行。续跑（resume）时沿用该日志，只处理 run_started 中记录的文件，
+已 saved 的不再处理，其余（包括只到 started / computed 的）重新处理——工作簿通过临时文件 + 替换原子保存，
+中断时要么是旧内容、要么是新内容，重新处理是安全的。
+
+日志按队列批次区分（非队列运行的批次为 None），续跑只查找同一批次的日志，并跳过持有者仍在运行的日志：
+同一台电脑上检查进程是否存在，其他电脑上看日志的心跳（运行期间定期刷新修改时间）是否超时。
+超过保留天数（settings.reconciliation.journal_keep_days）的日志在新运行开始时删除。
+
+命令行用法：
+    python -m function.journal status [--folder D:\\分销对账]   查看最近一次运行的进度
+    python -m function.journal resume [--folder D:\\分销对账]   续跑最近一次中断的运行
+"""
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from datetime import datetime
+
+from function.result_store import cache_folder
+
+JOURNAL_FOLDER_NAME = "journal"
+JOURNAL_PREFIX = "对账-"
+HEARTBEAT_SECONDS = 30  # 运行期间刷新日志修改时间的间隔；其他电脑上的日志超过 4 倍未刷新视为进程已结束
+
+
+def journal_folder(data_folder):
+    return os.path.join(cache_folder(data_folder), JOURNAL_FOLDER_NAME)
+
+
+def read_events(path):
+    """读取日志中的全部事件，忽略崩溃时写了一半的行"""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+def file_states(events):
+    """每个文件的最后一个事件：{文件名: 事件名}"""
+    states = {}
+    for event in events:
+        if "file" in event:
+            states[event["file"]] = event["event"]
+    return states
+
+
+def list_journals(data_folder):
+    """按时间先后返回全部日志路径"""
+    folder = journal_folder(data_folder)
+    if not os.path.isdir(folder):
+        return []
+    return [
+        os.path.join(folder, entry) for entry in sorted(os.listdir(folder))
+        if entry.startswith(JOURNAL_PREFIX) and entry.endswith(".jsonl")
+    ]
+
+
+def run_info(events):
+    """run_started 事件（记录文件列表、批次与持有者），没有时返回空字典"""
+    for event in events:
+        if event.get("event") == "run_started":
+            return event
+    return {}
+
+
+def is_finished(events):
+    return any(event.get("event") == "run_finished" for event in events)
+
+
+def _owner_fields():
+    return {"host": socket.gethostname(), "pid": os.getpid()}
+
+
+def _pid_alive(pid):
+    """本机进程是否仍在运行"""
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def owner_alive(path, events):
+    """日志的持有者（最后一次 run_started / run_resumed 的进程）是否仍在运行"""
+    owner = None
+    for event in events:
+        if "pid" in event:
+            owner = event
+    if owner is None or is_finished(events):
+        return False
+    if owner.get("host") == socket.gethostname():
+        # 本进程自己留下的（如常驻服务中异常退出的上一次运行）视为已中断
+        return owner.get("pid") != os.getpid() and _pid_alive(owner.get("pid"))
+    try:
+        return time.time() - os.path.getmtime(path) <= HEARTBEAT_SECONDS * 4
+    except OSError:
+        return False
+
+
+def latest_unfinished(data_folder, batch=None):
+    """
+    同一批次最近一次未正常结束、且持有者已不在运行的日志路径
+
+    正在运行的日志（例如同一批次的其他队列进程）跳过；遇到已结束的运行时返回 None
+    """
+    for path in reversed(list_journals(data_folder)):
+        events = read_events(path)
+        if run_info(events).get("batch") != batch:
+            continue
+        if is_finished(events):
+            return None
+        if owner_alive(path, events):
+            continue
+        return path
+    return None
+
+
+def prune_journals(data_folder, keep_days):
+    """删除修改时间早于 keep_days 天的日志（持有者仍在运行的除外），返回删除的数量"""
+    if not keep_days or keep_days <= 0:
+        return 0
+    cutoff = time.time() - keep_days * 86400
+    removed = 0
+    for path in list_journals(data_folder):
+        try:
+            if os.path.getmtime(path) >= cutoff or owner_alive(path, read_events(path)):
+                continue
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class RunJournal:
+    """一次运行的只追加日志"""
+
+    def __init__(self, data_folder, path=None):
+        """
+        Args:
+            path: 续跑时传入已有日志的路径，不传时新建
+        """
+        if path is None:
+            folder = journal_folder(data_folder)
+            os.makedirs(folder, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(folder, f"{JOURNAL_PREFIX}{stamp}-{os.getpid()}.jsonl")
+            self.resumed = False
+            self.info = {}
+            self.states = {}
+        else:
+            events = read_events(path)
+            self.resumed = True
+            self.info = run_info(events)
+            self.states = file_states(events)
+
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        if self.resumed:
+            self.record("run_resumed", **_owner_fields())
+
+        self._stop_event = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="journal-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def start(self, files, batch=None, worker=None):
+        """新运行：记录本次要处理的文件列表与持有者"""
+        self.info = {"files": list(files), "batch": batch, "worker": worker, **_owner_fields()}
+        self.record("run_started", **self.info)
+
+    def planned_files(self):
+        """run_started 中记录的文件列表"""
+        return list(self.info.get("files") or [])
+
+    def saved_files(self):
+        """续跑时已保存、无需再处理的文件"""
+        return {name for name, state in self.states.items() if state == "saved"}
+
+    def record(self, event, file_name=None, **fields):
+        """追加一个事件并立即落盘"""
+        entry = {"event": event, "time": datetime.now().isoformat(timespec="seconds")}
+        if file_name is not None:
+            entry["file"] = file_name
+            self.states[file_name] = event
+        entry.update(fields)
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        try:
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(HEARTBEAT_SECONDS):
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass
+
+    def close(self, finished=True):
+        if self._file.closed:
+            return
+        self._stop_event.set()
+        self._heartbeat.join(timeout=1)
+        if finished:
+            self.record("run_finished")
+        self._file.close()
+
+
+def main(argv=None):
+    import argparse
+    from function.reconciliation import DATA_FOLDER
+
+    parser = argparse.ArgumentParser(description="对账运行日志")
+    parser.add_argument("command", choices=["status", "resume"])
+    parser.add_argument("--folder", default=DATA_FOLDER, help="数据文件夹")
+    args = parser.parse_args(argv)
+
+    if args.command == "resume":
+        from function.reconciliation import process_all_files
+        return 0 if process_all_files(data_folder=args.folder, resume=True) else 1
+
+    journals = list_journals(args.folder)
+    if not journals:
+        print("暂无运行日志")
+        return 0
+    events = read_events(journals[-1])
+    states = file_states(events)
+    finished = is_finished(events)
+    counts = {}
+    for state in states.values():
+        counts[state] = counts.get(state, 0) + 1
+    if finished:
+        state_text = "已结束"
+    elif owner_alive(journals[-1], events):
+        state_text = "运行中"
+    else:
+        state_text = "未结束，可续跑"
+    print(f"最近一次运行：{journals[-1]}（{state_text}）")
+    for state, count in sorted(counts.items()):
+        print(f"  {state}: {count}")
+    for name, state in states.items():
+        if state in ("started", "computed"):
+            print(f"  ⚠ 中断时正在处理：{name}（{state}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
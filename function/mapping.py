@@ -0,0 +1,177 @@
+# function/mapping.py
+"""
+紧凑的编码表 - 以整数编号和连续数组保存编码信息
+
+编码.xlsx 中每个货品商家编码对应一个整数编号（按表中首次出现的顺序）：
+    codes        [编码, ...]                编号 → 编码
+    name_ids     array("i")                编号 → 名称编号（名称去重后存于 names）
+    type_ids     array("i")                编号 → 产品类型编号（类型去重后存于 types）
+    prices       array("d")                编号 → 供货价（缺失为 NaN）
+    tax_prices   array("d")                编号 → 供货价（含税）（缺失为 NaN）
+与原先「编码 → 字典」的结构相比，对象数量从每个编码 5 个以上降为 1 个（编码字符串本身），
+名称与类型只保存一份；序列化时不包含编码 → 编号的索引（反序列化时重建），跨进程传递体积很小。
+
+每个文件的统计使用 CodeCounter：按编号存放的整数数组，并记录编号首次出现的顺序，
+遍历顺序与原先 defaultdict(int) 的插入顺序一致。
+"""
+import math
+from array import array
+
+GIFT_TYPE = "赠品"
+_SEPARATOR = "\x00"   # 序列化时拼接字符串表的分隔符（编码与名称中不会出现）
+
+
+class CodeTable:
+    """按整数编号存放的编码表"""
+
+    def __init__(self):
+        self.codes = []
+        self.names = []
+        self.types = []
+        self.name_ids = array("i")
+        self.type_ids = array("i")
+        self.prices = array("d")
+        self.tax_prices = array("d")
+        self._ids = {}
+        self._name_index = {}
+        self._type_index = {}
+        self._gift_type_id = -1
+
+    # ===============================
+    # 构建
+    # ===============================
+    @classmethod
+    def from_dataframe(cls, map_df):
+        """由编码表 DataFrame（列：货品商家编码 / 名称 / 产品类型 / 供货价 / 供货价（含税））构建"""
+        import pandas as pd
+
+        table = cls()
+        codes = map_df["货品商家编码"].astype(str).tolist()
+        names = map_df["名称"].astype(str).tolist()
+        types = map_df["产品类型"].astype(str).tolist()
+        prices = pd.to_numeric(map_df["供货价"], errors="raise").astype(float).tolist()
+        tax_prices = pd.to_numeric(map_df["供货价（含税）"], errors="raise").astype(float).tolist()
+
+        for row in zip(codes, names, types, prices, tax_prices):
+            table.add(*row)
+        return table
+
+    def _intern(self, value, table, index):
+        value_id = index.get(value)
+        if value_id is None:
+            value_id = index[value] = len(table)
+            table.append(value)
+        return value_id
+
+    def add(self, code, name, type_, price, tax_price=None):
+        """添加一个编码；编码重复时以后出现的为准（与原先字典覆盖的行为一致）"""
+        name_id = self._intern(name, self.names, self._name_index)
+        type_id = self._intern(type_, self.types, self._type_index)
+        if type_ == GIFT_TYPE:
+            self._gift_type_id = type_id
+        price = float(price)
+        tax_price = math.nan if tax_price is None else float(tax_price)
+
+        code_id = self._ids.get(code)
+        if code_id is None:
+            self._ids[code] = len(self.codes)
+            self.codes.append(code)
+            self.name_ids.append(name_id)
+            self.type_ids.append(type_id)
+            self.prices.append(price)
+            self.tax_prices.append(tax_price)
+        else:
+            self.name_ids[code_id] = name_id
+            self.type_ids[code_id] = type_id
+            self.prices[code_id] = price
+            self.tax_prices[code_id] = tax_price
+
+    # ===============================
+    # 查询
+    # ===============================
+    def id_of(self, code):
+        """编码 → 编号，不存在时返回 None"""
+        return self._ids.get(code)
+
+    def is_gift(self, code_id):
+        return self.type_ids[code_id] == self._gift_type_id
+
+    def name(self, code_id):
+        return self.names[self.name_ids[code_id]]
+
+    def type(self, code_id):
+        return self.types[self.type_ids[code_id]]
+
+    def price(self, code_id, use_tax_price=False):
+        """供货价；use_tax_price 时优先取含税价，含税价缺失时退回标准价。缺失返回 NaN"""
+        if use_tax_price:
+            tax_price = self.tax_prices[code_id]
+            if not math.isnan(tax_price):
+                return tax_price
+        return self.prices[code_id]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self._ids
+
+    def __getitem__(self, code):
+        """兼容原先的字典结构：编码 → {"name", "type", "price", "tax_price"}"""
+        code_id = self._ids[code]
+        tax_price = self.tax_prices[code_id]
+        return {
+            "name": self.name(code_id),
+            "type": self.type(code_id),
+            "price": self.prices[code_id],
+            "tax_price": None if math.isnan(tax_price) else tax_price,
+        }
+
+    def new_counter(self):
+        return CodeCounter(len(self.codes))
+
+    # ===============================
+    # 序列化（不含索引，反序列化时重建）
+    # ===============================
+    def __getstate__(self):
+        # 字符串表合并为一个字符串，避免逐个对象序列化
+        return {
+            "codes": _SEPARATOR.join(self.codes),
+            "names": _SEPARATOR.join(self.names),
+            "types": _SEPARATOR.join(self.types),
+            "name_ids": self.name_ids, "type_ids": self.type_ids,
+            "prices": self.prices, "tax_prices": self.tax_prices,
+        }
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+        for key in ("codes", "names", "types"):
+            setattr(self, key, state[key].split(_SEPARATOR) if state[key] else [])
+        self._ids = {code: i for i, code in enumerate(self.codes)}
+        self._name_index = {name: i for i, name in enumerate(self.names)}
+        self._type_index = {type_: i for i, type_ in enumerate(self.types)}
+        self._gift_type_id = self._type_index.get(GIFT_TYPE, -1)
+
+
+class CodeCounter:
+    """按编码编号累加数量的整数数组，遍历时保持编号首次出现的顺序"""
+
+    def __init__(self, size):
+        self.counts = array("q", bytes(8 * size))
+        self.order = array("i")
+        self._seen = bytearray(size)
+
+    def add(self, code_id, qty):
+        if not self._seen[code_id]:
+            self._seen[code_id] = 1
+            self.order.append(code_id)
+        self.counts[code_id] += qty
+
+    def items(self):
+        """按首次出现顺序返回 (编号, 数量)"""
+        counts = self.counts
+        return ((code_id, counts[code_id]) for code_id in self.order)
+
+    def __len__(self):
+        return len(self.order)
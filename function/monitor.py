@@ -0,0 +1,300 @@
+# function/monitor.py
+"""
+资源监控 - 按文件、按阶段记录耗时与内存
+
+阶段边界始终记录耗时和 RSS；开启内存分析（settings.reconciliation.memory_profile）后，
+额外启用 tracemalloc 与后台 RSS 采样线程，记录每个文件的峰值内存和最大的分配位置。
+
+用法：
+    monitor = ResourceMonitor(enabled=True, budget_mb=2048)
+    monitor.start()
+    monitor.start_file("36号-上海帝亚.xlsx", size_bytes)
+    monitor.mark("读取")      # 开始新阶段（自动结束上一阶段）
+    monitor.mark("保存")
+    monitor.end_file()
+    monitor.stop()
+    report.section("memory").update(monitor.summary())
+"""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+
+MB = 1024 * 1024
+
+
+def current_rss(pid=None):
+    """进程的常驻内存（字节），pid 为 None 时为当前进程；无法获取时返回 0"""
+    try:
+        import psutil
+        return (psutil.Process(pid) if pid is not None else psutil.Process()).memory_info().rss
+    except Exception:
+        pass
+
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            kernel32 = ctypes.windll.kernel32
+            if pid is None:
+                handle = kernel32.GetCurrentProcess()
+            else:
+                # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+                handle = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+                if not handle:
+                    return 0
+            try:
+                if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                    return counters.WorkingSetSize
+            finally:
+                if pid is not None:
+                    kernel32.CloseHandle(handle)
+        except Exception:
+            pass
+        return 0
+
+    try:
+        with open(f"/proc/{pid if pid is not None else 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+
+    if pid is not None:
+        return 0
+    try:
+        import resource
+        # 无法获取当前值时退而使用历史峰值（Linux 单位为 KB，macOS 为字节）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def _mb(value):
+    return round(value / MB, 1)
+
+
+class ResourceMonitor:
+    """按文件 / 阶段记录耗时与内存的监控器"""
+
+    def __init__(self, enabled=False, budget_mb=0, warn_ratio=0.8, top_sites=5, sample_interval=0.05, log=print):
+        self.enabled = enabled
+        self.log = log
+        self.budget = float(budget_mb or 0) * MB
+        self.warn_ratio = float(warn_ratio)
+        self.top_sites = int(top_sites)
+        self.sample_interval = sample_interval
+
+        self.files = {}
+        self.stages = {}           # 全局阶段（不属于某个文件）
+        self._file = None          # 当前文件名
+        self._file_record = None
+        self._file_size = 0
+        self._file_rss_start = 0
+        self._stage = None         # 当前阶段名
+        self._stage_started = 0.0
+        self._stage_peak = 0
+        self._file_peak = 0
+        self._bytes_per_input_byte = 0.0  # 已处理文件中「峰值增量 / 文件大小」的最大值
+        self._external_peak = 0.0  # 其他进程（工作进程）的内存峰值（MB）
+
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._running = False
+        self._owns_tracemalloc = False
+
+    @classmethod
+    def from_settings(cls, settings, log=print):
+        return cls(
+            enabled=bool(settings.get("memory_profile", False)),
+            budget_mb=settings.get("memory_budget_mb", 0),
+            warn_ratio=settings.get("memory_warn_ratio", 0.8),
+            top_sites=settings.get("memory_top_sites", 5),
+            log=log,
+        )
+
+    # ===============================
+    # 启停
+    # ===============================
+    def start(self):
+        if not self.enabled or self._running:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._running = True
+        self._sampler = threading.Thread(target=self._sample_loop, name="rss-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self.end_file()
+        self._close_stage()
+        if not self._running:
+            return
+        self._running = False
+        self._sampler.join(timeout=1)
+        self._sampler = None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _sample_loop(self):
+        while self._running:
+            rss = current_rss()
+            with self._lock:
+                self._stage_peak = max(self._stage_peak, rss)
+                self._file_peak = max(self._file_peak, rss)
+            time.sleep(self.sample_interval)
+
+    # ===============================
+    # 文件与阶段
+    # ===============================
+    def start_file(self, file_name, size_bytes=0):
+        """开始记录一个文件（自动结束上一个文件或全局阶段）"""
+        self.end_file()
+        self._close_stage()
+        rss = current_rss()
+        self._file = file_name
+        self._file_size = size_bytes
+        self._file_rss_start = rss
+        self._file_record = {
+            "size_mb": _mb(size_bytes),
+            "rss_start_mb": _mb(rss),
+            "stages": {},
+        }
+        with self._lock:
+            self._file_peak = rss
+        if self.enabled and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        # 按已处理文件的内存放大倍数预估本文件的峰值
+        if self.budget and size_bytes and self._bytes_per_input_byte:
+            estimate = rss + size_bytes * self._bytes_per_input_byte
+            self._file_record["estimated_peak_mb"] = _mb(estimate)
+            if estimate >= self.budget * self.warn_ratio:
+                self.log(f"  ⚠ 预计内存峰值约 {_mb(estimate)} MB，接近内存预算 {_mb(self.budget)} MB")
+
+    def mark(self, stage):
+        """开始一个新阶段（自动结束上一阶段）"""
+        self._close_stage()
+        self._stage = stage
+        self._stage_started = time.perf_counter()
+        with self._lock:
+            self._stage_peak = current_rss()
+
+    def end_file(self):
+        """结束当前文件，写入峰值与分配位置"""
+        if self._file is None:
+            return
+        self._close_stage()
+
+        record = self._file_record
+        with self._lock:
+            peak = max(self._file_peak, current_rss())
+        record["peak_rss_mb"] = _mb(peak)
+
+        if self.enabled and tracemalloc.is_tracing():
+            _, traced_peak = tracemalloc.get_traced_memory()
+            record["peak_traced_mb"] = _mb(traced_peak)
+            record["top_sites"] = self._top_allocation_sites()
+
+        if self._file_size:
+            growth = max(peak - self._file_rss_start, 0)
+            self._bytes_per_input_byte = max(self._bytes_per_input_byte, growth / self._file_size)
+
+        if self.budget and peak >= self.budget * self.warn_ratio:
+            record["over_budget"] = peak >= self.budget
+            self.log(f"  ⚠ {self._file} 内存峰值 {_mb(peak)} MB，"
+                     f"{'超出' if peak >= self.budget else '接近'}内存预算 {_mb(self.budget)} MB")
+
+        self.files[self._file] = record
+        self._file = None
+        self._file_record = None
+
+    def add_file(self, file_name, record):
+        """加入在其他进程中记录的文件（见 function/worker.py），结束当前文件"""
+        self.end_file()
+        self._close_stage()
+        self.files[file_name] = record
+
+    def add_peak(self, peak_mb):
+        """计入其他进程（工作进程）的内存峰值（MB）"""
+        self._external_peak = max(self._external_peak, float(peak_mb or 0))
+
+    def _close_stage(self):
+        if self._stage is None:
+            return
+        elapsed = time.perf_counter() - self._stage_started
+        with self._lock:
+            peak = max(self._stage_peak, current_rss())
+
+        target = self._file_record["stages"] if self._file_record is not None else self.stages
+        entry = target.setdefault(self._stage, {"seconds": 0.0, "peak_rss_mb": 0.0})
+        entry["seconds"] = round(entry["seconds"] + elapsed, 4)
+        entry["peak_rss_mb"] = max(entry["peak_rss_mb"], _mb(peak))
+        self._stage = None
+
+    def _top_allocation_sites(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        sites = []
+        for stat in snapshot.statistics("lineno")[:self.top_sites]:
+            frame = stat.traceback[0]
+            sites.append({
+                "site": f"{frame.filename}:{frame.lineno}",
+                "size_mb": _mb(stat.size),
+                "count": stat.count,
+            })
+        return sites
+
+    # ===============================
+    # 汇总
+    # ===============================
+    def stage_totals(self):
+        """各阶段累计耗时（秒），包括全局阶段与所有文件的阶段"""
+        totals = {}
+        for stage, entry in self.stages.items():
+            totals[stage] = totals.get(stage, 0.0) + entry["seconds"]
+        for record in self.files.values():
+            for stage, entry in record["stages"].items():
+                totals[stage] = totals.get(stage, 0.0) + entry["seconds"]
+        return {stage: round(seconds, 4) for stage, seconds in totals.items()}
+
+    def peak_rss_mb(self):
+        peaks = [record.get("peak_rss_mb", 0) for record in self.files.values()]
+        peaks += [entry["peak_rss_mb"] for entry in self.stages.values()]
+        return max(peaks + [self._external_peak])
+
+    def summary(self):
+        """写入运行报告的内容"""
+        return {
+            "profiled": self.enabled,
+            "budget_mb": _mb(self.budget),
+            "peak_rss_mb": self.peak_rss_mb(),
+            "stages": self.stages,
+            "stage_totals": self.stage_totals(),
+            "over_budget_files": [name for name, record in self.files.items() if record.get("over_budget")],
+            "files": self.files,
+        }
@@ -0,0 +1,400 @@
+# function/preflight.py
+"""
+对账预检 - 在正式对账前快速扫描整个数据文件夹
+
+只读取每个工作簿 Sheet1 的第一行 XML（不加载整张表），并行检查：
+    • 文件能否打开、是否被 Excel 占用
+    • 是否存在 Sheet1
+    • 是否缺少或重复"商家编码"表头
+    • 文件名能否解析出分销商编号
+    • （可选）商家编码列中未在编码表匹配的编码
+
+命令行用法：
+    python -m function.preflight [数据文件夹] [--mapping 编码.xlsx] [--unmatched]
+编码表默认为数据文件夹下的 编码表\\编码.xlsx（与 process_all_files 一致）。
+有问题时返回码为 1。
+"""
+import os
+import sys
+import time
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from function.reconciliation import (
+    DATA_FOLDER,
+    MAPPING_FILE,
+    count_codes,
+    list_excel_files,
+    load_mapping,
+    load_settings,
+    mapping_version,
+    parse_distributor_code,
+)
+
+CODE_HEADER = "商家编码"
+SHEET_NAME = "Sheet1"
+
+
+class PreflightReport:
+    """预检报告：每个文件一条记录"""
+
+    def __init__(self, data_folder):
+        self.data_folder = data_folder
+        self.files = []
+        self.elapsed = 0.0
+
+    @property
+    def has_issues(self):
+        return any(item["issues"] for item in self.files)
+
+    @property
+    def issue_files(self):
+        return [item for item in self.files if item["issues"]]
+
+
+def _local(tag):
+    """去掉 XML 命名空间，兼容 transitional / strict 两种格式"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _column_index(cell_ref):
+    """单元格引用转列号，例如 "C1" → 3"""
+    index = 0
+    for ch in cell_ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + (ord(ch.upper()) - ord("A") + 1)
+    return index
+
+
+def _find_sheet_path(zf, sheet_name):
+    """在 workbook.xml 中查找指定工作表对应的 XML 路径"""
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheet_names = []
+    rel_id = None
+    for elem in workbook.iter():
+        if _local(elem.tag) != "sheet":
+            continue
+        name = elem.get("name")
+        sheet_names.append(name)
+        if name == sheet_name:
+            rel_id = next((v for k, v in elem.attrib.items() if _local(k) == "id"), None)
+
+    if rel_id is None:
+        return None, sheet_names
+
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter():
+        if _local(rel.tag) == "Relationship" and rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/"), sheet_names
+            return posixpath.normpath(posixpath.join("xl", target)), sheet_names
+
+    return None, sheet_names
+
+
+def _cell_text(cell):
+    """读取单元格的原始内容，返回 (类型, 文本)"""
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        return cell_type, "".join(t.text or "" for t in cell.iter() if _local(t.tag) == "t")
+    for child in cell:
+        if _local(child.tag) == "v":
+            return cell_type, child.text
+    return cell_type, None
+
+
+def _read_shared_strings(zf, limit=None):
+    """
+    读取共享字符串表
+
+    Args:
+        limit: 只需要前 limit 个字符串时传入，读到即停止
+    """
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if _local(elem.tag) != "si":
+                continue
+            # 忽略拼音注释（rPh）中的文本
+            texts = []
+            for child in elem:
+                tag = _local(child.tag)
+                if tag == "t":
+                    texts.append(child.text or "")
+                elif tag == "r":
+                    texts.extend(t.text or "" for t in child if _local(t.tag) == "t")
+            strings.append("".join(texts))
+            elem.clear()
+            if limit is not None and len(strings) >= limit:
+                break
+    return strings
+
+
+def _resolve(cell_type, text, shared_strings):
+    if text is None:
+        return None
+    if cell_type == "s":
+        index = int(text)
+        return shared_strings[index] if index < len(shared_strings) else None
+    return text
+
+
+def _read_header(zf, sheet_path):
+    """只解析工作表的第一行，返回 {列号: 表头值}"""
+    raw_cells = []
+    with zf.open(sheet_path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if _local(elem.tag) != "row":
+                continue
+            # 第一行不是第 1 行，说明表头为空
+            if elem.get("r", "1") == "1":
+                for position, cell in enumerate(elem, 1):
+                    if _local(cell.tag) != "c":
+                        continue
+                    ref = cell.get("r")
+                    col = _column_index(ref) if ref else position
+                    raw_cells.append((col, *_cell_text(cell)))
+            break
+
+    needed = [int(text) + 1 for _, cell_type, text in raw_cells if cell_type == "s" and text is not None]
+    shared_strings = _read_shared_strings(zf, max(needed)) if needed else []
+    return {col: _resolve(cell_type, text, shared_strings) for col, cell_type, text in raw_cells}
+
+
+def _iter_column_values(zf, sheet_path, code_col):
+    """逐行读取指定列（跳过表头），返回非空文本"""
+    shared_strings = None
+    with zf.open(sheet_path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if _local(elem.tag) != "row":
+                continue
+            if elem.get("r", "1") != "1":
+                for position, cell in enumerate(elem, 1):
+                    if _local(cell.tag) != "c":
+                        continue
+                    ref = cell.get("r")
+                    if (_column_index(ref) if ref else position) != code_col:
+                        continue
+                    cell_type, text = _cell_text(cell)
+                    if cell_type == "s" and shared_strings is None:
+                        shared_strings = _read_shared_strings(zf)
+                    value = _resolve(cell_type, text, shared_strings)
+                    if value is not None and value != "":
+                        yield value
+                    break
+            elem.clear()
+
+
+def _owner_file_exists(file_path):
+    """检查 Excel 打开文件时生成的 ~$ 临时文件"""
+    folder, name = os.path.split(file_path)
+    candidates = {"~$" + name, "~$" + name[2:]}
+    return any(os.path.exists(os.path.join(folder, c)) for c in candidates)
+
+
+def _is_locked(file_path):
+    """文件被其他程序（如 Excel）以独占方式打开时无法以读写方式打开"""
+    try:
+        with open(file_path, "r+b"):
+            pass
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+
+
+def check_file(file_path, code_info=None, tax_distributor_map=None, version=None, count_unmatched=False,
+               chunk_rows=20000):
+    """预检单个文件，返回该文件的检查结果"""
+    file_name = os.path.basename(file_path)
+    file_stem = os.path.splitext(file_name)[0]
+    distributor_code = parse_distributor_code(file_stem)
+
+    result = {
+        "file": file_name,
+        "distributor_code": distributor_code,
+        "use_tax_price": bool(tax_distributor_map) and distributor_code in tax_distributor_map,
+        "code_col": None,
+        "issues": [],
+        "warnings": [],
+        "unmatched": [],
+    }
+
+    # ===== 分销商编号
+    if not distributor_code:
+        result["issues"].append("文件名无法解析出分销商编号")
+    elif "-" not in file_stem:
+        result["warnings"].append("文件名不含'-'，整个文件名将被当作分销商编号")
+
+    # ===== 文件占用
+    if _owner_file_exists(file_path):
+        result["issues"].append("文件正在被 Excel 打开，请先关闭")
+    elif _is_locked(file_path):
+        result["issues"].append("文件被其他程序占用，无法写入")
+
+    # ===== 读取表头
+    if file_name.lower().endswith(".xls"):
+        result["issues"].append("不支持 .xls 格式，请另存为 .xlsx")
+        return result
+
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            sheet_path, sheet_names = _find_sheet_path(zf, SHEET_NAME)
+            if sheet_path is None:
+                result["issues"].append(f"未找到 {SHEET_NAME}，现有工作表：{sheet_names}")
+                return result
+
+            header = _read_header(zf, sheet_path)
+            positions = [col for col, value in sorted(header.items())
+                         if value is not None and str(value) == CODE_HEADER]
+
+            if not positions:
+                values = [value for _, value in sorted(header.items()) if value is not None]
+                result["issues"].append(f"未找到'{CODE_HEADER}'列，可用列名：{values}")
+                return result
+
+            if len(positions) > 1:
+                result["issues"].append(
+                    f"发现 {len(positions)} 个'{CODE_HEADER}'字段，位置：第 {', '.join(map(str, positions))} 列"
+                )
+                return result
+
+            result["code_col"] = positions[0]
+
+            # ===== 未匹配编码（可选，需读取整列）
+            if count_unmatched and code_info is not None:
+                code_counter = code_info.new_counter()
+                unmatched_codes = set()
+                chunk = []
+                for value in _iter_column_values(zf, sheet_path, positions[0]):
+                    chunk.append(value)
+                    if len(chunk) >= chunk_rows:
+                        count_codes(chunk, code_info, code_counter, unmatched_codes, version)
+                        chunk = []
+                if chunk:
+                    count_codes(chunk, code_info, code_counter, unmatched_codes, version)
+
+                if unmatched_codes:
+                    result["unmatched"] = sorted(unmatched_codes)
+                    result["warnings"].append(f"{len(unmatched_codes)} 个商家编码未在编码表中匹配")
+
+    except zipfile.BadZipFile:
+        result["issues"].append("文件已损坏或不是有效的 .xlsx 文件")
+    except KeyError as e:
+        result["issues"].append(f"工作簿结构不完整：缺少 {e}")
+    except Exception as e:
+        result["issues"].append(f"读取失败：{e}")
+
+    return result
+
+
+def run_preflight(data_folder=DATA_FOLDER, code_info=None, tax_distributor_map=None, version=None,
+                  count_unmatched=None, max_workers=None):
+    """
+    并行预检文件夹中的所有 Excel 文件
+
+    Args:
+        data_folder: 数据文件夹
+        code_info / tax_distributor_map / version: 编码表信息（见 load_mapping），不传时跳过相关检查
+        count_unmatched: 是否统计未匹配编码，默认取配置 preflight_count_unmatched
+        max_workers: 并行线程数
+
+    Returns:
+        PreflightReport
+    """
+    settings = load_settings()
+    if count_unmatched is None:
+        count_unmatched = bool(settings.get("preflight_count_unmatched", False))
+
+    started = time.perf_counter()
+    report = PreflightReport(data_folder)
+
+    excel_files = sorted(
+        f for f in list_excel_files(data_folder) if not os.path.basename(f).startswith("~$")
+    )
+    if excel_files:
+        workers = max_workers or min(8, len(excel_files))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            report.files = list(pool.map(
+                lambda path: check_file(
+                    path, code_info, tax_distributor_map, version, count_unmatched,
+                    settings["stream_chunk_rows"]
+                ),
+                excel_files
+            ))
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def print_preflight_report(report):
+    """输出预检报告"""
+    print(f"🔍 预检：{len(report.files)} 个文件，用时 {report.elapsed:.2f} 秒")
+
+    if not report.files:
+        print(f"❌ 在文件夹 {report.data_folder} 中未找到Excel文件")
+        return
+
+    for item in report.files:
+        if not item["issues"] and not item["warnings"]:
+            continue
+        mark = "❌" if item["issues"] else "⚠"
+        print(f"{mark} {item['file']}（分销商编号：{item['distributor_code'] or '无'}）")
+        for issue in item["issues"]:
+            print(f"   • {issue}")
+        for warning in item["warnings"]:
+            print(f"   • {warning}")
+        if item["unmatched"]:
+            preview = ", ".join(item["unmatched"][:10])
+            more = f" 等 {len(item['unmatched'])} 个" if len(item["unmatched"]) > 10 else ""
+            print(f"     未匹配：{preview}{more}")
+
+    issue_count = len(report.issue_files)
+    if issue_count:
+        print(f"预检发现 {issue_count} 个文件存在问题")
+    else:
+        print("✅ 预检通过")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分销商对账预检")
+    parser.add_argument("folder", nargs="?", default=None, help="数据文件夹（默认 DATA_FOLDER）")
+    parser.add_argument("--mapping", default=None, help="编码表路径（默认为数据文件夹下的 编码表\\编码.xlsx）")
+    parser.add_argument("--unmatched", action="store_true", help="统计未匹配编码（需读取商家编码整列）")
+    parser.add_argument("--workers", type=int, default=None, help="并行线程数")
+    args = parser.parse_args(argv)
+
+    # 与 process_all_files 一致：未指定数据文件夹时用 DATA_FOLDER 与 MAPPING_FILE，否则用该文件夹下的编码表
+    if args.folder is None:
+        args.folder = DATA_FOLDER
+        args.mapping = args.mapping or MAPPING_FILE
+    else:
+        args.mapping = args.mapping or os.path.join(args.folder, "编码表", "编码.xlsx")
+
+    code_info = tax_distributor_map = version = None
+    if os.path.exists(args.mapping):
+        tax_distributor_map, code_info = load_mapping(args.mapping)
+        version = mapping_version(args.mapping)
+    else:
+        print(f"⚠ 编码文件不存在: {args.mapping}，跳过编码相关检查")
+
+    report = run_preflight(
+        args.folder, code_info, tax_distributor_map, version,
+        count_unmatched=args.unmatched or None, max_workers=args.workers
+    )
+    print_preflight_report(report)
+    return 1 if report.has_issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
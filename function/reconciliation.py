@@ -1,7 +1,63 @@
 # function/reconciliation.py
+import os
+import re
 import sys
+import threading
+import time
+from collections import Counter, OrderedDict
 from io import StringIO
 
+# ===============================
+# 路径配置
+# ===============================
+DATA_FOLDER = r"D:\分销对账"
+MAPPING_FOLDER = r"D:\分销对账\编码表"
+MAPPING_FILE = os.path.join(MAPPING_FOLDER, "编码.xlsx")
+
+# ===============================
+# 流式读取默认配置（可在 config.json 的 settings.reconciliation 中覆盖）
+# ===============================
+DEFAULT_SETTINGS = {
+    "stream_mode": "auto",          # auto：超过阈值自动流式；always：总是流式；never：整表读取
+    "stream_threshold_mb": 20,      # auto 模式下，文件大于该值（MB）时启用流式读取
+    "stream_chunk_rows": 20000,     # 每块读取的行数
+    "stream_chunk_memory_mb": 16,   # 每块缓存的编码字符串占用上限（MB），先到先切块
+    "bundle_cache_size": 50000,     # 跨文件共享的商家编码解析缓存条目数
+    "preflight_mode": "off",        # off：不预检；report：预检并输出报告；block：有问题时拒绝执行
+    "preflight_count_unmatched": False,  # 预检时是否读取商家编码整列统计未匹配编码
+    "memory_profile": False,        # 是否启用 tracemalloc 与 RSS 采样，记录每个文件的峰值内存
+    "memory_budget_mb": 0,          # 内存预算（MB），0 表示不检查
+    "memory_warn_ratio": 0.8,       # 峰值（或预估峰值）达到预算的该比例时提示
+    "memory_top_sites": 5,          # 报告中每个文件列出的最大分配位置数
+    "summary_workers": 8,           # 汇总时并行读取源文件的线程数
+    "summary_incremental": True,    # 汇总时只替换有变化的源文件对应的行（见 function/summary.py）
+    "skip_unchanged_save": True,    # 结果与上次写回的完全相同时不保存工作簿（不改变修改时间）
+    "diff_max_items": 200,          # 运行报告中每个文件最多记录的编码差异条数
+    "queue_mode": False,            # 队列模式：多个进程/电脑通过共享文件夹中的租约文件分工处理
+    "queue_batch": "",              # 队列批次号，留空为当天日期
+    "queue_lease_seconds": 120,     # 租约时长（秒），超过该时间未刷新视为进程已崩溃
+    "queue_poll_seconds": 5,        # 等待其他进程完成时的轮询间隔（秒）
+    "service_mode": "auto",         # auto：常驻服务在运行时交给服务执行；off：总是在界面进程内执行
+    "service_port": 47821,          # 常驻服务监听的本机端口
+    "resume_unfinished": False,     # 上次运行中断时是否自动续跑（跳过已保存的文件）
+    "journal_keep_days": 30,        # 运行日志保留天数，0 表示不清理
+    "dedup_mode": "off",            # off：不检测；report：检测重复订单 / 重复导出并写入报告；exclude：同时从统计中剔除
+    "order_id_columns": ["订单号", "单号", "售后单号", "原始单号"],  # 依次尝试的订单号列名
+    "sku_index": True,              # 对账时维护 编码 → 文件 的索引，编码表变化后可只重算受影响的文件
+    "sku_search_index": True,       # 对账结束时生成本月的 编码 / 名称 查询索引（主界面查询框使用）
+    "file_isolation": False,        # 每个文件在独立的工作进程中处理，超出下面的限制时结束并回收该进程（见 function/worker.py）
+    "file_timeout_seconds": 600,    # 单个文件的处理时间上限（秒），0 表示不限制
+    "file_memory_limit_mb": 4096,   # 工作进程的内存上限（MB），0 表示不限制
+    "analytics_top_n": 20,          # 汇总后生成退货分析（见 function/analytics.py），退货排行的条数；0 表示不生成
+    "export_formats": [],           # 对账 / 汇总后自动导出的格式，例如 ["parquet", "csv"]；为空不导出
+}
+
+# 因"商家编码"列重复而跳过时记录的原因
+MULTIPLE_CODE_REASON = "多个'商家编码'字段"
+
+# 商家编码中单个条目的格式：编码 或 编码*数量
+ITEM_PATTERN = re.compile(r"(.+?)(?:\*(\d+))?$")
+
 
 class OutputRedirector:
     """重定向输出到GUI的类"""
@@ -27,12 +83,13 @@ class OutputRedirector:
             self.buffer = ""
 
 
-def run_reconciliation_with_gui(output_callback=None):
+def run_reconciliation_with_gui(output_callback=None, **options):
     """
     在GUI环境中运行对账功能
 
     Args:
         output_callback: 回调函数，用于将输出发送到GUI界面
+        options: 传给 process_all_files 的参数（data_folder / mapping_file / queue_batch）
     """
     # 保存原始标准输出
     old_stdout = sys.stdout
@@ -44,7 +101,7 @@ def run_reconciliation_with_gui(output_callback=None):
             sys.stdout = redirector
 
         # 调用原有的处理逻辑
-        return process_all_files()
+        return process_all_files(**options)
 
     except Exception as e:
         if output_callback:
@@ -55,428 +112,958 @@ def run_reconciliation_with_gui(output_callback=None):
         sys.stdout = old_stdout
 
 
-def process_all_files():
-    """原有的处理逻辑，包装成函数"""
-    # ===============================
-    # 路径配置 - 已根据要求修改
-    # ===============================
-    import os
-    data_folder = r"D:\分销对账"
-    mapping_folder = r"D:\分销对账\编码表"
-    mapping_file = os.path.join(mapping_folder, "编码.xlsx")
+def load_settings():
+    """读取对账相关配置，缺失项使用默认值"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        from config_manager import get_config_value
+        user_settings = get_config_value("settings.reconciliation", {})
+        if isinstance(user_settings, dict):
+            settings.update(user_settings)
+    except Exception as e:
+        print(f"⚠ 读取对账配置失败: {e}，使用默认配置")
+    return settings
 
-    # 检查路径是否存在
-    if not os.path.exists(data_folder):
-        raise FileNotFoundError(f"数据文件夹不存在: {data_folder}")
 
-    if not os.path.exists(mapping_file):
-        raise FileNotFoundError(f"编码文件不存在: {mapping_file}")
+def use_stream_mode(file_path, settings):
+    """根据配置和文件大小判断是否使用流式读取"""
+    mode = str(settings.get("stream_mode", "auto")).lower()
+    if mode == "always":
+        return True
+    if mode == "never":
+        return False
+    threshold = float(settings.get("stream_threshold_mb", 0)) * 1024 * 1024
+    return os.path.getsize(file_path) >= threshold
 
-    print(f"数据文件夹: {data_folder}")
-    print(f"编码文件: {mapping_file}")
 
-    # ===============================
-    # 读取编码表并建立映射关系
-    # ===============================
+def iter_code_chunks(ws, code_col, chunk_rows, chunk_memory_mb):
+    """
+    以只读方式逐行读取「商家编码」列，按块返回非空值
+
+    每块在达到行数上限或字符串占用上限时切出，
+    峰值内存只与块大小有关，与文件总行数无关。
+    """
+    chunk_rows = max(int(chunk_rows), 1)
+    chunk_bytes = max(float(chunk_memory_mb), 0.1) * 1024 * 1024
+
+    chunk = []
+    chunk_size = 0
+    for (value,) in ws.iter_rows(min_row=2, min_col=code_col, max_col=code_col, values_only=True):
+        if value is None:
+            continue
+        chunk.append(value)
+        chunk_size += sys.getsizeof(value)
+        if len(chunk) >= chunk_rows or chunk_size >= chunk_bytes:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+
+    if chunk:
+        yield chunk
+
+
+def iter_order_chunks(ws, order_col, code_col, chunk_rows, chunk_memory_mb):
+    """
+    与 iter_code_chunks 相同，但同时读取订单号列，按块返回 (订单号列表, 商家编码列表)
+
+    商家编码为空的行跳过；两列逐行对应。
+    """
+    chunk_rows = max(int(chunk_rows), 1)
+    chunk_bytes = max(float(chunk_memory_mb), 0.1) * 1024 * 1024
+    first_col, last_col = min(order_col, code_col), max(order_col, code_col)
+    order_pos, code_pos = order_col - first_col, code_col - first_col
+
+    orders, codes = [], []
+    chunk_size = 0
+    for row in ws.iter_rows(min_row=2, min_col=first_col, max_col=last_col, values_only=True):
+        row = tuple(row) + (None,) * (last_col - first_col + 1 - len(row))
+        value = row[code_pos]
+        if value is None:
+            continue
+        orders.append(row[order_pos])
+        codes.append(value)
+        chunk_size += sys.getsizeof(value)
+        if len(codes) >= chunk_rows or chunk_size >= chunk_bytes:
+            yield orders, codes
+            orders, codes = [], []
+            chunk_size = 0
+
+    if codes:
+        yield orders, codes
+
+
+class BundleCache:
+    """
+    商家编码解析结果的 LRU 缓存
+
+    键为 (编码表版本, 商家编码字符串)，编码表变化后旧条目不会再被命中，
+    随后按最近最少使用的顺序被淘汰。缓存在模块级共享，跨文件、跨批次复用。
+    """
+
+    def __init__(self, maxsize=50000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = max(int(maxsize), 0)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._data)
+
+
+# 全局解析缓存
+bundle_cache = BundleCache(DEFAULT_SETTINGS["bundle_cache_size"])
+
+
+def mapping_version(mapping_file):
+    """根据编码表的路径、修改时间和大小生成版本号"""
+    stat = os.stat(mapping_file)
+    return f"{os.path.abspath(mapping_file)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def parse_bundle(value, code_info):
+    """
+    解析单个商家编码字符串，完成赠品分摊
+
+    Args:
+        code_info: 编码表（CodeTable）
+
+    Returns:
+        (allocation, unmatched, gifts)：allocation 为按首次出现顺序排列的 ((编码编号, 数量), ...)，
+        unmatched 为未匹配编码元组，gifts 为出现的全部赠品 ((编码编号, 数量), ...)（含被分摊吸收的部分）
+    """
+    allocation = {}
+    unmatched = []
+    normal_total = 0
+    gift_items = []
+
+    for item in value.split(";"):
+        m = ITEM_PATTERN.match(item.strip())
+        if not m:
+            continue
+
+        code = m.group(1)
+        qty = int(m.group(2)) if m.group(2) else 1
+
+        code_id = code_info.id_of(code)
+        if code_id is None:
+            unmatched.append(code)
+            continue
+
+        if code_info.is_gift(code_id):
+            gift_items.append((code_id, qty))
+        else:
+            normal_total += qty
+            allocation[code_id] = allocation.get(code_id, 0) + qty
+
+    gift_total = sum(q for _, q in gift_items)
+
+    if normal_total == 0:
+        for code_id, qty in gift_items:
+            allocation[code_id] = allocation.get(code_id, 0) + qty
+    else:
+        extra = gift_total - normal_total
+        if extra > 0:
+            for code_id, qty in gift_items:
+                use = min(qty, extra)
+                allocation[code_id] = allocation.get(code_id, 0) + use
+                extra -= use
+                if extra <= 0:
+                    break
+
+    return tuple(allocation.items()), tuple(unmatched), tuple(gift_items)
+
+
+def code_text(cell):
+    """
+    商家编码单元格 → 字符串
+
+    整数值的浮点数按整数处理：含空行的纯数字列经 pandas 读取为 1001.0，流式读取得到 1001，两者都是编码 "1001"
+    """
+    if isinstance(cell, float) and cell.is_integer():
+        return str(int(cell))
+    return str(cell)
+
+
+def count_codes(cells, code_info, code_counter, unmatched_codes, version=None, gift_counter=None):
+    """
+    解析一批商家编码并累加到 code_counter
+
+    先对相同的商家编码字符串计数，每个不同的值只解析一次，再按出现次数相乘累加。
+    传入编码表版本时，解析结果会进入全局 LRU 缓存供后续文件复用。
+
+    Args:
+        cells: 商家编码单元格值（已去除空值）
+        code_info: 编码表（CodeTable）
+        code_counter: 累加目标（CodeCounter，见 code_info.new_counter）
+        unmatched_codes: 收集未匹配编码的集合
+        version: 编码表版本（见 mapping_version），为 None 时不使用缓存
+        gift_counter: 累加出现的赠品数量（CodeCounter，含被分摊吸收的部分），为 None 时不统计
+    """
+    value_counts = Counter()
+    for cell, times in Counter(cells).items():
+        value_counts[code_text(cell)] += times
+
+    for value, times in value_counts.items():
+        parsed = None
+        if version is not None:
+            parsed = bundle_cache.get((version, value))
+
+        if parsed is None:
+            parsed = parse_bundle(value, code_info)
+            if version is not None:
+                bundle_cache.put((version, value), parsed)
+
+        allocation, unmatched, gifts = parsed
+        for code_id, qty in allocation:
+            code_counter.add(code_id, qty * times)
+        unmatched_codes.update(unmatched)
+        if gift_counter is not None:
+            for code_id, qty in gifts:
+                gift_counter.add(code_id, qty * times)
+
+
+def list_excel_files(data_folder):
+    """获取文件夹中所有待处理的Excel文件（支持.xls和.xlsx）"""
+    import glob
+    return glob.glob(os.path.join(data_folder, "*.xls")) + glob.glob(os.path.join(data_folder, "*.xlsx"))
+
+
+def parse_distributor_code(file_stem):
+    """从文件名（不含扩展名）提取"-"前面的分销商编号，例如 36号-上海帝亚 → 36号"""
+    if "-" in file_stem:
+        return file_stem.split("-")[0].strip()
+    return file_stem.strip()
+
+
+def load_mapping(mapping_file):
+    """
+    读取编码表并建立映射关系
+
+    Returns:
+        (tax_distributor_map, code_info)：含税分销商集合（字典）与编码表（CodeTable）
+    """
     import pandas as pd
+    from function.api import build_mapping
     map_df = pd.read_excel(mapping_file)
 
-    # 建立含税分销商映射
-    tax_distributor_map = {}
-    for _, row in map_df.iterrows():
-        tax_distributor = row.get("含税分销商")
-        if pd.notna(tax_distributor):
-            # 清理分销商名称，去掉空格
-            tax_distributor_clean = str(tax_distributor).strip()
-            tax_distributor_map[tax_distributor_clean] = True
+    # 含税分销商映射 + 编码表（整数编号 + 连续数组，见 function/mapping.py）
+    return build_mapping(map_df)
+
 
-    print(f"含税分销商列表: {list(tax_distributor_map.keys())}")
+# 已加载的编码表：{编码表绝对路径: (版本号, tax_distributor_map, code_info)}
+_mapping_cache = {}
+_mapping_lock = threading.Lock()
 
-    # 建立编码信息字典
-    code_info = {}
-    for _, row in map_df.iterrows():
-        code = str(row["货品商家编码"])
-        code_info[code] = {
-            "name": str(row["名称"]),
-            "type": str(row["产品类型"]),
-            "price": float(row["供货价"]),  # 标准供货价
-            "tax_price": float(row["供货价（含税）"]) if pd.notna(row["供货价（含税）"]) else None  # 含税供货价
-        }
+
+def get_mapping(mapping_file):
+    """
+    读取编码表（带缓存）：版本号（修改时间、大小）未变化时直接返回已加载的结果
+
+    Returns:
+        (tax_distributor_map, code_info, version, reloaded)
+    """
+    key = os.path.abspath(mapping_file)
+    version = mapping_version(mapping_file)
+    with _mapping_lock:
+        cached = _mapping_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1], cached[2], version, False
+
+        tax_distributor_map, code_info = load_mapping(mapping_file)
+        _mapping_cache[key] = (version, tax_distributor_map, code_info)
+        return tax_distributor_map, code_info, version, True
+
+
+def save_workbook_atomic(wb, file_path):
+    """
+    先保存到同目录的临时文件、落盘后再替换原文件，中断时原文件保持完整
+
+    临时文件名由 mkstemp 生成，多个进程同时保存同一文件时互不覆盖对方的临时文件
+    """
+    import tempfile
+
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            wb.save(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp 创建的文件只有本人可读写，沿用原文件的权限
+        if os.path.exists(file_path):
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _finish_report(report, monitor):
+    """停止监控，把内存与耗时记录写入运行报告并保存"""
+    monitor.stop()
+    report.set("memory", monitor.summary())
+    report_path = report.save()
+    if report_path:
+        print(f"📄 运行报告：{report_path}")
+    if monitor.enabled:
+        print(f"📈 内存峰值：{monitor.peak_rss_mb()} MB")
+
+
+def process_file(file_path, code_info, tax_distributor_map, version, settings, monitor, file_entry, journal=None):
+    """
+    处理单个对账文件：统计商家编码、计算结果并写回 Sheet1
+
+    Args:
+        file_path: 对账文件路径
+        code_info / tax_distributor_map / version: 编码表信息（见 load_mapping、mapping_version）
+        settings: 对账配置（见 load_settings）
+        monitor: ResourceMonitor，调用前已 start_file
+        file_entry: 运行报告中该文件的记录，处理结果写入其中
+        journal: RunJournal，记录 computed / saved 事件，可为 None
+
+    Returns:
+        处理成功返回 True，跳过返回 False；出错时抛出异常
+    """
+    import pandas as pd
+    from function.api import reconcile, uses_tax_price
+    from function.result_store import save_result, load_result, source_stamp, is_unchanged, diff_results
+    from function.sku_index import record_file_result
+    from function import styles
+
+    data_folder = os.path.dirname(file_path)
+    file_name = os.path.basename(file_path)
+    monitor.mark("读取")
 
     # ===============================
-    # 样式
+    # 解析文件名，确定使用哪种价格
     # ===============================
-    from openpyxl.styles import Border, Side, Font, Alignment
-    thin = Side(style="thin")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-    red_font = Font(color="FF0000")
+    file_stem = os.path.splitext(file_name)[0]  # 例如 "36号-上海帝亚"
 
-    success_count = 0
-    error_count = 0
-    multiple_code_files = []  # 记录有多重编码字段的文件
+    # 提取"-"前面的分销商编号
+    distributor_code = parse_distributor_code(file_stem)
+
+    print(f"  分销商编号: {distributor_code}")
+
+    # 判断是否使用含税价格
+    use_tax_price = uses_tax_price(distributor_code, tax_distributor_map)
+
+    if use_tax_price:
+        print(f"  ✓ 使用含税价格（供货价（含税））")
+    else:
+        print(f"  ✓ 使用标准价格（供货价）")
 
     # ===============================
-    # 处理文件
+    # 使用 openpyxl 直接读取 Excel 文件检查表头
     # ===============================
-    import glob
-    # 获取所有Excel文件（支持.xls和.xlsx）
-    excel_files = glob.glob(os.path.join(data_folder, "*.xls")) + glob.glob(os.path.join(data_folder, "*.xlsx"))
+    from openpyxl import load_workbook
 
-    if not excel_files:
-        print(f"❌ 在文件夹 {data_folder} 中未找到Excel文件")
-        return False
+    # 先检查文件表头
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    ws = wb["Sheet1"]
 
-    for file_path in excel_files:
-        try:
-            file_name = os.path.basename(file_path)
-            print(f"正在处理: {file_name}")
+    # 获取第一行所有单元格的值
+    header_values = []
+    for cell in ws[1]:
+        header_values.append(cell.value)
 
-            # ===============================
-            # 解析文件名，确定使用哪种价格
-            # ===============================
-            file_stem = os.path.splitext(file_name)[0]  # 例如 "36号-上海帝亚"
+    # 统计"商家编码"出现的次数
+    merchant_code_count = 0
+    merchant_code_positions = []
+    for col_idx, value in enumerate(header_values, 1):
+        if value == "商家编码":
+            merchant_code_count += 1
+            merchant_code_positions.append(col_idx)
 
-            # 提取"-"前面的分销商编号
-            if "-" in file_stem:
-                distributor_code = file_stem.split("-")[0].strip()
-            else:
-                distributor_code = file_stem.strip()
+    # ===============================
+    # 如果有多个"商家编码"字段，跳过处理
+    # ===============================
+    if merchant_code_count > 1:
+        print(f"❌ 跳过 {file_name}：发现 {merchant_code_count} 个'商家编码'字段")
+        print(f"   位置：第 {', '.join(map(str, merchant_code_positions))} 列")
+        print(f"   请检查Excel文件，删除多余的'商家编码'列")
 
-            print(f"  分销商编号: {distributor_code}")
+        # 记录这个文件
+        file_entry.update(status="跳过", reason=MULTIPLE_CODE_REASON)
 
-            # 判断是否使用含税价格
-            use_tax_price = distributor_code in tax_distributor_map
+        # 关闭只读工作簿
+        wb.close()
+        return False
 
-            if use_tax_price:
-                print(f"  ✓ 使用含税价格（供货价（含税））")
-            else:
-                print(f"  ✓ 使用标准价格（供货价）")
+    # ===============================
+    # 如果没有"商家编码"字段，也跳过
+    # ===============================
+    if merchant_code_count == 0:
+        print(f"跳过 {file_name}：未找到'商家编码'列")
+        print(f"   可用列名：{header_values}")
+        file_entry.update(status="跳过", reason="未找到'商家编码'列")
+        wb.close()
+        return False
 
+    # ===============================
+    # 重复订单检测（可选，见 function/dedup.py）
+    # ===============================
+    dedup_mode = str(settings.get("dedup_mode", "off")).lower()
+    dedup = None
+    order_col = order_header = None
+    exclude_duplicates = dedup_mode == "exclude"
+    if dedup_mode in ("report", "exclude"):
+        from function.dedup import open_index, find_order_column
+        from function.result_store import current_period
+        order_col, order_header = find_order_column(header_values, settings.get("order_id_columns", []))
+        dedup = open_index(data_folder).begin_file(file_name, current_period())
+        if order_col is None:
+            print(f"  ⚠ 未找到订单号列（{'/'.join(settings.get('order_id_columns', []))}），只检测重复导出")
+
+    stream = use_stream_mode(file_path, settings)
+    if stream:
+        print(f"  ✓ 流式读取（每块最多 {settings['stream_chunk_rows']} 行）")
+    else:
+        # 关闭只读工作簿
+        wb.close()
+
+        # ===============================
+        # 使用 pandas 读取数据
+        # ===============================
+        # 订单号按文本读取：数字订单号按数值读取会变成 float64，超过 15~16 位时精度丢失、不同订单号变成同一个
+        dtype = {order_header: str} if dedup is not None and order_header is not None else None
+        df = pd.read_excel(file_path, sheet_name="Sheet1", dtype=dtype)
+
+        # 再次确认只有一个"商家编码"列
+        merchant_code_cols = [col for col in df.columns if str(col).strip() == "商家编码"]
+        if len(merchant_code_cols) > 1:
+            print(f"❌ 跳过 {file_name}：pandas检测到 {len(merchant_code_cols)} 个'商家编码'列")
+            print(f"   列名：{merchant_code_cols}")
+            file_entry.update(status="跳过", reason=MULTIPLE_CODE_REASON)
+            return False
+
+    def code_chunks():
+        """
+        逐块产生要统计的商家编码，统计（api.reconcile）边读边进行
+
+        检测重复订单时每块先检查、按配置剔除重复行；读完后进入"计算"阶段
+        """
+        if stream:
+            # ===============================
+            # 流式读取：只读「商家编码」一列（检测重复订单时加上订单号列），分块累加
+            # ===============================
+            try:
+                if dedup is not None and order_col is not None:
+                    for orders, chunk in iter_order_chunks(
+                            ws,
+                            order_col,
+                            merchant_code_positions[0],
+                            settings["stream_chunk_rows"],
+                            settings["stream_chunk_memory_mb"]
+                    ):
+                        flags = dedup.check(orders, chunk)
+                        if exclude_duplicates:
+                            chunk = [code for code, duplicate in zip(chunk, flags) if not duplicate]
+                        yield chunk
+                else:
+                    for chunk in iter_code_chunks(
+                            ws,
+                            merchant_code_positions[0],
+                            settings["stream_chunk_rows"],
+                            settings["stream_chunk_memory_mb"]
+                    ):
+                        if dedup is not None:
+                            dedup.add_codes(chunk)
+                        yield chunk
+            finally:
+                # 关闭只读工作簿
+                wb.close()
+        else:
             # ===============================
-            # 使用 openpyxl 直接读取 Excel 文件检查表头
+            # 解析商家编码
             # ===============================
-            from openpyxl import load_workbook
+            codes = df["商家编码"].dropna()
+            if dedup is not None and order_header in df.columns:
+                flags = dedup.check(df.loc[codes.index, order_header].tolist(), codes.tolist())
+                if exclude_duplicates:
+                    codes = codes[[not duplicate for duplicate in flags]]
+            elif dedup is not None:
+                dedup.add_codes(codes.tolist())
+            yield codes
+        monitor.mark("计算")
 
-            # 先检查文件表头
-            wb = load_workbook(file_path, read_only=True, data_only=True)
-            ws = wb["Sheet1"]
+    # ===============================
+    # 统计商家编码，汇总到【名称】并根据分销商选择价格（见 function/api.py）
+    # ===============================
+    mapping = (tax_distributor_map, code_info)
+    result = reconcile(code_chunks(), mapping, distributor_code, file_name=file_name, version=version,
+                       chunked=True)
+    if not stream:
+        del df
+
+    if dedup is not None:
+        duplicates = dedup.finish()
+        file_entry["dedup"] = duplicates
+        if duplicates["duplicate_file"]:
+            print(f"  ⚠ 与 {duplicates['duplicate_file']} 内容完全相同，疑似重复导出")
+            if exclude_duplicates:
+                result = reconcile([], mapping, distributor_code, file_name=file_name, chunked=True)
+                print("  ⚠ 已剔除本文件的全部数据")
+        if duplicates["duplicate_orders"]:
+            sources = "、".join(f"{name} {count} 单" for name, count in duplicates["duplicate_of"].items())
+            action = "已从统计中剔除" if exclude_duplicates else "未剔除"
+            print(f"  ⚠ 发现 {duplicates['duplicate_orders']} 个重复订单（{duplicates['duplicate_rows']} 行，{action}）：{sources}")
 
-            # 获取第一行所有单元格的值
-            header_values = []
-            for cell in ws[1]:
-                header_values.append(cell.value)
+    # ===============================
+    # 与上次写回的结果比较
+    # ===============================
+    del result["totals"]    # 缓存中不保存合计
+    rows, unmatched_codes, missing_price_names = result["rows"], result["unmatched"], result["missing_price"]
+    previous = load_result(data_folder, file_name)
+    if journal is not None:
+        journal.record("computed", file_name, rows=len(rows))
+
+    if settings.get("skip_unchanged_save", True) and is_unchanged(previous, result, file_path):
+        # 工作簿内容不变，只刷新缓存（期间等可能变化），不改变对账文件的修改时间
+        result["source"] = previous["source"]
+        save_result(data_folder, result)
+        if settings.get("sku_index", True):
+            record_file_result(data_folder, result, version, code_info, tax_distributor_map)
+        if journal is not None:
+            journal.record("saved", file_name, unchanged=True)
+        print(f"✅ 结果未变化，跳过保存：{file_name}")
+        file_entry.update(status="成功", unchanged=True, rows=len(rows), unmatched=len(unmatched_codes))
+        return True
+
+    if previous:
+        changes = diff_results(previous, result)
+        file_entry["changes"] = changes[:settings.get("diff_max_items", 200)]
+        file_entry["change_count"] = len(changes)
+        print(f"  变化：{len(changes)} 项（与上次结果相比）")
 
-            # 统计"商家编码"出现的次数
-            merchant_code_count = 0
-            merchant_code_positions = []
-            for col_idx, value in enumerate(header_values, 1):
-                if value == "商家编码":
-                    merchant_code_count += 1
-                    merchant_code_positions.append(col_idx)
+    # ===============================
+    # 打开 Excel 进行写入
+    # ===============================
+    monitor.mark("写入")
+    wb = load_workbook(file_path)
+    styles.register(wb)
+    ws = wb["Sheet1"]
+
+    # 找「商家编码」列
+    code_col = None
+    for c in range(1, ws.max_column + 1):
+        if ws.cell(1, c).value == "商家编码":
+            code_col = c
+            break
+    if not code_col:
+        print(f"跳过 {file_name}：未找到'商家编码'列")
+        file_entry.update(status="跳过", reason="未找到'商家编码'列")
+        return False
 
-            # ===============================
-            # 如果有多个"商家编码"字段，跳过处理
-            # ===============================
-            if merchant_code_count > 1:
-                print(f"❌ 跳过 {file_name}：发现 {merchant_code_count} 个'商家编码'字段")
-                print(f"   位置：第 {', '.join(map(str, merchant_code_positions))} 列")
-                print(f"   请检查Excel文件，删除多余的'商家编码'列")
+    start_col = code_col + 4  # 间隔 3 列
 
-                # 记录这个文件
-                multiple_code_files.append(file_name)
-                error_count += 1
+    # ===============================
+    # 解除旧合并（关键）
+    # ===============================
+    for rng in list(ws.merged_cells.ranges):
+        if rng.min_col >= start_col:
+            ws.unmerge_cells(str(rng))
 
-                # 关闭只读工作簿
-                wb.close()
-                continue
+    # ===============================
+    # 清空旧结果区
+    # ===============================
+    # 整列删除结果区（连同旧样式）；逐行逐列 ws.cell() 会为整张订单表的每一行新建单元格，
+    # 且 ws.max_column 每次调用都要遍历全部单元格，只取一次
+    max_col = ws.max_column
+    if max_col >= start_col:
+        ws.delete_cols(start_col, max_col - start_col + 1)
 
-            # 关闭只读工作簿
-            wb.close()
+    # ===============================
+    # 表头（保持"供货价"不变）
+    # ===============================
+    headers = ["分销商", "名称", "供货价", "数量", "售后处理费", "金额"]
+    for i, h in enumerate(headers):
+        ws.cell(1, start_col + i, h)
 
-            # ===============================
-            # 如果没有"商家编码"字段，也跳过
-            # ===============================
-            if merchant_code_count == 0:
-                print(f"跳过 {file_name}：未找到'商家编码'列")
-                print(f"   可用列名：{header_values}")
-                error_count += 1
-                continue
+    # ===============================
+    # 列字母（一次算好）
+    # ===============================
+    from openpyxl.utils import get_column_letter
+    price_col = get_column_letter(start_col + 2)
+    qty_col = get_column_letter(start_col + 3)
+    fee_col = get_column_letter(start_col + 4)
+    amt_col = get_column_letter(start_col + 5)
 
-            # ===============================
-            # 使用 pandas 读取数据
-            # ===============================
-            df = pd.read_excel(file_path, sheet_name="Sheet1")
+    # ===============================
+    # 写数据
+    # ===============================
+    start_row = 2
+    r = start_row
 
-            # 再次确认只有一个"商家编码"列
-            merchant_code_cols = [col for col in df.columns if str(col).strip() == "商家编码"]
-            if len(merchant_code_cols) > 1:
-                print(f"❌ 跳过 {file_name}：pandas检测到 {len(merchant_code_cols)} 个'商家编码'列")
-                print(f"   列名：{merchant_code_cols}")
-                error_count += 1
-                continue
+    for row in rows:
+        ws.cell(r, start_col + 1, row["name"])
+        ws.cell(r, start_col + 2, row["price"])
+        ws.cell(r, start_col + 3, -row["count"])
 
-            from collections import defaultdict
-            import re
-            code_counter = defaultdict(int)
-            unmatched_codes = set()
-            missing_price_names = set()
+        ws.cell(r, start_col + 4, f"={qty_col}{r}*1")
+        ws.cell(
+            r,
+            start_col + 5,
+            f"={price_col}{r}*{qty_col}{r}-{fee_col}{r}"
+        )
+        r += 1
 
-            # ===============================
-            # 解析商家编码
-            # ===============================
-            for cell in df["商家编码"].dropna():
-                items = str(cell).split(";")
-                normal_total = 0
-                gift_items = []
-
-                for item in items:
-                    m = re.match(r"(.+?)(?:\*(\d+))?$", item.strip())
-                    if not m:
-                        continue
-
-                    code = m.group(1)
-                    qty = int(m.group(2)) if m.group(2) else 1
-
-                    info = code_info.get(code)
-                    if not info:
-                        unmatched_codes.add(code)
-                        continue
-
-                    if info["type"] == "赠品":
-                        gift_items.append((code, qty))
-                    else:
-                        normal_total += qty
-                        code_counter[code] += qty
-
-                gift_total = sum(q for _, q in gift_items)
-
-                if normal_total == 0:
-                    for code, qty in gift_items:
-                        code_counter[code] += qty
-                    continue
-
-                extra = gift_total - normal_total
-                if extra > 0:
-                    for code, qty in gift_items:
-                        use = min(qty, extra)
-                        code_counter[code] += use
-                        extra -= use
-                        if extra <= 0:
-                            break
+    end_row = r - 1
 
-            # ===============================
-            # 汇总到【名称】并根据分销商选择价格
-            # ===============================
-            final = {}
-            for code, qty in code_counter.items():
-                info = code_info[code]
-                name = info["name"]
-
-                # 根据是否使用含税价格选择价格
-                if use_tax_price and info["tax_price"] is not None:
-                    price = info["tax_price"]
-                else:
-                    price = info["price"]
+    # ===============================
+    # 汇总行
+    # ===============================
+    total_row = end_row + 1
+    ws.cell(total_row, start_col + 1, "合计")
+    ws.cell(
+        total_row,
+        start_col + 3,
+        f"=SUM({qty_col}{start_row}:{qty_col}{end_row})"
+    )
+    ws.cell(
+        total_row,
+        start_col + 4,
+        f"=SUM({fee_col}{start_row}:{fee_col}{end_row})"
+    )
+    ws.cell(
+        total_row,
+        start_col + 5,
+        f"=SUM({amt_col}{start_row}:{amt_col}{end_row})"
+    )
 
-                # 供货价缺失判断
-                if pd.isna(price) or price == 0:
-                    missing_price_names.add(name)
+    # ===============================
+    # 边框和居中（表头 + 数据 + 合计）
+    # ===============================
+    styles.style_range(ws, 1, total_row, start_col, start_col + len(headers) - 1, styles.CENTER)
 
-                if name not in final:
-                    final[name] = {
-                        "数量": 0,
-                        "供货价": price if not pd.isna(price) else ""
-                    }
+    # ===============================
+    # 分销商合并（安全）：先设置样式再合并，合并区域的外边框取自左上角单元格
+    # ===============================
+    if end_row >= start_row:
+        ws.cell(start_row, start_col).value = file_stem
+        ws.merge_cells(start_row=start_row, start_column=start_col, end_row=end_row, end_column=start_col)
 
-                final[name]["数量"] += qty
+    # ===============================
+    # 列宽
+    # ===============================
+    ws.column_dimensions[get_column_letter(start_col)].width = 22  # 分销商
+    ws.column_dimensions[get_column_letter(start_col + 1)].width = 22  # 名称
+    ws.column_dimensions[get_column_letter(start_col + 2)].width = 15  # 供货价
+    ws.column_dimensions[get_column_letter(start_col + 3)].width = 15
+    ws.column_dimensions[get_column_letter(start_col + 4)].width = 15
+    ws.column_dimensions[get_column_letter(start_col + 5)].width = 15
 
-            # ===============================
-            # 打开 Excel 进行写入
-            # ===============================
-            wb = load_workbook(file_path)
-            ws = wb["Sheet1"]
-
-            # 找「商家编码」列
-            code_col = None
-            for c in range(1, ws.max_column + 1):
-                if ws.cell(1, c).value == "商家编码":
-                    code_col = c
-                    break
-            if not code_col:
-                print(f"跳过 {file_name}：未找到'商家编码'列")
-                continue
+    for i in range(1, 4):  # 间隔列
+        ws.column_dimensions[get_column_letter(code_col + i)].width = 6
 
-            start_col = code_col + 4  # 间隔 3 列
+    # ===============================
+    # 未匹配编码提示（不影响列宽）
+    # ===============================
+    warn_row = total_row + 2
+
+    # 未匹配编码
+    if unmatched_codes:
+        ws.cell(
+            warn_row,
+            start_col,
+            "⚠ 以下商家编码未在编码表中匹配，请人工核对"
+        ).style = styles.WARNING
+        ws.cell(
+            warn_row + 1,
+            start_col,
+            ", ".join(sorted(unmatched_codes))
+        ).style = styles.WARNING
+        warn_row += 3
+
+    # 缺失供货价
+    if missing_price_names:
+        ws.cell(
+            warn_row,
+            start_col,
+            "⚠ 以下商品未配置供货价，请补充后重新计算"
+        ).style = styles.WARNING
+        ws.cell(
+            warn_row + 1,
+            start_col,
+            ", ".join(sorted(missing_price_names))
+        ).style = styles.WARNING
 
-            # ===============================
-            # 解除旧合并（关键）
-            # ===============================
-            for rng in list(ws.merged_cells.ranges):
-                if rng.min_col >= start_col:
-                    ws.unmerge_cells(str(rng))
+    # ===============================
+    # 价格类型提示
+    # ===============================
+    if use_tax_price:
+        ws.cell(
+            warn_row + 2 if warn_row > total_row + 2 else total_row + 2,
+            start_col,
+            f"📝 注：本表使用含税价格（供货价（含税））"
+        )
+
+    monitor.mark("保存")
+    save_workbook_atomic(wb, file_path)
+
+    # 结果另存一份缓存，供结果浏览、导出等功能直接读取
+    result["source"] = source_stamp(file_path)
+    save_result(data_folder, result)
+    if settings.get("sku_index", True):
+        record_file_result(data_folder, result, version, code_info, tax_distributor_map)
+    if journal is not None:
+        journal.record("saved", file_name, unchanged=False)
+    print(f"✅ 已处理：{file_name}")
+    file_entry.update(status="成功", unchanged=False, rows=len(rows), unmatched=len(unmatched_codes))
+    return True
+
+
+def process_all_files(data_folder=None, mapping_file=None, queue_batch=None, resume=None, only_files=None):
+    """
+    原有的处理逻辑，包装成函数
 
-            # ===============================
-            # 清空旧结果区
-            # ===============================
-            for r in range(1, ws.max_row + 1):
-                for c in range(start_col, ws.max_column + 1):
-                    ws.cell(r, c).value = None
-                    ws.cell(r, c).border = Border()
+    Args:
+        data_folder: 数据文件夹，默认 DATA_FOLDER
+        mapping_file: 编码表路径，默认 MAPPING_FILE（指定 data_folder 时为其下的 编码表\编码.xlsx）
+        queue_batch: 以队列模式运行并使用该批次号；为 None 时按配置 queue_mode 决定
+        resume: 续跑最近一次中断的运行（见 function/journal）；为 None 时按配置 resume_unfinished 决定
+        only_files: 只处理这些文件名（编码表变化后的选择性重算，见 function/sku_index）
+    """
+    # ===============================
+    # 路径配置 - 已根据要求修改
+    # ===============================
+    if data_folder is None:
+        data_folder = DATA_FOLDER
+        mapping_file = mapping_file or MAPPING_FILE
+    else:
+        mapping_file = mapping_file or os.path.join(data_folder, "编码表", "编码.xlsx")
 
-            # ===============================
-            # 表头（保持"供货价"不变）
-            # ===============================
-            headers = ["分销商", "名称", "供货价", "数量", "售后处理费", "金额"]
-            for i, h in enumerate(headers):
-                cell = ws.cell(1, start_col + i, h)
-                cell.border = border
+    # 检查路径是否存在
+    if not os.path.exists(data_folder):
+        raise FileNotFoundError(f"数据文件夹不存在: {data_folder}")
 
-            # ===============================
-            # 列字母（一次算好）
-            # ===============================
-            from openpyxl.utils import get_column_letter
-            price_col = get_column_letter(start_col + 2)
-            qty_col = get_column_letter(start_col + 3)
-            fee_col = get_column_letter(start_col + 4)
-            amt_col = get_column_letter(start_col + 5)
+    if not os.path.exists(mapping_file):
+        raise FileNotFoundError(f"编码文件不存在: {mapping_file}")
 
-            # ===============================
-            # 写数据
-            # ===============================
-            start_row = 2
-            r = start_row
+    print(f"数据文件夹: {data_folder}")
+    print(f"编码文件: {mapping_file}")
 
-            for name, info in final.items():
-                ws.cell(r, start_col + 1, name)
-                ws.cell(r, start_col + 2, info["供货价"])
-                ws.cell(r, start_col + 3, -info["数量"])
+    settings = load_settings()
+    bundle_cache.resize(settings["bundle_cache_size"])
 
-                ws.cell(r, start_col + 4, f"={qty_col}{r}*1")
-                ws.cell(
-                    r,
-                    start_col + 5,
-                    f"={price_col}{r}*{qty_col}{r}-{fee_col}{r}"
-                )
-                r += 1
+    from function.monitor import ResourceMonitor
+    from function.run_report import RunReport
+    report = RunReport("对账", data_folder)
+    monitor = ResourceMonitor.from_settings(settings)
+    monitor.start()
 
-            end_row = r - 1
+    # ===============================
+    # 读取编码表并建立映射关系
+    # ===============================
+    # 文件隔离时由工作进程读取编码表，主进程只在预检时需要
+    preflight_mode = str(settings.get("preflight_mode", "off")).lower()
+    isolated = bool(settings.get("file_isolation"))
+    if not isolated or preflight_mode in ("report", "block"):
+        monitor.mark("编码表")
+        tax_distributor_map, code_info, version, reloaded = get_mapping(mapping_file)
+        if not reloaded:
+            print("编码表未变化，使用已加载的编码表")
 
-            # ===============================
-            # 分销商合并（安全）
-            # ===============================
-            if end_row >= start_row:
-                ws.cell(start_row, start_col).value = file_stem
-                ws.merge_cells(
-                    start_row=start_row,
-                    start_column=start_col,
-                    end_row=end_row,
-                    end_column=start_col
-                )
-                # 添加垂直水平居中样式（修复弃用警告）
-                ws.cell(start_row, start_col).alignment = Alignment(
-                    horizontal='center',
-                    vertical='center'
-                )
+        print(f"含税分销商列表: {list(tax_distributor_map.keys())}")
 
-            # ===============================
-            # 汇总行
-            # ===============================
-            total_row = end_row + 1
-            ws.cell(total_row, start_col + 1, "合计")
-            ws.cell(
-                total_row,
-                start_col + 3,
-                f"=SUM({qty_col}{start_row}:{qty_col}{end_row})"
-            )
-            ws.cell(
-                total_row,
-                start_col + 4,
-                f"=SUM({fee_col}{start_row}:{fee_col}{end_row})"
-            )
-            ws.cell(
-                total_row,
-                start_col + 5,
-                f"=SUM({amt_col}{start_row}:{amt_col}{end_row})"
-            )
+    # ===============================
+    # 预检（可选）
+    # ===============================
+    if preflight_mode in ("report", "block"):
+        monitor.mark("预检")
+        from function.preflight import run_preflight, print_preflight_report
+        preflight_report = run_preflight(data_folder, code_info, tax_distributor_map, version)
+        print_preflight_report(preflight_report)
+        report.set("preflight", preflight_report.files)
+        if preflight_mode == "block" and preflight_report.has_issues:
+            print("❌ 预检未通过，已取消本次对账，请修正上述问题后重新执行")
+            _finish_report(report, monitor)
+            return False
 
-            # ===============================
-            # 边框和居中（表头 + 数据 + 合计）
-            # ===============================
-            for row in range(1, total_row + 1):
-                for col in range(start_col, start_col + len(headers)):
-                    cell = ws.cell(row, col)
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
+    success_count = 0
+    error_count = 0
+    unchanged_count = 0  # 结果未变化、跳过保存的文件数
+    multiple_code_files = []  # 记录有多重编码字段的文件
 
-            # ===============================
-            # 列宽
-            # ===============================
-            ws.column_dimensions[get_column_letter(start_col)].width = 22  # 分销商
-            ws.column_dimensions[get_column_letter(start_col + 1)].width = 22  # 名称
-            ws.column_dimensions[get_column_letter(start_col + 2)].width = 15  # 供货价
-            ws.column_dimensions[get_column_letter(start_col + 3)].width = 15
-            ws.column_dimensions[get_column_letter(start_col + 4)].width = 15
-            ws.column_dimensions[get_column_letter(start_col + 5)].width = 15
+    # ===============================
+    # 处理文件
+    # ===============================
+    # 获取所有Excel文件（支持.xls和.xlsx），跳过 Excel 打开文件时生成的 ~$ 临时文件
+    excel_files = [f for f in list_excel_files(data_folder) if not os.path.basename(f).startswith("~$")]
+    if only_files is not None:
+        excel_files = [f for f in excel_files if os.path.basename(f) in set(only_files)]
+        report.set("only_files", list(only_files))
 
-            for i in range(1, 4):  # 间隔列
-                ws.column_dimensions[get_column_letter(code_col + i)].width = 6
+    if not excel_files:
+        print(f"❌ 在文件夹 {data_folder} 中未找到Excel文件")
+        _finish_report(report, monitor)
+        return False
 
-            # ===============================
-            # 未匹配编码提示（不影响列宽）
-            # ===============================
-            warn_row = total_row + 2
-
-            # 未匹配编码
-            if unmatched_codes:
-                ws.cell(
-                    warn_row,
-                    start_col,
-                    "⚠ 以下商家编码未在编码表中匹配，请人工核对"
-                ).font = red_font
-                ws.cell(
-                    warn_row + 1,
-                    start_col,
-                    ", ".join(sorted(unmatched_codes))
-                ).font = red_font
-                warn_row += 3
-
-            # 缺失供货价
-            if missing_price_names:
-                ws.cell(
-                    warn_row,
-                    start_col,
-                    "⚠ 以下商品未配置供货价，请补充后重新计算"
-                ).font = red_font
-                ws.cell(
-                    warn_row + 1,
-                    start_col,
-                    ", ".join(sorted(missing_price_names))
-                ).font = red_font
+    # ===============================
+    # 队列模式（可选）
+    # ===============================
+    queue = None
+    if queue_batch is not None or settings.get("queue_mode"):
+        from function.job_queue import JobQueue
+        queue = JobQueue(
+            data_folder,
+            queue_batch or settings.get("queue_batch") or None,
+            settings["queue_lease_seconds"]
+        )
+        report.set("queue", {"batch": queue.batch, "worker": queue.worker_id})
+        report.suffix = queue.worker_id
+        print(f"队列模式：批次 {queue.batch}，进程 {queue.worker_id}")
 
-            # ===============================
-            # 价格类型提示
-            # ===============================
-            if use_tax_price:
-                ws.cell(
-                    warn_row + 2 if warn_row > total_row + 2 else total_row + 2,
-                    start_col,
-                    f"📝 注：本表使用含税价格（供货价（含税））"
-                )
+    # ===============================
+    # 运行日志与续跑
+    # ===============================
+    from function.journal import RunJournal, latest_unfinished, prune_journals
+    if resume is None:
+        resume = bool(settings.get("resume_unfinished"))
+    batch = queue.batch if queue is not None else None
+    unfinished = latest_unfinished(data_folder, batch) if resume else None
+    if unfinished is None:
+        prune_journals(data_folder, settings.get("journal_keep_days"))
+    journal = RunJournal(data_folder, unfinished)
+    if journal.resumed:
+        # 按上次记录的文件列表续跑（包括 only_files / 队列运行），而不是当前文件夹中的全部文件
+        planned = set(journal.planned_files())
+        saved_files = journal.saved_files()
+        print(f"↻ 续跑上次中断的运行：共 {len(planned)} 个文件，已保存 {len(saved_files)} 个，将跳过")
+        excel_files = [f for f in list_excel_files(data_folder)
+                       if os.path.basename(f) in planned and os.path.basename(f) not in saved_files]
+        report.set("resumed_from", journal.path)
+    else:
+        journal.start([os.path.basename(f) for f in excel_files], batch,
+                      queue.worker_id if queue is not None else None)
+    report.set("journal", journal.path)
 
-            wb.save(file_path)
-            print(f"✅ 已处理：{file_name}")
-            success_count += 1
+    # ===============================
+    # 文件隔离（可选）：每个文件在工作进程中处理，超时 / 超内存时结束并回收
+    # ===============================
+    worker = None
+    if isolated:
+        from function.worker import FileWorker
+        worker = FileWorker(mapping_file, settings)
+        print(f"文件隔离：每个文件限时 {settings['file_timeout_seconds'] or '不限'} 秒，"
+              f"内存上限 {settings['file_memory_limit_mb'] or '不限'} MB")
+
+    pending = excel_files
+    while pending:
+        for file_path in pending:
+            file_name = os.path.basename(file_path)
 
-        except Exception as e:
-            print(f"❌ 处理失败：{file_name} → {e}")
-            import traceback
-            traceback.print_exc()
-            error_count += 1
+            # 队列模式下只处理自己领取到的文件
+            if queue is not None and not queue.claim(file_name):
+                continue
+
+            status, reason = "失败", None
+            try:
+                print(f"正在处理: {file_name}")
+                journal.record("started", file_name)
+                file_entry = report.file_entry(file_name)
+                if worker is not None:
+                    processed, memory_record = worker.process(file_path, file_entry, journal)
+                    if memory_record is not None:
+                        monitor.add_file(file_name, memory_record)
+                else:
+                    monitor.start_file(file_name, os.path.getsize(file_path))
+                    processed = process_file(file_path, code_info, tax_distributor_map, version, settings, monitor,
+                                             file_entry, journal)
+
+                if processed:
+                    success_count += 1
+                    if file_entry.get("unchanged"):
+                        unchanged_count += 1
+                else:
+                    error_count += 1
+                    journal.record("skipped", file_name, reason=file_entry.get("reason"))
+                    if file_entry.get("reason") == MULTIPLE_CODE_REASON:
+                        multiple_code_files.append(file_name)
+                status, reason = file_entry.get("status"), file_entry.get("reason")
+
+            except Exception as e:
+                print(f"❌ 处理失败：{file_name} → {e}")
+                if worker is None:
+                    import traceback
+                    traceback.print_exc()
+                error_count += 1
+                reason = str(e)
+                journal.record("failed", file_name, reason=reason)
+                report.file_entry(file_name).update(status="失败", reason=reason)
+
+            finally:
+                if queue is not None:
+                    queue.complete(file_name, status, reason)
+
+        if queue is None:
+            break
+
+        # 等待其他进程处理中的文件；其租约失效（进程崩溃）后在下一轮被回收
+        state = queue.status([os.path.basename(f) for f in pending])
+        pending = [f for f in pending if os.path.basename(f) not in state["done"]]
+        if pending:
+            print(f"⏳ 等待其他进程完成 {len(pending)} 个文件...")
+            time.sleep(settings["queue_poll_seconds"])
+
+    if worker is not None:
+        worker.close()
+        monitor.add_peak(worker.peak_rss_mb)
+        report.set("workers_started", worker.started_count)
+    monitor.end_file()
+    journal.close()
+    if queue is not None:
+        queue.close()
+        done = queue.results()
+        report.section("queue")["done"] = done
+        print(f"队列批次 {queue.batch}：共完成 {len(done)} 个文件（本进程成功 {success_count}，失败 {error_count}）")
 
     # ===============================
     # 输出汇总信息
     # ===============================
     print(f"\n处理完成！成功：{success_count} 个文件，失败：{error_count} 个文件")
+    if unchanged_count:
+        print(f"其中 {unchanged_count} 个文件结果未变化，未重新保存")
+    # 文件隔离时解析缓存在工作进程中，使用工作进程发回的统计
+    if worker is None:
+        cache_size, cache_hit_rate = len(bundle_cache), bundle_cache.hit_rate()
+    else:
+        cache_size, cache_hit_rate = worker.cache_size, worker.cache_hit_rate()
+    print(f"解析缓存：{cache_size} 条，命中率 {cache_hit_rate:.1%}")
 
     if multiple_code_files:
         print(f"\n⚠ 以下文件因有多个'商家编码'字段未处理：")
@@ -484,4 +1071,35 @@ def process_all_files():
             print(f"  • {file_name}")
         print(f"请检查这些文件，删除多余的'商家编码'列后重新执行")
 
+    report.set("success_count", success_count)
+    report.set("error_count", error_count)
+    report.set("unchanged_count", unchanged_count)
+
+    # 队列模式下导出与查询索引覆盖整个批次，只由最后完成的一个进程生成
+    finishing = queue is None or queue.claim_finish()
+    if not finishing:
+        print("导出与查询索引由本批次的其他进程生成")
+
+    # ===============================
+    # 导出（可选）
+    # ===============================
+    if finishing and settings.get("export_formats"):
+        try:
+            from function.export import export_results
+            report.set("exports", export_results(data_folder, formats=settings["export_formats"]))
+        except Exception as e:
+            print(f"⚠ 导出失败: {e}")
+
+    # ===============================
+    # 编码 / 名称查询索引
+    # ===============================
+    if finishing and settings.get("sku_search_index", True):
+        try:
+            from function.sku_search import build_index
+            build_index(data_folder)
+        except Exception as e:
+            print(f"⚠ 查询索引生成失败: {e}")
+
+    report.set("bundle_cache", {"size": cache_size, "hit_rate": round(cache_hit_rate, 4)})
+    _finish_report(report, monitor)
     return True
\ No newline at end of file
@@ -45,7 +45,9 @@ class ReconciliationWorker(QThread):
                 self.output_signal.emit("=" * 24)
 
             if self.running:
-                success = run_reconciliation_with_gui(output_callback)
+                success = self._run_in_service(output_callback)
+                if success is None:
+                    success = run_reconciliation_with_gui(output_callback)
 
                 if success:
                     self.finished_signal.emit(True, "✅ 对账处理完成！")
@@ -61,6 +63,19 @@ class ReconciliationWorker(QThread):
                 self.output_signal.emit(f"❌ 执行过程中发生错误: {str(e)}")
                 self.finished_signal.emit(False, f"❌ 执行过程中发生错误: {str(e)}")
 
+    def _run_in_service(self, output_callback):
+        """常驻服务在运行时把任务交给服务执行；服务未运行或已关闭该功能时返回 None"""
+        from function.reconciliation import load_settings
+        if str(load_settings().get("service_mode", "auto")).lower() == "off":
+            return None
+
+        from function.service import submit_job, ServiceUnavailable
+        try:
+            success = submit_job(output_callback)
+        except ServiceUnavailable:
+            return None
+        return success
+
     def stop(self):
         """停止线程"""
         self.running = False
\ No newline at end of file
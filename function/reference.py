@@ -0,0 +1,115 @@
+# function/reference.py
+"""
+对账计算的参考实现 - 保留最初的逐行循环，作为优化后实现的比对基准
+
+这里的代码刻意保持原样：编码表为「编码 → 字典」，逐个单元格、逐个商家编码解析，
+不做缓存、不去重。任何替换 count_codes / parse_bundle / summarize 的实现（新的解析器、
+数组化的计数、流式分块等）都必须与这里的结果完全一致，见 function/difftest.py。
+
+不要为了性能修改本模块。
+"""
+import re
+from collections import defaultdict
+
+import pandas as pd
+
+
+def build_code_info(map_df):
+    """由编码表 DataFrame 建立编码信息字典 {编码: {"name", "type", "price", "tax_price"}}"""
+    code_info = {}
+    for _, row in map_df.iterrows():
+        code = str(row["货品商家编码"])
+        code_info[code] = {
+            "name": str(row["名称"]),
+            "type": str(row["产品类型"]),
+            "price": float(row["供货价"]),  # 标准供货价
+            "tax_price": float(row["供货价（含税）"]) if pd.notna(row["供货价（含税）"]) else None  # 含税供货价
+        }
+    return code_info
+
+
+def count_codes(cells, code_info):
+    """
+    解析商家编码（含组合拆分与赠品分摊）
+
+    Returns:
+        (code_counter, unmatched_codes)：{编码: 数量}（按首次出现顺序）与未匹配编码集合
+    """
+    code_counter = defaultdict(int)
+    unmatched_codes = set()
+
+    for cell in cells:
+        items = str(cell).split(";")
+        normal_total = 0
+        gift_items = []
+
+        for item in items:
+            m = re.match(r"(.+?)(?:\*(\d+))?$", item.strip())
+            if not m:
+                continue
+
+            code = m.group(1)
+            qty = int(m.group(2)) if m.group(2) else 1
+
+            info = code_info.get(code)
+            if not info:
+                unmatched_codes.add(code)
+                continue
+
+            if info["type"] == "赠品":
+                gift_items.append((code, qty))
+            else:
+                normal_total += qty
+                code_counter[code] += qty
+
+        gift_total = sum(q for _, q in gift_items)
+
+        if normal_total == 0:
+            for code, qty in gift_items:
+                code_counter[code] += qty
+            continue
+
+        extra = gift_total - normal_total
+        if extra > 0:
+            for code, qty in gift_items:
+                use = min(qty, extra)
+                code_counter[code] += use
+                extra -= use
+                if extra <= 0:
+                    break
+
+    return dict(code_counter), unmatched_codes
+
+
+def summarize(code_counter, code_info, use_tax_price):
+    """
+    汇总到【名称】并根据分销商选择价格
+
+    Returns:
+        (final, missing_price_names)：final 为 {名称: {"数量", "供货价"}}
+    """
+    final = {}
+    missing_price_names = set()
+    for code, qty in code_counter.items():
+        info = code_info[code]
+        name = info["name"]
+
+        # 根据是否使用含税价格选择价格
+        if use_tax_price and info["tax_price"] is not None:
+            price = info["tax_price"]
+        else:
+            price = info["price"]
+
+        # 供货价缺失判断
+        if pd.isna(price) or price == 0:
+            missing_price_names.add(name)
+
+        if name not in final:
+            final[name] = {
+                "数量": 0,
+                "供货价": price if not pd.isna(price) else ""
+            }
+
+        final[name]["数量"] += qty
+
+    return final, missing_price_names
@@ -0,0 +1,210 @@
+# function/result_store.py
+"""
+对账结果缓存 - 每个对账文件的计算结果另存一份 JSON
+
+对账写回 Excel 的同时，把同样的结果保存到 数据文件夹\\.对账缓存\\results\\<文件名（含扩展名）>.json，
+结果浏览、导出、分析等功能直接读取缓存，无需再用 openpyxl 打开工作簿。
+
+单个文件的结果格式：
+    {
+        "file": "36号-上海帝亚.xlsx",
+        "distributor": "36号-上海帝亚",
+        "distributor_code": "36号",
+        "use_tax_price": true,
+        "period": "2026-09",
+        "rows": [{"name": 名称, "type": 产品类型, "price": 供货价, "count": 退货件数, "codes": {编码: 件数}}],
+        "unmatched": [...],
+        "missing_price": [...],
+        "gifts": {编码: 件数},                     # 出现的赠品（含被分摊吸收、未计入 rows 的部分）
+        "source": {"mtime_ns": ..., "size": ...}    # 写回后对账文件的状态，用于判断工作簿是否被改动过
+    }
+表格中的 数量 = -count，售后处理费 = 数量 × 1，金额 = 供货价 × 数量 - 售后处理费。
+"""
+import os
+import json
+import tempfile
+from datetime import date
+
+CACHE_FOLDER_NAME = ".对账缓存"
+RESULTS_FOLDER_NAME = "results"
+
+
+def cache_folder(data_folder):
+    return os.path.join(data_folder, CACHE_FOLDER_NAME)
+
+
+def results_folder(data_folder):
+    return os.path.join(cache_folder(data_folder), RESULTS_FOLDER_NAME)
+
+
+def current_period(today=None):
+    """当前对账所属期间（上个月），格式 YYYY-MM，与汇总表文件名的月份一致"""
+    today = today or date.today()
+    year, month = today.year, today.month - 1
+    if month == 0:
+        year, month = year - 1, 12
+    return f"{year}-{month:02d}"
+
+
+def build_result(file_name, distributor_code, use_tax_price, final, unmatched_codes, missing_price_names,
+                 period=None):
+    """把 process_all_files 中的 final 等中间结果整理为可缓存的结构"""
+    rows = []
+    for name, info in final.items():
+        rows.append({
+            "name": name,
+            "type": info.get("类型", ""),
+            "price": info["供货价"],
+            "count": info["数量"],
+            "codes": dict(info.get("编码", {})),
+        })
+
+    return {
+        "file": file_name,
+        "distributor": os.path.splitext(file_name)[0],
+        "distributor_code": distributor_code,
+        "use_tax_price": use_tax_price,
+        "period": period or current_period(),
+        "rows": rows,
+        "unmatched": sorted(unmatched_codes),
+        "missing_price": sorted(missing_price_names),
+    }
+
+
+def sheet_values(row):
+    """按对账表中的公式换算：返回 (供货价, 数量, 售后处理费, 金额)"""
+    price = row["price"]
+    qty = -row["count"]
+    fee = qty * 1
+    amount = price * qty - fee if isinstance(price, (int, float)) else None
+    return price, qty, fee, amount
+
+
+def source_stamp(file_path):
+    """对账文件当前的修改时间与大小"""
+    stat = os.stat(file_path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _comparable(result):
+    """结果中决定工作簿写入内容的部分（经 JSON 往返，使新旧结果的类型一致）"""
+    keys = ("distributor", "use_tax_price", "rows", "unmatched", "missing_price")
+    return json.loads(json.dumps({key: result.get(key) for key in keys}, ensure_ascii=False))
+
+
+def is_unchanged(previous, result, file_path):
+    """
+    判断本次结果与上次写回工作簿的结果是否完全相同
+
+    只有对账文件自上次写回后未被改动（修改时间与大小一致）时，缓存才代表工作簿中的内容；
+    否则一律视为有变化。
+    """
+    if not previous or previous.get("source") != source_stamp(file_path):
+        return False
+    return _comparable(previous) == _comparable(result)
+
+
+def diff_results(previous, result, limit=None):
+    """
+    逐个编码比较两次结果
+
+    Returns:
+        [{"code": 编码, "name": 名称, "before": 上次件数, "after": 本次件数}, ...]，
+        另外供货价有变化的名称记为 {"name": 名称, "price_before": ..., "price_after": ...}
+    """
+    def index(res):
+        codes, prices = {}, {}
+        for row in _comparable(res)["rows"] or []:
+            prices[row["name"]] = row["price"]
+            for code, qty in row["codes"].items():
+                codes[code] = (row["name"], qty)
+        return codes, prices
+
+    old_codes, old_prices = index(previous or {})
+    new_codes, new_prices = index(result)
+
+    changes = []
+    for code in list(new_codes) + [c for c in old_codes if c not in new_codes]:
+        name, after = new_codes.get(code, (None, 0))
+        old_name, before = old_codes.get(code, (None, 0))
+        if before != after:
+            changes.append({"code": code, "name": name or old_name, "before": before, "after": after})
+
+    for name, price in new_prices.items():
+        if name in old_prices and old_prices[name] != price:
+            changes.append({"name": name, "price_before": old_prices[name], "price_after": price})
+
+    return changes[:limit] if limit else changes
+
+
+def _result_path(data_folder, file_name):
+    # 文件名保留扩展名，A.xls 与 A.xlsx 各有一份缓存
+    return os.path.join(results_folder(data_folder), file_name + ".json")
+
+
+def save_result(data_folder, result):
+    """写入单个文件的结果（先写入唯一的临时文件再替换，避免读到半截内容、多个进程互相覆盖）"""
+    folder = results_folder(data_folder)
+    os.makedirs(folder, exist_ok=True)
+    path = _result_path(data_folder, result["file"])
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def load_result(data_folder, file_name):
+    """读取单个文件的结果，不存在时返回 None"""
+    path = _result_path(data_folder, file_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_current(data_folder, result):
+    """缓存是否仍代表数据文件夹中的对账文件：文件存在，且修改时间与大小与写回时一致"""
+    try:
+        return result.get("source") == source_stamp(os.path.join(data_folder, result["file"]))
+    except (OSError, KeyError):
+        return False
+
+
+def load_results(data_folder, period=None):
+    """
+    读取全部缓存结果
+
+    对账文件已删除、改名或对账后被改动过的缓存不返回，避免分析、导出、查询中重复或过期的数据
+
+    Args:
+        period: 只返回指定期间（YYYY-MM）的结果，None 表示全部
+    """
+    folder = results_folder(data_folder)
+    if not os.path.isdir(folder):
+        return []
+
+    results, stale = [], 0
+    for entry in sorted(os.listdir(folder)):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(folder, entry), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except Exception as e:
+            print(f"⚠ 读取结果缓存失败：{entry} → {e}")
+            continue
+        if period is not None and result.get("period") != period:
+            continue
+        if not is_current(data_folder, result):
+            stale += 1
+            continue
+        results.append(result)
+    if stale:
+        print(f"⚠ 跳过 {stale} 个过期的结果缓存（对账文件已删除、改名或在对账后被修改，重新对账后恢复）")
+    return results
@@ -0,0 +1,95 @@
+# function/run_report.py
+"""
+运行报告 - 每次对账 / 汇总结束后写入一份 JSON 报告
+
+报告保存在 数据文件夹\\运行报告 下，文件名形如 对账-20260131-235959.json。
+各功能模块通过 RunReport.section() / file_entry() 往报告里追加内容。
+"""
+import os
+import json
+import time
+from datetime import datetime
+
+REPORT_FOLDER_NAME = "运行报告"
+
+# 保存报告时自动附加的段落：{段落名: 返回内容的函数}，例如界面卡顿统计
+_section_providers = {}
+# 新的运行开始（创建报告）时调用的函数：{段落名: 清零函数}，使段落只统计本次运行
+_section_resets = {}
+
+
+def register_section(name, provider, reset=None):
+    """
+    注册一个段落，之后保存的每份报告都会调用 provider() 写入该段落
+
+    Args:
+        reset: 每次创建报告（一次运行开始）时调用，清零上次运行的统计；为 None 时一直累计
+    """
+    _section_providers[name] = provider
+    if reset is not None:
+        _section_resets[name] = reset
+
+
+def unregister_section(name):
+    _section_providers.pop(name, None)
+    _section_resets.pop(name, None)
+
+
+class RunReport:
+    """一次运行的报告"""
+
+    def __init__(self, kind, data_folder):
+        self.kind = kind
+        self.data_folder = data_folder
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.suffix = None  # 多个进程同时运行时附加到文件名，避免互相覆盖
+        self.data = {
+            "kind": kind,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": None,
+            "files": {},
+        }
+        for reset in list(_section_resets.values()):
+            reset()
+
+    def section(self, name):
+        """获取（不存在时创建）报告中的一个段落"""
+        return self.data.setdefault(name, {})
+
+    def file_entry(self, file_name):
+        """获取（不存在时创建）某个文件的记录"""
+        return self.data["files"].setdefault(file_name, {})
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def save(self):
+        """写入报告文件，返回文件路径；写入失败时返回 None"""
+        self.data["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        self.data["elapsed_seconds"] = round(time.perf_counter() - self._started, 3)
+        for name, provider in list(_section_providers.items()):
+            try:
+                self.data[name] = provider()
+            except Exception as e:
+                self.data[name] = {"error": str(e)}
+        report_dir = os.path.join(self.data_folder, REPORT_FOLDER_NAME)
+        stem = f"{self.kind}-{self.started_at.strftime('%Y%m%d-%H%M%S')}"
+        if self.suffix:
+            stem += f"-{self.suffix}"
+        report_path = os.path.join(report_dir, stem + ".json")
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2, default=str)
+        except Exception as e:
+            print(f"⚠ 运行报告保存失败: {e}")
+            return None
+
+        # 性能指标追加到运行历史（见 function/history.py）
+        try:
+            from function.history import record_run
+            record_run(self.data_folder, self.data)
+        except Exception as e:
+            print(f"⚠ 运行历史记录失败: {e}")
+        return report_path
@@ -0,0 +1,377 @@
+# function/service.py
+"""
+常驻对账服务 - 在后台进程中保持 pandas / openpyxl 已导入、编码表已加载
+
+界面与命令行通过本机 TCP 端口提交任务，省去每次运行的导入与编码表读取时间；
+编码.xlsx 修改后由后台线程自动重新加载（热更新），下一次任务直接使用新编码表。
+
+通信协议：每条消息为一行 JSON（UTF-8）
+    请求   {"command": "ping" | "run" | "stop", "token": ..., "options": {...}}
+    响应   {"type": "output", "text": ...}          任务输出，逐行发送
+           {"type": "finished", "success": bool}   任务结束
+           {"type": "pong", ...}                   服务状态
+           {"type": "error", "message": ...}
+
+访问控制：服务启动时在用户配置目录（~/.distributor_tool/service.token，仅本用户可读）生成令牌，
+客户端读取同一文件并随每个请求发送，令牌不符的请求一律拒绝，本机其他用户无法提交任务或停止服务。
+options 只接受 process_all_files 的参数（见 ALLOWED_OPTIONS），其他键直接拒绝。
+
+命令行用法：
+    python -m function.service serve [--port 47821] [--folder D:\\分销对账]
+    python -m function.service run [--folder ...]
+    python -m function.service status
+    python -m function.service stop
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import secrets
+import threading
+import socketserver
+from datetime import datetime
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 47821
+CONNECT_TIMEOUT = 0.3       # 连接服务的超时（秒），服务未运行时界面几乎无等待
+RELOAD_INTERVAL = 2.0       # 检查编码表是否修改的间隔（秒）
+TOKEN_FILE_NAME = "service.token"
+
+# run 命令允许的 options 及其类型（与 process_all_files 的参数一致），None 表示使用默认值
+ALLOWED_OPTIONS = {
+    "data_folder": (str,),
+    "mapping_file": (str,),
+    "queue_batch": (str, int),
+    "resume": (bool,),
+    "only_files": (list,),
+}
+
+
+class ServiceUnavailable(ConnectionError):
+    """常驻服务未运行或无法连接"""
+
+
+def service_port(port=None):
+    """服务端口：参数优先，其次为配置 settings.reconciliation.service_port"""
+    if port:
+        return int(port)
+    try:
+        from function.reconciliation import load_settings
+        return int(load_settings().get("service_port", DEFAULT_PORT))
+    except Exception:
+        return DEFAULT_PORT
+
+
+def token_path():
+    from config_manager import config_manager
+    return os.path.join(str(config_manager.CONFIG_DIR), TOKEN_FILE_NAME)
+
+
+def load_token(create=False):
+    """读取服务令牌；create 为 True 且文件不存在时生成（仅本用户可读写），否则返回 None"""
+    path = token_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    if not create:
+        return None
+
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def check_options(options):
+    """检查 run 命令的 options，返回错误信息；合法时返回 None"""
+    if not isinstance(options, dict):
+        return "options 必须是对象"
+    for key, value in options.items():
+        if key not in ALLOWED_OPTIONS:
+            return f"不支持的参数: {key}"
+        if value is not None and not isinstance(value, ALLOWED_OPTIONS[key]):
+            return f"参数类型错误: {key}"
+    only_files = options.get("only_files")
+    if only_files is not None and not all(isinstance(name, str) for name in only_files):
+        return "参数类型错误: only_files"
+    return None
+
+
+def _send(conn, message):
+    conn.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+# ===============================
+# 服务端
+# ===============================
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8") or "{}")
+        except ValueError:
+            _send(self.connection, {"type": "error", "message": "无法解析的请求"})
+            return
+
+        token = request.get("token") if isinstance(request, dict) else None
+        if not isinstance(token, str) or not hmac.compare_digest(token, service.token):
+            _send(self.connection, {"type": "error", "message": "未授权的请求（令牌不符）"})
+            return
+
+        command = request.get("command")
+        if command == "ping":
+            _send(self.connection, {"type": "pong", **service.status()})
+        elif command == "run":
+            options = request.get("options") or {}
+            error = check_options(options)
+            if error:
+                _send(self.connection, {"type": "error", "message": error})
+            else:
+                service.run_job(self.connection, options)
+        elif command == "stop":
+            _send(self.connection, {"type": "finished", "success": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            _send(self.connection, {"type": "error", "message": f"未知命令: {command}"})
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = sys.platform != "win32"
+    daemon_threads = True
+
+
+class ReconciliationService:
+    """常驻对账服务：任务串行执行，编码表在后台热更新"""
+
+    def __init__(self, port=None, data_folder=None, log=None):
+        self.port = service_port(port)
+        self.data_folder = data_folder
+        self.log = log or (lambda msg: print(msg, file=sys.__stdout__, flush=True))
+        self.started_at = datetime.now()
+        self.jobs = 0
+        self.busy = False
+
+        self.token = None
+
+        self._job_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._server = None
+
+    def _mapping_file(self):
+        from function.reconciliation import MAPPING_FILE
+        if self.data_folder:
+            return os.path.join(self.data_folder, "编码表", "编码.xlsx")
+        return MAPPING_FILE
+
+    # ===============================
+    # 预热与热更新
+    # ===============================
+    def warm_up(self):
+        """导入重量级模块并预先加载编码表"""
+        started = time.perf_counter()
+        import pandas  # noqa: F401
+        import openpyxl  # noqa: F401
+        from function.reconciliation import get_mapping
+
+        mapping_file = self._mapping_file()
+        if os.path.exists(mapping_file):
+            _, code_info, _, _ = get_mapping(mapping_file)
+            self.log(f"✅ 已加载编码表：{len(code_info)} 个编码")
+        else:
+            self.log(f"⚠ 编码文件不存在: {mapping_file}，将在首次任务时加载")
+        self.log(f"预热完成，用时 {time.perf_counter() - started:.2f} 秒")
+
+    def _reload_loop(self):
+        from function.reconciliation import get_mapping
+
+        while not self._stop_event.wait(RELOAD_INTERVAL):
+            mapping_file = self._mapping_file()
+            if not os.path.exists(mapping_file):
+                continue
+            try:
+                _, code_info, _, reloaded = get_mapping(mapping_file)
+                if reloaded:
+                    self.log(f"↻ 编码表已更新，重新加载：{len(code_info)} 个编码")
+            except Exception as e:
+                # 编码表可能正在被 Excel 保存，下一轮再试
+                self.log(f"⚠ 重新加载编码表失败: {e}")
+
+    # ===============================
+    # 任务
+    # ===============================
+    def run_job(self, conn, options):
+        from function.reconciliation import run_reconciliation_with_gui
+
+        disconnected = []
+
+        def output_callback(text):
+            if disconnected:
+                return
+            try:
+                _send(conn, {"type": "output", "text": text})
+            except OSError:
+                # 客户端已断开，任务继续执行，结果照常写入
+                disconnected.append(True)
+
+        if self._job_lock.locked():
+            output_callback("⏳ 服务正在执行其他任务，排队等待...")
+
+        with self._job_lock:
+            self.busy = True
+            self.jobs += 1
+            if self.data_folder and "data_folder" not in options:
+                options = dict(options, data_folder=self.data_folder)
+            self.log(f"▶ 开始第 {self.jobs} 个任务 {options or ''}")
+            output_callback(f"⚡ 由常驻对账服务执行（进程 {os.getpid()}，编码表已预加载）")
+            started = time.perf_counter()
+            try:
+                success = bool(run_reconciliation_with_gui(output_callback, **options))
+            finally:
+                self.busy = False
+            self.log(f"■ 任务结束（{'成功' if success else '失败'}），用时 {time.perf_counter() - started:.2f} 秒")
+
+        if not disconnected:
+            try:
+                _send(conn, {"type": "finished", "success": success})
+            except OSError:
+                pass
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "jobs": self.jobs,
+            "busy": self.busy,
+            "data_folder": self.data_folder,
+        }
+
+    # ===============================
+    # 启停
+    # ===============================
+    def serve_forever(self):
+        self.token = load_token(create=True)
+        self._server = _Server((HOST, self.port), _Handler)
+        self._server.service = self
+        self.warm_up()
+
+        reloader = threading.Thread(target=self._reload_loop, name="mapping-reloader", daemon=True)
+        reloader.start()
+
+        self.log(f"常驻对账服务已启动：{HOST}:{self.port}（进程 {os.getpid()}）")
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._stop_event.set()
+            self._server.server_close()
+            self.log("常驻对账服务已停止")
+
+
+# ===============================
+# 客户端
+# ===============================
+def _request(message, port=None, timeout=None):
+    """发送请求（附带令牌），逐条返回响应；无法连接或没有令牌时抛出 ServiceUnavailable"""
+    token = load_token()
+    if token is None:
+        raise ServiceUnavailable("常驻服务未运行（没有服务令牌）")
+    try:
+        conn = socket.create_connection((HOST, service_port(port)), timeout=CONNECT_TIMEOUT)
+    except OSError as e:
+        raise ServiceUnavailable(f"常驻服务未运行: {e}") from e
+
+    with conn:
+        conn.settimeout(timeout)
+        _send(conn, dict(message, token=token))
+        with conn.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def ping(port=None):
+    """查询服务状态，服务未运行时返回 None"""
+    try:
+        for response in _request({"command": "ping"}, port, timeout=2):
+            return response
+    except (ServiceUnavailable, OSError, ValueError):
+        return None
+    return None
+
+
+def submit_job(output_callback=None, port=None, **options):
+    """
+    提交对账任务并等待完成
+
+    Args:
+        output_callback: 接收任务输出的回调，不传时打印
+        options: 传给 process_all_files 的参数
+
+    Returns:
+        任务是否成功；服务未运行时抛出 ServiceUnavailable
+    """
+    callback = output_callback or print
+    for response in _request({"command": "run", "options": options}, port):
+        kind = response.get("type")
+        if kind == "output":
+            callback(response.get("text", ""))
+        elif kind == "finished":
+            return bool(response.get("success"))
+        elif kind == "error":
+            callback(f"❌ {response.get('message')}")
+            return False
+    callback("❌ 与常驻服务的连接中断")
+    return False
+
+
+def stop_service(port=None):
+    try:
+        for _ in _request({"command": "stop"}, port, timeout=2):
+            return True
+    except (ServiceUnavailable, OSError):
+        return False
+    return False
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="常驻对账服务")
+    parser.add_argument("command", choices=["serve", "run", "status", "stop"])
+    parser.add_argument("--port", type=int, default=None, help=f"服务端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument("--folder", default=None, help="数据文件夹（默认 DATA_FOLDER）")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        ReconciliationService(args.port, args.folder).serve_forever()
+        return 0
+
+    if args.command == "status":
+        info = ping(args.port)
+        if info is None:
+            print("常驻服务未运行")
+            return 1
+        print(f"常驻服务运行中：进程 {info['pid']}，启动于 {info['started_at']}，"
+              f"已执行 {info['jobs']} 个任务{'，正在执行任务' if info['busy'] else ''}")
+        return 0
+
+    if args.command == "stop":
+        print("常驻服务已停止" if stop_service(args.port) else "常驻服务未运行")
+        return 0
+
+    options = {"data_folder": args.folder} if args.folder else {}
+    try:
+        return 0 if submit_job(port=args.port, **options) else 1
+    except ServiceUnavailable as e:
+        print(f"❌ {e}，请先执行 python -m function.service serve")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+# function/sku_index.py
+"""
+编码索引 - 商家编码 → 使用它的对账文件与结果行；编码表变化时只重算受影响的文件
+
+索引保存在 数据文件夹\\.对账缓存\\sku_index.sqlite3，对账时随每个文件的结果更新：
+    files      (file, distributor_code, use_tax_price, version_id)   文件最近一次计算所用的编码表版本
+    usage      (code, file, name)                                     计入结果的编码及其所在的结果行（名称）
+    unmatched  (code, file)                                           未匹配的编码
+    versions   (id, version, tax_distributors)                        编码表版本与当时的含税分销商
+    mapping    (version_id, code, name, type, price, tax_price)       各版本编码表的快照
+
+编码表更新后，把每个文件所用版本的快照与新编码表逐行比较，按变化的编码找出受影响的文件：
+    供货价 / 名称 / 非赠品类型变化   使用该编码的文件（只改含税价时只取使用含税价的文件）
+    新增编码                         该编码原先未匹配的文件
+    删除编码                         使用该编码的文件
+    赠品 ↔ 非赠品、删除赠品编码       全部文件（被赠品分摊吸收的编码不计入结果，索引中没有记录）
+    含税分销商增减                   对应分销商的文件
+没有索引记录或所用版本快照已清理的文件也会重算。
+
+命令行用法：
+    python -m function.sku_index plan   [--folder D:\\分销对账]     # 列出编码表变化与需要重算的文件
+    python -m function.sku_index reprice [--folder D:\\分销对账]    # 只重算受影响的文件
+    python -m function.sku_index where 编码 [--folder D:\\分销对账]  # 查询使用某编码的文件与结果行
+"""
+import os
+import sys
+import json
+import math
+import sqlite3
+import threading
+
+from function.result_store import cache_folder
+
+INDEX_FILE_NAME = "sku_index.sqlite3"
+GIFT_TYPE = "赠品"
+QUERY_BATCH = 500       # 每次 IN 查询的编码个数（低于 SQLite 的参数上限）
+BUSY_TIMEOUT = 30       # 其他进程正在写入时等待的最长时间（秒）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL UNIQUE,
+    tax_distributors TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mapping (
+    version_id INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT,
+    type TEXT,
+    price REAL,
+    tax_price REAL,
+    PRIMARY KEY (version_id, code)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    distributor_code TEXT,
+    use_tax_price INTEGER NOT NULL,
+    version_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage (
+    code TEXT NOT NULL,
+    file TEXT NOT NULL,
+    name TEXT,
+    PRIMARY KEY (code, file)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS usage_file ON usage (file);
+CREATE TABLE IF NOT EXISTS unmatched (
+    code TEXT NOT NULL,
+    file TEXT NOT NULL,
+    PRIMARY KEY (code, file)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS unmatched_file ON unmatched (file);
+"""
+
+
+def _price(value):
+    """NaN 存为 NULL"""
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else float(value)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def open_index(data_folder):
+    """按数据文件夹共享的索引实例（进程内复用同一个连接）"""
+    key = os.path.abspath(data_folder)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = SkuIndex(data_folder)
+        return _indexes[key]
+
+
+class SkuIndex:
+    """编码 → 文件 的倒排索引与编码表快照"""
+
+    def __init__(self, data_folder):
+        folder = cache_folder(data_folder)
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, INDEX_FILE_NAME)
+        self._conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        # 索引通常放在共享文件夹中：WAL 依赖共享内存，不能跨电脑使用，这里用默认的回滚日志，
+        # 写锁冲突时按 timeout 等待（显式设置，以便把旧版本建成 WAL 的索引切换回来）
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._version_ids = {}
+
+    def close(self):
+        self._conn.close()
+
+    # ===============================
+    # 记录
+    # ===============================
+    def record_mapping(self, version, code_info, tax_distributor_map):
+        """保存编码表快照（同一版本只保存一次），返回版本编号"""
+        if version in self._version_ids:
+            return self._version_ids[version]
+
+        conn = self._conn
+        with self._lock, conn:
+            row = conn.execute("SELECT id FROM versions WHERE version = ?", (version,)).fetchone()
+            if row is None:
+                cursor = conn.execute(
+                    "INSERT INTO versions (version, tax_distributors) VALUES (?, ?)",
+                    (version, json.dumps(sorted(tax_distributor_map), ensure_ascii=False))
+                )
+                version_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT OR REPLACE INTO mapping VALUES (?, ?, ?, ?, ?, ?)",
+                    ((version_id, code, code_info.name(i), code_info.type(i),
+                      _price(code_info.prices[i]), _price(code_info.tax_prices[i]))
+                     for i, code in enumerate(code_info.codes))
+                )
+                # 清理已没有文件使用的旧版本快照
+                conn.execute(
+                    "DELETE FROM mapping WHERE version_id NOT IN (SELECT version_id FROM files) AND version_id != ?",
+                    (version_id,)
+                )
+                conn.execute(
+                    "DELETE FROM versions WHERE id NOT IN (SELECT version_id FROM files) AND id != ?",
+                    (version_id,)
+                )
+            else:
+                version_id = row[0]
+
+        self._version_ids[version] = version_id
+        return version_id
+
+    def record_result(self, result, version_id):
+        """用一个文件的最新结果替换其索引记录"""
+        file_name = result["file"]
+        conn = self._conn
+        with self._lock, conn:
+            conn.execute("DELETE FROM usage WHERE file = ?", (file_name,))
+            conn.execute("DELETE FROM unmatched WHERE file = ?", (file_name,))
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (file_name, result.get("distributor_code"), int(bool(result.get("use_tax_price"))), version_id)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO usage VALUES (?, ?, ?)",
+                ((code, file_name, row["name"]) for row in result["rows"] for code in row.get("codes", {}))
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO unmatched VALUES (?, ?)",
+                ((code, file_name) for code in result.get("unmatched", []))
+            )
+
+    # ===============================
+    # 查询
+    # ===============================
+    def where(self, code):
+        """使用某编码的文件与结果行：[(文件, 名称)]；未匹配的文件名称为 None"""
+        rows = self._conn.execute("SELECT file, name FROM usage WHERE code = ? ORDER BY file", (code,)).fetchall()
+        rows += self._conn.execute(
+            "SELECT file, NULL FROM unmatched WHERE code = ? ORDER BY file", (code,)
+        ).fetchall()
+        return rows
+
+    def _snapshot(self, version_id):
+        return {
+            code: (name, type_, price, tax_price)
+            for code, name, type_, price, tax_price in self._conn.execute(
+                "SELECT code, name, type, price, tax_price FROM mapping WHERE version_id = ?", (version_id,)
+            )
+        }
+
+    def _files_using(self, table, codes, extra=""):
+        found = set()
+        codes = list(codes)
+        for start in range(0, len(codes), QUERY_BATCH):
+            batch = codes[start:start + QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT t.file FROM {table} t JOIN files f ON f.file = t.file "
+                f"WHERE t.code IN ({placeholders}){extra}", batch
+            ))
+        return found
+
+    def diff_mapping(self, version_id, code_info, tax_distributor_map):
+        """
+        某版本快照与新编码表的差异
+
+        Returns:
+            {"changed": [(编码, 字段, 旧值, 新值)], "price_codes", "tax_price_codes", "added", "removed",
+             "all_files": 原因或 None, "tax_distributors": 含税分销商的增减}
+        """
+        old = self._snapshot(version_id)
+        row = self._conn.execute("SELECT tax_distributors FROM versions WHERE id = ?", (version_id,)).fetchone()
+        old_tax = set(json.loads(row[0])) if row else set()
+
+        diff = {"changed": [], "price_codes": set(), "tax_price_codes": set(), "added": set(), "removed": set(),
+                "all_files": None, "tax_distributors": sorted(old_tax ^ set(tax_distributor_map))}
+        fields = ("名称", "产品类型", "供货价", "供货价（含税）")
+
+        for i, code in enumerate(code_info.codes):
+            new = (code_info.name(i), code_info.type(i),
+                   _price(code_info.prices[i]), _price(code_info.tax_prices[i]))
+            previous = old.pop(code, None)
+            if previous is None:
+                diff["added"].add(code)
+                diff["changed"].append((code, "新增", None, new[0]))
+                continue
+            if previous == new:
+                continue
+            for field, before, after in zip(fields, previous, new):
+                if before != after:
+                    diff["changed"].append((code, field, before, after))
+            if (previous[1] == GIFT_TYPE) != (new[1] == GIFT_TYPE):
+                diff["all_files"] = f"编码 {code} 的赠品类型变化"
+            if previous[:3] != new[:3]:
+                diff["price_codes"].add(code)
+            else:
+                diff["tax_price_codes"].add(code)
+
+        for code, previous in old.items():
+            diff["removed"].add(code)
+            diff["changed"].append((code, "删除", previous[0], None))
+            if previous[1] == GIFT_TYPE:
+                diff["all_files"] = f"赠品编码 {code} 已删除"
+        return diff
+
+    def affected_files(self, version, code_info, tax_distributor_map, file_names):
+        """
+        编码表换为 version 后需要重算的文件
+
+        Returns:
+            ({文件名: 原因}, [各旧版本的差异])
+        """
+        affected = {}
+        diffs = []
+        with self._lock:
+            known = dict(self._conn.execute(
+                "SELECT f.file, v.version FROM files f LEFT JOIN versions v ON v.id = f.version_id"
+            ).fetchall())
+            version_ids = dict(self._conn.execute("SELECT version, id FROM versions").fetchall())
+
+            for file_name in file_names:
+                if file_name not in known:
+                    affected[file_name] = "没有索引记录"
+                elif known[file_name] is None:
+                    affected[file_name] = "编码表快照已清理"
+
+            for old_version in {known[f] for f in file_names if known.get(f) and known[f] != version}:
+                version_id = version_ids[old_version]
+                diff = self.diff_mapping(version_id, code_info, tax_distributor_map)
+                diffs.append(diff)
+
+                scope = " AND f.version_id = %d" % version_id
+                if diff["all_files"]:
+                    files = {file for file, v in known.items() if v == old_version}
+                    reason = diff["all_files"]
+                    for file_name in files:
+                        affected.setdefault(file_name, reason)
+                    continue
+
+                for file_name in self._files_using("usage", diff["price_codes"] | diff["removed"], scope):
+                    affected.setdefault(file_name, "供货价 / 名称变化")
+                for file_name in self._files_using("usage", diff["tax_price_codes"],
+                                                   scope + " AND f.use_tax_price = 1"):
+                    affected.setdefault(file_name, "含税价变化")
+                for file_name in self._files_using("unmatched", diff["added"], scope):
+                    affected.setdefault(file_name, "未匹配编码已加入编码表")
+                if diff["tax_distributors"]:
+                    placeholders = ",".join("?" * len(diff["tax_distributors"]))
+                    for (file_name,) in self._conn.execute(
+                        f"SELECT file FROM files f WHERE distributor_code IN ({placeholders}){scope}",
+                        diff["tax_distributors"]
+                    ):
+                        affected.setdefault(file_name, "含税分销商变化")
+
+        names = set(file_names)
+        return {file: reason for file, reason in affected.items() if file in names}, diffs
+
+    def promote(self, file_names, version_id):
+        """编码表变化不影响的文件直接标记为已按新版本计算，下次无需再与旧快照比较"""
+        file_names = list(file_names)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE files SET version_id = ? WHERE file = ?", ((version_id, f) for f in file_names)
+            )
+
+
+def record_file_result(data_folder, result, version, code_info, tax_distributor_map):
+    """对账保存结果后更新索引；索引出错不影响对账"""
+    try:
+        index = open_index(data_folder)
+        index.record_result(result, index.record_mapping(version, code_info, tax_distributor_map))
+    except Exception as e:
+        print(f"  ⚠ 编码索引更新失败: {e}")
+
+
+def plan_reprice(data_folder=None, mapping_file=None):
+    """
+    比较编码表与各文件计算时所用的版本，列出需要重算的文件
+
+    Returns:
+        (mapping_file, {文件名: 原因}, [差异], 未受影响的文件)
+    """
+    from function.reconciliation import DATA_FOLDER, MAPPING_FILE, get_mapping, list_excel_files
+
+    if data_folder is None:
+        data_folder = DATA_FOLDER
+        mapping_file = mapping_file or MAPPING_FILE
+    else:
+        mapping_file = mapping_file or os.path.join(data_folder, "编码表", "编码.xlsx")
+
+    tax_distributor_map, code_info, version, _ = get_mapping(mapping_file)
+    file_names = [os.path.basename(f) for f in list_excel_files(data_folder)
+                  if not os.path.basename(f).startswith("~$")]
+    affected, diffs = open_index(data_folder).affected_files(version, code_info, tax_distributor_map, file_names)
+    return mapping_file, affected, diffs, [f for f in file_names if f not in affected]
+
+
+def print_plan(affected, diffs, max_changes=50):
+    changes = [change for diff in diffs for change in diff["changed"]]
+    if changes:
+        print(f"编码表变化：{len(changes)} 项")
+        for code, field, before, after in changes[:max_changes]:
+            print(f"  • {code} {field}：{before} → {after}")
+        if len(changes) > max_changes:
+            print(f"  … 另有 {len(changes) - max_changes} 项")
+    for diff in diffs:
+        if diff["tax_distributors"]:
+            print(f"含税分销商变化：{'、'.join(diff['tax_distributors'])}")
+
+    if not affected:
+        print("✅ 所有文件均已按当前编码表计算，无需重算")
+        return
+    print(f"需要重算 {len(affected)} 个文件：")
+    for file_name, reason in sorted(affected.items()):
+        print(f"  • {file_name}（{reason}）")
+
+
+def reprice(data_folder=None, mapping_file=None):
+    """只重算受编码表变化影响的文件"""
+    from function.reconciliation import DATA_FOLDER, get_mapping, process_all_files
+
+    mapping_file, affected, diffs, unaffected = plan_reprice(data_folder, mapping_file)
+    print_plan(affected, diffs)
+    if affected and not process_all_files(data_folder, mapping_file, only_files=sorted(affected)):
+        return False
+
+    if unaffected:
+        tax_distributor_map, code_info, version, _ = get_mapping(mapping_file)
+        index = open_index(data_folder or DATA_FOLDER)
+        index.promote(unaffected, index.record_mapping(version, code_info, tax_distributor_map))
+    return True
+
+
+def main(argv=None):
+    import argparse
+    from function.reconciliation import DATA_FOLDER
+
+    parser = argparse.ArgumentParser(description="编码索引与选择性重算")
+    parser.add_argument("command", choices=["plan", "reprice", "where"])
+    parser.add_argument("code", nargs="?", help="where 命令查询的编码")
+    parser.add_argument("--folder", default=None, help=f"数据文件夹，默认 {DATA_FOLDER}")
+    parser.add_argument("--mapping", default=None, help="编码表路径")
+    args = parser.parse_args(argv)
+
+    if args.command == "where":
+        if not args.code:
+            parser.error("where 需要指定编码")
+        rows = open_index(args.folder or DATA_FOLDER).where(args.code)
+        if not rows:
+            print(f"没有文件使用编码 {args.code}")
+        for file_name, name in rows:
+            print(f"{file_name}\t{name if name is not None else '（未匹配）'}")
+        return 0
+
+    if args.command == "plan":
+        _, affected, diffs, _ = plan_reprice(args.folder, args.mapping)
+        print_plan(affected, diffs)
+        return 0
+
+    return 0 if reprice(args.folder, args.mapping) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# function/sku_search.py
+"""
+编码 / 名称查询 - 某个货品本月被哪些分销商退回、各多少件
+
+对账结束时由本期间的全部结果缓存生成索引，保存在 数据文件夹\\.对账缓存\\sku_search-YYYY-MM.npz：
+    每个「结果行 × 编码」为一条记录，以连续数组保存 分销商 / 名称 / 编码（字符串编号）与 数量 / 金额；
+    编码与名称（小写）各有一份排序后的键表，查询时用 bisect 找到前缀的起点，顺序扫描到前缀不再匹配为止，
+    再用「编号 → 是否命中」的布尔表一次筛出全部记录（numpy 向量运算）。
+一个月的数据（数十万条记录）即使前缀命中全部记录，单次查询也在 10 毫秒左右；
+索引文件按修改时间缓存在内存中，重复查询不再读取。
+
+索引文件只含数值与字符串数组（numpy 的 npz 格式，读取时不允许 pickle），共享文件夹中的文件被替换也不会执行代码。
+只有对账（或 --rebuild）会生成索引；索引文件不存在时查询返回空结果，不会创建任何文件或文件夹。
+
+数量、金额与对账表一致（退货为负数）：数量 = -件数，金额 = 供货价 × 数量 - 售后处理费。
+
+命令行用法：
+    python -m function.sku_search 关键字 [--folder D:\\分销对账] [--period 2026-09] [--rebuild]
+"""
+import os
+import sys
+import math
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+
+from function.result_store import cache_folder, current_period
+
+MAX_ROWS = 200      # 查询结果最多返回的明细行数（合计按全部匹配计算）
+
+# 保存到索引文件的数组：{属性名: array 类型码}，字符串表单独保存
+_NUMERIC_FIELDS = {"dist_ids": "i", "name_ids": "i", "code_ids": "i", "qtys": "q", "amounts": "d",
+                   "code_key_ids": "i", "name_key_ids": "i"}
+_STRING_FIELDS = ("distributors", "names", "codes", "code_keys", "name_keys")
+
+
+class SkuSearchIndex:
+    """编码 / 名称 → 分销商、数量、金额 的前缀索引"""
+
+    def __init__(self):
+        self.period = None
+        self.distributors = []
+        self.names = []
+        self.codes = []
+        self.dist_ids = array("i")
+        self.name_ids = array("i")
+        self.code_ids = array("i")
+        self.qtys = array("q")
+        self.amounts = array("d")   # 缺失供货价记为 NaN
+        # 排序后的键（小写）与对应的字符串编号
+        self.code_keys = []
+        self.code_key_ids = array("i")
+        self.name_keys = []
+        self.name_key_ids = array("i")
+
+    @classmethod
+    def from_results(cls, results, period=None):
+        from function.result_store import sheet_values
+        from function.summary import distributor_sort_key
+
+        index = cls()
+        index.period = period
+        string_ids = ({}, {}, {})
+        tables = (index.distributors, index.names, index.codes)
+
+        def intern(kind, value):
+            ids = string_ids[kind]
+            if value not in ids:
+                ids[value] = len(tables[kind])
+                tables[kind].append(value)
+            return ids[value]
+
+        for result in sorted(results, key=lambda r: distributor_sort_key(r["file"])):
+            dist_id = intern(0, result["distributor"])
+            for row in result["rows"]:
+                name_id = intern(1, row["name"])
+                for code, count in row.get("codes", {}).items():
+                    _, qty, _, amount = sheet_values({"price": row["price"], "count": count})
+                    index.dist_ids.append(dist_id)
+                    index.name_ids.append(name_id)
+                    index.code_ids.append(intern(2, code))
+                    index.qtys.append(int(qty))
+                    index.amounts.append(float(amount) if amount is not None else math.nan)
+
+        for strings, keys_attr, ids_attr in ((index.codes, "code_keys", "code_key_ids"),
+                                             (index.names, "name_keys", "name_key_ids")):
+            ordered = sorted(range(len(strings)), key=lambda i: str(strings[i]).lower())
+            setattr(index, keys_attr, [str(strings[i]).lower() for i in ordered])
+            setattr(index, ids_attr, array("i", ordered))
+        return index
+
+    def __len__(self):
+        return len(self.qtys)
+
+    def save(self, path):
+        """保存为 npz（先写入同目录下的临时文件再替换，多个进程同时保存互不影响）"""
+        import numpy as np
+
+        # array 的类型码与 numpy 的 dtype 字符相同
+        arrays = {name: np.frombuffer(getattr(self, name), dtype=code) for name, code in _NUMERIC_FIELDS.items()}
+        for name in _STRING_FIELDS:
+            arrays[name] = np.array(["" if value is None else str(value) for value in getattr(self, name)], dtype=str)
+        arrays["period"] = np.array(self.period or "", dtype=str)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            for name, code in _NUMERIC_FIELDS.items():
+                values = array(code)
+                values.frombytes(data[name].tobytes())
+                setattr(index, name, values)
+            for name in _STRING_FIELDS:
+                setattr(index, name, data[name].tolist())
+            index.period = str(data["period"]) or None
+        return index
+
+    def _prefix_ids(self, keys, key_ids, prefix):
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return key_ids[start:end]
+
+    def search(self, text, limit=MAX_ROWS):
+        """
+        按编码或名称前缀查询（不区分大小写）
+
+        Returns:
+            {"rows": [{"distributor", "code", "name", "qty", "amount"}]（按分销商顺序，最多 limit 行）,
+             "matched": 匹配的记录数, "distributors": 分销商数, "qty": 合计数量, "amount": 合计金额}
+        """
+        prefix = text.strip().lower()
+        if not prefix:
+            return {"rows": [], "matched": 0, "distributors": 0, "qty": 0, "amount": 0.0, "records": len(self)}
+
+        import numpy as np
+
+        code_hit = np.zeros(len(self.codes), dtype=bool)
+        code_hit[np.frombuffer(self._prefix_ids(self.code_keys, self.code_key_ids, prefix), dtype=np.int32)] = True
+        name_hit = np.zeros(len(self.names), dtype=bool)
+        name_hit[np.frombuffer(self._prefix_ids(self.name_keys, self.name_key_ids, prefix), dtype=np.int32)] = True
+
+        # 记录号即写入顺序（分销商已排序），按记录号输出即按分销商顺序
+        code_ids = np.frombuffer(self.code_ids, dtype=np.int32)
+        name_ids = np.frombuffer(self.name_ids, dtype=np.int32)
+        ordered = np.flatnonzero(code_hit[code_ids] | name_hit[name_ids]) if len(code_ids) else code_ids
+        qtys = np.frombuffer(self.qtys, dtype=np.int64)[ordered]
+        amounts = np.frombuffer(self.amounts, dtype=np.float64)[ordered]
+
+        rows = []
+        for i in ordered[:limit].tolist():
+            amount = self.amounts[i]
+            rows.append({
+                "distributor": self.distributors[self.dist_ids[i]],
+                "code": self.codes[self.code_ids[i]],
+                "name": self.names[self.name_ids[i]],
+                "qty": self.qtys[i],
+                "amount": None if math.isnan(amount) else amount,
+            })
+
+        return {
+            "rows": rows,
+            "matched": len(ordered),
+            "distributors": len(np.unique(np.frombuffer(self.dist_ids, dtype=np.int32)[ordered])),
+            "qty": int(qtys.sum()),
+            "amount": float(np.nansum(amounts)),
+            "records": len(self),
+        }
+
+
+def index_path(data_folder, period=None):
+    return os.path.join(cache_folder(data_folder), f"sku_search-{period or current_period()}.npz")
+
+
+def build_index(data_folder, period=None):
+    """由本期间的结果缓存生成查询索引并保存，返回索引"""
+    from function.result_store import load_results
+
+    period = period or current_period()
+    index = SkuSearchIndex.from_results(load_results(data_folder, period), period)
+    path = index_path(data_folder, period)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    index.save(path)
+    return index
+
+
+# 已加载的索引：{索引路径: (修改时间, 索引)}
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_index(data_folder, period=None):
+    """读取查询索引（按修改时间缓存）；索引文件不存在时返回空索引（索引只由对账生成）"""
+    path = index_path(data_folder, period)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        index = SkuSearchIndex()
+        index.period = period or current_period()
+        return index
+
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index = SkuSearchIndex.load(path)
+        _loaded[path] = (mtime, index)
+        return index
+
+
+def preload(data_folder=None, period=None):
+    """在后台线程预先导入 numpy 并读取索引，使界面中的第一次查询也能立即返回"""
+    def run():
+        try:
+            import numpy  # noqa: F401
+            load_index(data_folder or _default_folder(), period)
+        except Exception as e:
+            print(f"⚠ 查询索引预加载失败: {e}")
+
+    thread = threading.Thread(target=run, name="sku-search-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def _default_folder():
+    from function.reconciliation import DATA_FOLDER
+    return DATA_FOLDER
+
+
+def search(text, data_folder=None, period=None, limit=MAX_ROWS):
+    return load_index(data_folder or _default_folder(), period).search(text, limit)
+
+
+def format_result(text, found, max_lines=20):
+    """查询结果的文本（每行一个分销商 / 编码）"""
+    if not found.get("records"):
+        return [f"🔍 {text}：还没有本月的查询索引，执行对账后即可查询"]
+    if not found["matched"]:
+        return [f"🔍 {text}：本月没有退货记录"]
+    lines = [f"🔍 {text}：{found['distributors']} 个分销商，数量 {found['qty']}，金额 {found['amount']:.2f}"]
+    for row in found["rows"][:max_lines]:
+        amount = "缺失供货价" if row["amount"] is None else f"{row['amount']:.2f}"
+        lines.append(f"  {row['distributor']}｜{row['code']} {row['name']}｜{row['qty']}｜{amount}")
+    if found["matched"] > max_lines:
+        lines.append(f"  … 另有 {found['matched'] - max_lines} 条，请在结果浏览中查看")
+    return lines
+
+
+def main(argv=None):
+    import argparse
+    import time
+    from function.reconciliation import DATA_FOLDER
+
+    parser = argparse.ArgumentParser(description="按编码 / 名称查询本月退货的分销商")
+    parser.add_argument("text", help="编码或名称（前缀匹配）")
+    parser.add_argument("--folder", default=DATA_FOLDER, help="数据文件夹")
+    parser.add_argument("--period", default=None, help="期间 YYYY-MM，默认上个月")
+    parser.add_argument("--rebuild", action="store_true", help="先由结果缓存重新生成索引")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        build_index(args.folder, args.period)
+    index = load_index(args.folder, args.period)
+    index.search(args.text)     # 预热（导入 numpy），下面计时的是查询本身
+    started = time.perf_counter()
+    found = index.search(args.text)
+    elapsed = (time.perf_counter() - started) * 1000
+    for line in format_result(args.text, found, max_lines=MAX_ROWS):
+        print(line)
+    print(f"（{len(index)} 条记录，查询 {elapsed:.1f} ms）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
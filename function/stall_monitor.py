@@ -0,0 +1,238 @@
+# function/stall_monitor.py
+"""
+界面卡顿监控 - 测量主线程多长时间没有处理事件
+
+    • 主线程上的 QTimer 定时「心跳」，两次心跳的间隔减去定时周期即为事件循环的延迟
+    • 后台看门狗线程发现心跳停止超过阈值时，用 sys._current_frames() 采样主线程的调用栈
+    • 超过阈值的卡顿连同调用栈一起记录；卡顿统计自动写入之后保存的运行报告（section: gui_stalls），
+      正在进行中的卡顿（例如在界面线程上执行汇总）也会记入；每次运行开始（创建运行报告）时统计清零，
+      报告中只有本次运行期间的卡顿
+
+统计与预算检查不依赖 Qt，PySide6 只在 start() 创建心跳定时器时导入。
+
+配置（config.json 的 settings.stall_monitor）：
+    {"enabled": true, "threshold_ms": 200, "budget_ms": 0}
+
+离屏检查（无需显示器），卡顿超出预算时退出码为 1：
+    QT_QPA_PLATFORM=offscreen python -m function.stall_monitor --budget 500 [--click summary] [--seconds 3]
+"""
+import sys
+import time
+import threading
+import traceback
+from datetime import datetime
+
+MAX_STALLS = 50         # 最多保留的卡顿记录数
+STACK_LIMIT = 12        # 每个调用栈样本保留的帧数
+
+
+def _format_stack(frame):
+    """把帧对象格式化为 ["文件:行号 函数", ...]（由外到内）"""
+    return [
+        f"{entry.filename}:{entry.lineno} {entry.name}"
+        for entry in traceback.extract_stack(frame, limit=STACK_LIMIT)
+    ]
+
+
+class StallMonitor:
+    """事件循环延迟监控器（须在主线程创建）"""
+
+    def __init__(self, threshold_ms=200, interval_ms=50, parent=None):
+        """
+        Args:
+            parent: 心跳定时器的父对象（QObject），随其销毁
+        """
+        self.parent = parent
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._main_ident = threading.get_ident()
+
+        self.stalls = []            # [{"started_at", "duration_ms", "stack"}]
+        self.beats = 0
+        self.max_lag = 0.0
+        self.total_stall = 0.0
+        self.stall_count = 0
+
+        self._last_beat = time.perf_counter()
+        self._sample = None         # 看门狗在当前卡顿中采到的调用栈
+        self._lock = threading.Lock()
+        self._running = False
+        self._watchdog = None
+        self._timer = None
+
+    @classmethod
+    def from_config(cls, parent=None):
+        """按 config.json 的 settings.stall_monitor 创建；已关闭时返回 None"""
+        from config_manager import get_config_value
+        config = get_config_value("settings.stall_monitor", {})
+        config = config if isinstance(config, dict) else {}
+        if not config.get("enabled", True):
+            return None
+        return cls(threshold_ms=config.get("threshold_ms", 200), parent=parent)
+
+    # ===============================
+    # 启停
+    # ===============================
+    def start(self):
+        if self._running:
+            return
+        if self._timer is None:
+            from PySide6.QtCore import QTimer
+            self._timer = QTimer(self.parent)
+            self._timer.setInterval(round(self.interval * 1000))
+            self._timer.timeout.connect(self._beat)
+        self._running = True
+        self._last_beat = time.perf_counter()
+        self._timer.start()
+        self._watchdog = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._watchdog.start()
+
+        # 之后保存的运行报告自动附带本次运行期间的卡顿统计
+        from function.run_report import register_section
+        register_section("gui_stalls", self.summary, reset=self.reset)
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._timer.stop()
+        self._watchdog.join(timeout=1)
+        self._watchdog = None
+
+        from function.run_report import unregister_section
+        unregister_section("gui_stalls")
+
+    # ===============================
+    # 心跳（主线程）与看门狗（后台线程）
+    # ===============================
+    def _beat(self):
+        now = time.perf_counter()
+        with self._lock:
+            lag = max(now - self._last_beat - self.interval, 0.0)
+            self._last_beat = now
+            sample, self._sample = self._sample, None
+            self.beats += 1
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag >= self.threshold:
+                self.stall_count += 1
+                self.total_stall += lag
+                if len(self.stalls) < MAX_STALLS:
+                    self.stalls.append({
+                        "started_at": datetime.fromtimestamp(time.time() - lag).isoformat(timespec="milliseconds"),
+                        "duration_ms": round(lag * 1000, 1),
+                        "stack": sample or [],
+                    })
+
+    def _watch(self):
+        period = max(self.threshold / 4, 0.01)
+        while self._running:
+            time.sleep(period)
+            with self._lock:
+                lag = time.perf_counter() - self._last_beat - self.interval
+                need_sample = lag >= self.threshold and self._sample is None
+            if need_sample:
+                frame = sys._current_frames().get(self._main_ident)
+                stack = _format_stack(frame) if frame is not None else []
+                del frame
+                with self._lock:
+                    self._sample = stack
+
+    # ===============================
+    # 统计
+    # ===============================
+    def current_lag_ms(self):
+        """当前正在进行的卡顿时长（毫秒），未卡顿时为 0"""
+        with self._lock:
+            lag = time.perf_counter() - self._last_beat - self.interval
+        return round(lag * 1000, 1) if lag >= self.threshold else 0.0
+
+    def max_stall_ms(self):
+        """最长卡顿（含正在进行的卡顿）"""
+        return max(round(self.max_lag * 1000, 1), self.current_lag_ms())
+
+    def within_budget(self, budget_ms):
+        """所有卡顿（含正在进行的）都不超过预算时返回 True"""
+        return self.max_stall_ms() <= budget_ms
+
+    def summary(self):
+        """写入运行报告的内容"""
+        ongoing = self.current_lag_ms()
+        with self._lock:
+            result = {
+                "threshold_ms": round(self.threshold * 1000, 1),
+                "beats": self.beats,
+                "stall_count": self.stall_count,
+                "total_stall_ms": round(self.total_stall * 1000, 1),
+                "max_stall_ms": round(self.max_lag * 1000, 1),
+                "stalls": list(self.stalls),
+            }
+            if ongoing:
+                result["ongoing"] = {"duration_ms": ongoing, "stack": self._sample or []}
+                result["max_stall_ms"] = max(result["max_stall_ms"], ongoing)
+        return result
+
+    def reset(self):
+        """清零统计（新的运行开始时由运行报告调用）"""
+        with self._lock:
+            self.stalls.clear()
+            self.beats = 0
+            self.max_lag = 0.0
+            self.total_stall = 0.0
+            self.stall_count = 0
+
+
+def main(argv=None):
+    """离屏打开主窗口，可选点击按钮，检查卡顿是否超出预算"""
+    import argparse
+    import json
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+
+    parser = argparse.ArgumentParser(description="界面卡顿检查")
+    parser.add_argument("--budget", type=float, default=500, help="允许的最长卡顿（毫秒）")
+    parser.add_argument("--threshold", type=float, default=100, help="记录卡顿的阈值（毫秒）")
+    parser.add_argument("--seconds", type=float, default=2, help="运行时长（秒）")
+    parser.add_argument("--click", choices=["reconciliation", "summary", "results"], default=None,
+                        help="启动后点击的按钮")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    from widgets_main_window import ModernWindow
+
+    window = ModernWindow()
+    window.show()
+    if window.stall_monitor is not None:
+        window.stall_monitor.stop()
+    monitor = StallMonitor(threshold_ms=args.threshold)
+    monitor.start()
+
+    buttons = {
+        "reconciliation": window.btn_function1,
+        "summary": window.btn_function2,
+        "results": window.btn_results,
+    }
+    if args.click:
+        QTimer.singleShot(200, buttons[args.click].click)
+    QTimer.singleShot(int(args.seconds * 1000), app.quit)
+    app.exec()
+
+    monitor.stop()
+    summary = monitor.summary()
+    window.close()
+
+    print(json.dumps({k: v for k, v in summary.items() if k != "stalls"}, ensure_ascii=False))
+    for stall in summary["stalls"]:
+        print(f"  卡顿 {stall['duration_ms']} ms @ {stall['started_at']}")
+        for line in stall["stack"][-5:]:
+            print(f"      {line}")
+
+    if not monitor.within_budget(args.budget):
+        print(f"❌ 最长卡顿 {monitor.max_stall_ms()} ms，超出预算 {args.budget} ms")
+        return 1
+    print(f"✅ 最长卡顿 {monitor.max_stall_ms()} ms，未超出预算 {args.budget} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# function/styles.py
+"""
+表格样式 - 对账文件结果区与售后汇总表共用的命名样式
+
+写入前调用 register(wb) 把命名样式加入工作簿（已存在的不重复添加），之后按名称给单元格设置样式：
+    cell.style = CENTER
+每个单元格只设置一次样式，不再逐个创建 Border / Alignment / Font 对象，
+工作簿中的样式表只有这几项，写入与保存都更快。
+
+字体以工作簿自身的默认字体为基础（字体名、字号不变），只改加粗、字号或颜色，
+WPS / 中文版 Excel 生成的文件不会被改成 Calibri 11。
+合并单元格仍用 ws.merge_cells：先给左上角单元格设置样式，合并区域的外边框取自左上角单元格。
+
+样式名称带「对账-」前缀，避免与 Excel 内置样式（标题、常规等）重名。
+"""
+from copy import copy
+
+CENTER = "对账-居中"         # 细边框，水平垂直居中：数值、分销商、结果区
+LEFT = "对账-左对齐"         # 细边框，左对齐、垂直居中：汇总表名称列
+BOLD = "对账-加粗居中"       # 细边框，加粗居中：汇总表表头与合计
+TITLE = "对账-标题"          # 14 号加粗居中，无边框：汇总表标题
+WARNING = "对账-提示"        # 红色字体：未匹配编码、缺失供货价提示
+
+
+def default_font(wb):
+    """工作簿的默认字体（未设置样式的单元格所用的字体）"""
+    from openpyxl.cell.cell import Cell
+
+    return copy(Cell(wb.worksheets[0]).font)
+
+
+def _font(base, **changes):
+    font = copy(base)
+    for name, value in changes.items():
+        setattr(font, name, value)
+    return font
+
+
+def _named_styles(base_font):
+    from openpyxl.styles import Alignment, Border, NamedStyle, Side
+
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal="center", vertical="center")
+    # NamedStyle 默认的 Font() 没有字号与字体名，一律由工作簿默认字体派生
+    return (
+        NamedStyle(CENTER, font=_font(base_font), border=border, alignment=center),
+        NamedStyle(LEFT, font=_font(base_font), border=border,
+                   alignment=Alignment(horizontal="left", vertical="center")),
+        NamedStyle(BOLD, font=_font(base_font, bold=True), border=border, alignment=center),
+        NamedStyle(TITLE, font=_font(base_font, size=14, bold=True), alignment=center),
+        NamedStyle(WARNING, font=_font(base_font, color="FF0000")),
+    )
+
+
+def register(wb):
+    """把命名样式加入工作簿（每个工作簿各自一份，已存在的不重复添加）"""
+    existing = set(wb.named_styles)
+    for style in _named_styles(default_font(wb)):
+        if style.name not in existing:
+            wb.add_named_style(style)
+    return wb
+
+
+def style_range(ws, min_row, max_row, min_col, max_col, style):
+    """给一个矩形区域的单元格设置同一个命名样式"""
+    for row in ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col):
+        for cell in row:
+            cell.style = style
@@ -1,8 +1,251 @@
-def run_summary(output_callback=None):
-    import os
+# function/summary.py
+"""
+售后汇总表 - 把各分销商对账文件的结果区汇总到 汇总表\\{年}-{月}售后汇总.xlsx
+
+增量更新（settings.reconciliation.summary_incremental，默认开启）：
+    每次生成汇总表时，在 数据文件夹\\.对账缓存\\summary-YYYY-MM.json 记录每个源文件在汇总表中的行范围
+    与源文件的修改时间、大小：
+        {"summary_file": 文件名, "total_row": 合计行,
+         "blocks": [{"file": 源文件, "source": {"mtime_ns", "size"}, "distributor": 分销商, "start": 起始行, "end": 结束行}]}
+    再次汇总时，若源文件列表未变且汇总表与索引一致，只重新读取有变化的源文件，替换它在汇总表中的行，
+    其后的行整体上移 / 下移（公式随之平移），最后更新合计行；已手工填写的营业额会保留。
+    源文件增删、汇总表被改动结构或索引缺失时，仍完整重新生成。
+"""
+import os
+import re
+import time
+import json
+
+from function import styles
+
+SUMMARY_COLUMNS = 10
+REVENUE_COLUMN = 9      # 营业额（手工填写）
+MERGED_COLUMNS = (1, 7, 8, 9, 10)   # 每个分销商合并为一格的列：分销商、售后处理费（合计）、售后返还总额、营业额、有效营业额
+FIRST_DATA_ROW = 3
+
+
+def distributor_sort_key(file_name):
+    """按分销商编号的自然顺序排序，例如 2号 排在 10号 之前"""
+    parts = re.split(r"(\d+)", os.path.splitext(file_name)[0])
+    return [(0, int(p), "") if p.isdigit() else (1, 0, p) for p in parts]
+
+
+def read_result_block(file_path):
+    """
+    以只读流式方式读取对账文件 Sheet1 中的结果区
+
+    从表头找到「分销商」列，逐行读取 分销商 / 名称 / 供货价 / 数量 四列，
+    读到结果区的「合计」行即停止，不再解析其后的内容。
+
+    Returns:
+        [(分销商, 名称, 供货价, 数量), ...]；未找到「分销商」列时返回 None
+    """
+    from openpyxl import load_workbook
+
+    wb_src = load_workbook(file_path, read_only=True, data_only=False)
+    try:
+        ws_src = wb_src["Sheet1"]
+
+        header = next(ws_src.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        start_col = None
+        for i, value in enumerate(header, 1):
+            if value == "分销商":
+                start_col = i
+                break
+
+        if not start_col:
+            return None
+
+        rows = []
+        last_distributor = None
+        for row in ws_src.iter_rows(min_row=2, min_col=start_col, max_col=start_col + 3, values_only=True):
+            raw, name, price, qty = (tuple(row) + (None,) * 4)[:4]
+            if name is not None and str(name).strip() == "合计":
+                break
+            if not name:
+                continue
+
+            distributor = raw if raw else last_distributor
+            last_distributor = distributor
+            rows.append((distributor, name, price, qty))
+
+        return rows
+    finally:
+        wb_src.close()
+
+
+# ===============================
+# 写入
+# ===============================
+def finalize_distributor(ws, start_row, end_row):
+    """合并一个分销商的 分销商 / 合计 / 营业额 列（样式已由 write_block 设置）"""
+    if start_row is None or end_row < start_row:
+        return
+
+    ws.cell(start_row, 7, f"=SUM(E{start_row}:E{end_row})")
+    ws.cell(start_row, 8, f"=SUM(F{start_row}:F{end_row})")
+    ws.cell(start_row, 10, f"=H{start_row}+I{start_row}")
+    for col in MERGED_COLUMNS:
+        ws.merge_cells(start_row=start_row, start_column=col, end_row=end_row, end_column=col)
+
+
+def write_block(ws, write_row, rows, revenue=None):
+    """
+    写入一个源文件的结果行
+
+    Args:
+        revenue: {分销商: 营业额}，写回已手工填写的营业额
+
+    Returns:
+        下一个可写入的行号
+    """
+    current_distributor = None
+    distributor_start_row = None
+
+    for distributor, name, price, qty in rows:
+        if distributor != current_distributor:
+            if current_distributor is not None:
+                finalize_distributor(ws, distributor_start_row, write_row - 1)
+            current_distributor = distributor
+            distributor_start_row = write_row
+            ws.cell(write_row, 1, distributor)
+            if revenue and distributor in revenue:
+                ws.cell(write_row, REVENUE_COLUMN, revenue[distributor])
+
+        ws.cell(write_row, 2, name)
+        ws.cell(write_row, 3, price)
+        ws.cell(write_row, 4, qty)
+        ws.cell(write_row, 5, f"=D{write_row}*1")
+        ws.cell(write_row, 6, f"=C{write_row}*D{write_row}-E{write_row}")
+
+        # 名称列左对齐，其余列（含随后合并的分销商、合计、营业额列）水平和垂直居中，均带边框
+        for col_num in range(1, SUMMARY_COLUMNS + 1):
+            ws.cell(write_row, col_num).style = styles.LEFT if col_num == 2 else styles.CENTER
+
+        write_row += 1
+
+    if current_distributor:
+        finalize_distributor(ws, distributor_start_row, write_row - 1)
+
+    return write_row
+
+
+def write_total_row(ws, total_row):
+    """全表合计行"""
+    # 「合计」与数值列加粗居中，先设置样式再合并 A:F
+    ws.cell(total_row, 1, "合计")
+    ws.cell(total_row, 7, f"=SUM(G{FIRST_DATA_ROW}:G{total_row - 1})")
+    ws.cell(total_row, 8, f"=SUM(H{FIRST_DATA_ROW}:H{total_row - 1})")
+    ws.cell(total_row, 9, f"=SUM(I{FIRST_DATA_ROW}:I{total_row - 1})")
+    ws.cell(total_row, 10, f"=SUM(J{FIRST_DATA_ROW}:J{total_row - 1})")
+
+    if not any(str(merged) == f"A{total_row}:F{total_row}" for merged in ws.merged_cells.ranges):
+        ws.cell(total_row, 1).style = styles.BOLD
+        ws.merge_cells(start_row=total_row, start_column=1, end_row=total_row, end_column=6)
+    styles.style_range(ws, total_row, total_row, 7, SUMMARY_COLUMNS, styles.BOLD)
+
+
+def finish_rows(ws, first_row, last_row):
+    """行高（包括合计行）"""
+    for r in range(first_row, last_row + 1):
+        ws.row_dimensions[r].height = 22
+
+
+# ===============================
+# 增量更新
+# ===============================
+def summary_index_path(data_folder, period):
+    from function.result_store import cache_folder
+    return os.path.join(cache_folder(data_folder), f"summary-{period}.json")
+
+
+def load_summary_index(data_folder, period):
+    path = summary_index_path(data_folder, period)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_summary_index(data_folder, period, index):
+    path = summary_index_path(data_folder, period)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+
+def index_matches(ws, index):
+    """汇总表的结构是否仍与索引一致（合计行、各分销商起始行）"""
+    total_row = index["total_row"]
+    if ws.cell(total_row, 1).value != "合计":
+        return False
+    for block in index["blocks"]:
+        if block["end"] >= block["start"] and ws.cell(block["start"], 1).value != block["distributor"]:
+            return False
+    return True
+
+
+def replace_block(ws, index, position, rows):
+    """
+    替换索引中第 position 个源文件的行：其后的行整体平移，更新索引中的行范围与合计行
+
+    Returns:
+        替换后该块的起始行
+    """
+    blocks = index["blocks"]
+    block = blocks[position]
+    start, end = block["start"], block["end"]
+    delta = len(rows) - (end - start + 1)
+    last_col = "J"
+
+    # 保留已手工填写的营业额
+    revenue = {}
+    for r in range(start, end + 1):
+        distributor, value = ws.cell(r, 1).value, ws.cell(r, REVENUE_COLUMN).value
+        if distributor is not None and value is not None:
+            revenue[distributor] = value
+
+    for merged in [m for m in ws.merged_cells.ranges if start <= m.min_row <= end]:
+        ws.unmerge_cells(str(merged))
+    for r in range(start, end + 1):
+        for c in range(1, SUMMARY_COLUMNS + 1):
+            ws.cell(r, c).value = None
+
+    if delta:
+        # 后面的行（含合计行）整体平移，公式中的行号随之调整；合并区域先解除、平移后重新合并。
+        # 合计行的求和范围从第 3 行开始，不能随之平移，先清空，最后由 write_total_row 重写
+        for c in range(7, SUMMARY_COLUMNS + 1):
+            ws.cell(index["total_row"], c).value = None
+        tail = [m for m in ws.merged_cells.ranges if m.min_row > end]
+        for merged in tail:
+            ws.unmerge_cells(str(merged))
+        ws.move_range(f"A{end + 1}:{last_col}{max(ws.max_row, end + 1)}", rows=delta, translate=True)
+        for merged in tail:
+            ws.merge_cells(start_row=merged.min_row + delta, start_column=merged.min_col,
+                           end_row=merged.max_row + delta, end_column=merged.max_col)
+        for later in blocks[position + 1:]:
+            later["start"] += delta
+            later["end"] += delta
+        index["total_row"] += delta
+
+    write_block(ws, start, rows, revenue)
+    block["end"] = start + len(rows) - 1
+    block["distributor"] = rows[0][0] if rows else None
+    return start
+
+
+def run_summary(output_callback=None, full=False):
+    """
+    生成上个月的售后汇总表
+
+    Args:
+        full: 为 True 时忽略增量索引，完整重新生成
+    """
     from datetime import datetime
-    from openpyxl import load_workbook, Workbook
-    from openpyxl.styles import Border, Side, Alignment, Font
+    from openpyxl import Workbook
 
     def log(msg):
         if output_callback:
@@ -11,7 +254,8 @@ def run_summary(output_callback=None):
             print(msg)
 
     # ===== 路径
-    base_dir = r"D:\分销对账"
+    from function.reconciliation import DATA_FOLDER
+    base_dir = DATA_FOLDER
     summary_dir = os.path.join(base_dir, "汇总表")
     os.makedirs(summary_dir, exist_ok=True)
 
@@ -32,13 +276,88 @@ def run_summary(output_callback=None):
 
     month_label = f"{month}月"
     title_month_label = f"{title_month}月"
+    period = f"{year}-{month:02d}"
 
     summary_file = os.path.join(
         summary_dir, f"{year}-{month_label}售后汇总.xlsx"
     )
     log(f"📂 生成汇总表：{summary_file}")
 
+    from function.reconciliation import load_settings
+    from function.monitor import ResourceMonitor
+    from function.run_report import RunReport
+    from function.result_store import source_stamp
+    settings = load_settings()
+    report = RunReport("汇总", base_dir)
+    report.set("summary_file", summary_file)
+    monitor = ResourceMonitor.from_settings(settings, log=log)
+    monitor.start()
+
+    source_files = sorted(
+        (file for file in os.listdir(base_dir)
+         if file.endswith((".xls", ".xlsx")) and not file.startswith("~$")),
+        key=distributor_sort_key
+    )
+
+    def read_source(file):
+        path = os.path.join(base_dir, file)
+        started = time.perf_counter()
+        try:
+            # 先取修改时间与大小再读取，读取期间被改动的文件下次仍会重新读取
+            stamp = source_stamp(path)
+            return file, stamp, read_result_block(path), None, time.perf_counter() - started
+        except Exception as e:
+            return file, None, None, e, time.perf_counter() - started
+
+    def read_sources(files):
+        from concurrent.futures import ThreadPoolExecutor
+        workers = max(1, min(int(settings["summary_workers"]), len(files) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # map 按提交顺序返回，保证写入顺序与分销商排序一致
+            return list(pool.map(read_source, files))
+
+    def record(file, rows, error, seconds):
+        """记录一个源文件的读取结果，返回写入汇总表的行"""
+        file_entry = report.file_entry(file)
+        file_entry["read_seconds"] = round(seconds, 4)
+
+        if error is not None:
+            log(f"❌ 读取失败：{file} → {error}")
+            file_entry.update(status="失败", reason=str(error))
+            return []
+
+        if rows is None:
+            file_entry.update(status="跳过", reason="未找到'分销商'列")
+            return []
+
+        file_entry.update(status="成功", rows=len(rows))
+        return rows
+
+    # ===============================
+    # 增量更新
+    # ===============================
+    index = None
+    if settings["summary_incremental"] and not full and os.path.exists(summary_file):
+        index = load_summary_index(base_dir, period)
+        if index is not None and (index.get("summary_file") != os.path.basename(summary_file)
+                                  or [block["file"] for block in index["blocks"]] != source_files):
+            log("↻ 源文件有增减，完整重新生成汇总表")
+            index = None
+
+    if index is not None:
+        updated = update_summary(summary_file, index, base_dir, read_sources, record, report, monitor, log)
+        if updated is not None:
+            save_summary_index(base_dir, period, index)
+            if updated:
+                export_summary(settings, base_dir, period, updated, report, monitor, log)
+            analyze_returns(settings, base_dir, period, report, monitor, log)
+            return finish_summary(report, monitor, log)
+
+    # ===============================
+    # 完整生成
+    # ===============================
     wb = Workbook()
+    styles.register(wb)
     ws = wb.active
     ws.title = "售后汇总"
 
@@ -51,10 +370,8 @@ def run_summary(output_callback=None):
     ]
 
     # ===== 添加标题行（横向合并）
+    ws.cell(1, 1, f"{title_month_label}售后数据").style = styles.TITLE
     ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
-    title_cell = ws.cell(1, 1, f"{title_month_label}售后数据")
-    title_cell.alignment = Alignment(horizontal="center", vertical="center")
-    title_cell.font = Font(size=14, bold=True)
 
     # ===== 设置标题行高度
     ws.row_dimensions[1].height = 30
@@ -62,160 +379,41 @@ def run_summary(output_callback=None):
     # 添加表头到第二行
     ws.append(headers)
 
-    thin = Side(style="thin")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
     # ===== 设置表头样式（第二行）
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(2, col)
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = border
-        cell.font = Font(bold=True)
-
-    write_row = 3  # 从第三行开始写数据
-
-    # ===== 收尾分销商
-    def finalize_distributor(start_row, end_row):
-        if start_row is None or end_row < start_row:
-            return
-
-        ws.merge_cells(start_row=start_row, start_column=1,
-                       end_row=end_row, end_column=1)
-        ws.cell(start_row, 1).alignment = Alignment(horizontal="center", vertical="center")
-
-        ws.merge_cells(start_row=start_row, start_column=7,
-                       end_row=end_row, end_column=7)
-        ws.cell(start_row, 7, f"=SUM(E{start_row}:E{end_row})").alignment = Alignment(horizontal="center",
-                                                                                      vertical="center")
-
-        ws.merge_cells(start_row=start_row, start_column=8,
-                       end_row=end_row, end_column=8)
-        ws.cell(start_row, 8, f"=SUM(F{start_row}:F{end_row})").alignment = Alignment(horizontal="center",
-                                                                                      vertical="center")
-
-        ws.merge_cells(start_row=start_row, start_column=9,
-                       end_row=end_row, end_column=9)
-        ws.cell(start_row, 9).alignment = Alignment(horizontal="center", vertical="center")
-
-        ws.merge_cells(start_row=start_row, start_column=10,
-                       end_row=end_row, end_column=10)
-        ws.cell(start_row, 10, f"=H{start_row}+I{start_row}").alignment = Alignment(horizontal="center",
-                                                                                    vertical="center")
-
-    # ===== 读取对账文件
-    for file in os.listdir(base_dir):
-        if not file.endswith((".xls", ".xlsx")) or file.startswith("~$"):
-            continue
-
-        wb_src = load_workbook(os.path.join(base_dir, file), data_only=False)
-        ws_src = wb_src["Sheet1"]
-
-        start_col = None
-        for i, cell in enumerate(ws_src[1], 1):
-            if cell.value == "分销商":
-                start_col = i
-                break
-
-        if not start_col:
-            wb_src.close()
-            continue
-
-        col = {
-            "分销商": start_col,
-            "名称": start_col + 1,
-            "供货价": start_col + 2,
-            "数量": start_col + 3,
-        }
-
-        current_distributor = None
-        distributor_start_row = None
-        last_distributor = None
-
-        r = 2
-        while r <= ws_src.max_row:
-            name = ws_src.cell(r, col["名称"]).value
-            if not name or str(name).strip() == "合计":
-                r += 1
-                continue
-
-            raw = ws_src.cell(r, col["分销商"]).value
-            distributor = raw if raw else last_distributor
-            last_distributor = distributor
-
-            if distributor != current_distributor:
-                if current_distributor is not None:
-                    finalize_distributor(distributor_start_row, write_row - 1)
-                current_distributor = distributor
-                distributor_start_row = write_row
-                ws.cell(write_row, 1, distributor)
-
-            ws.cell(write_row, 2, name)
-            ws.cell(write_row, 3, ws_src.cell(r, col["供货价"]).value)
-            ws.cell(write_row, 4, ws_src.cell(r, col["数量"]).value)
-            ws.cell(write_row, 5, f"=D{write_row}*1")
-            ws.cell(write_row, 6, f"=C{write_row}*D{write_row}-E{write_row}")
-
-            # 设置当前行所有单元格的水平和垂直居中对齐和边框
-            for col_num in range(1, len(headers) + 1):
-                cell = ws.cell(write_row, col_num)
-                # 根据列类型设置不同的水平对齐方式
-                if col_num == 2:  # 名称列，左对齐
-                    cell.alignment = Alignment(horizontal="left", vertical="center")
-                elif col_num in [3, 4, 5, 6]:  # 供货价、数量、售后处理费、应返还金额列，水平和垂直居中
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                else:  # 其他列，垂直居中
-                    cell.alignment = Alignment(vertical="center")
-                cell.border = border
-
-            write_row += 1
-            r += 1
-
-        if current_distributor:
-            finalize_distributor(distributor_start_row, write_row - 1)
-
-        wb_src.close()
+    styles.style_range(ws, 2, 2, 1, len(headers), styles.BOLD)
+
+    write_row = FIRST_DATA_ROW  # 从第三行开始写数据
+
+    # ===== 并行读取对账文件的结果区
+    monitor.mark("读取")
+    results = read_sources(source_files)
+
+    # ===== 按分销商顺序写入，同时记录每个源文件的行范围
+    monitor.mark("写入")
+    index = {"summary_file": os.path.basename(summary_file), "total_row": None, "blocks": []}
+    all_rows = []
+    for file, stamp, rows, error, seconds in results:
+        rows = record(file, rows, error, seconds)
+        start_row = write_row
+        write_row = write_block(ws, write_row, rows)
+        index["blocks"].append({
+            "file": file,
+            "source": stamp if error is None else None,
+            "distributor": rows[0][0] if rows else None,
+            "start": start_row,
+            "end": write_row - 1,
+        })
+        all_rows.extend(rows)
+
+    monitor.mark("生成")
 
     # ===== 全表合计行
     total_row = write_row
+    index["total_row"] = total_row
+    write_total_row(ws, total_row)
 
-    ws.merge_cells(start_row=total_row, start_column=1, end_row=total_row, end_column=6)
-    ws.cell(total_row, 1, "合计").alignment = Alignment(horizontal="center", vertical="center")
-    ws.cell(total_row, 1).font = Font(bold=True)
-
-    ws.cell(total_row, 7, f"=SUM(G3:G{total_row - 1})")
-    ws.cell(total_row, 8, f"=SUM(H3:H{total_row - 1})")
-    ws.cell(total_row, 9, f"=SUM(I3:I{total_row - 1})")
-    ws.cell(total_row, 10, f"=SUM(J3:J{total_row - 1})")
-
-    # 设置合计行样式
-    for c in range(1, len(headers) + 1):
-        cell = ws.cell(total_row, c)
-        cell.border = border
-        if c == 2:  # 名称列，左对齐
-            cell.alignment = Alignment(horizontal="left", vertical="center")
-        elif c in [3, 4, 5, 6, 7, 8, 9, 10]:  # 数值列，水平和垂直居中
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        if c >= 7:  # 数值列加粗
-            cell.font = Font(bold=True)
-
-    # ===== 行高 & 边框（包括合计行）
-    for r in range(2, total_row + 1):
-        ws.row_dimensions[r].height = 22
-        for c in range(1, len(headers) + 1):
-            cell = ws.cell(r, c)
-            # 确保所有单元格都有边框
-            cell.border = border
-            # 确保数值列（3-6列）水平和垂直居中对齐
-            if c in [3, 4, 5, 6]:
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            # 确保其他列至少垂直居中对齐
-            elif cell.alignment is None:
-                cell.alignment = Alignment(vertical="center")
-            elif c != 2:  # 名称列保持左对齐
-                # 保留原有的水平对齐，设置垂直居中
-                cell.alignment = Alignment(horizontal=cell.alignment.horizontal,
-                                           vertical="center",
-                                           wrap_text=cell.alignment.wrap_text)
+    # ===== 行高（包括合计行）
+    finish_rows(ws, 2, total_row)
 
     # ===== 列宽
     ws.column_dimensions["A"].width = 22
@@ -229,5 +427,122 @@ def run_summary(output_callback=None):
     ws.column_dimensions["I"].width = 16
     ws.column_dimensions["J"].width = 18
 
+    monitor.mark("保存")
+    wb.save(summary_file)
+    save_summary_index(base_dir, period, index)
+
+    export_summary(settings, base_dir, period, all_rows, report, monitor, log)
+    analyze_returns(settings, base_dir, period, report, monitor, log)
+    return finish_summary(report, monitor, log)
+
+
+def update_summary(summary_file, index, base_dir, read_sources, record, report, monitor, log):
+    """
+    按索引增量更新汇总表：只重新读取有变化的源文件并替换其行
+
+    Returns:
+        更新后汇总表的全部结果行（用于导出）；没有变化时返回空列表；
+        汇总表与索引不一致、需要完整重新生成时返回 None
+    """
+    from openpyxl import load_workbook
+    from function.result_store import source_stamp
+
+    blocks = index["blocks"]
+    changed = []
+    for position, block in enumerate(blocks):
+        try:
+            stamp = source_stamp(os.path.join(base_dir, block["file"]))
+        except OSError:
+            stamp = None
+        if stamp is None or stamp != block["source"]:
+            changed.append(position)
+        else:
+            entry = report.file_entry(block["file"])
+            entry.update(status="成功", unchanged=True, rows=block["end"] - block["start"] + 1)
+
+    report.set("incremental", True)
+    report.set("changed_files", [blocks[position]["file"] for position in changed])
+    if not changed:
+        log("✅ 源文件均未变化，汇总表无需更新")
+        return []
+
+    monitor.mark("读取")
+    results = read_sources([blocks[position]["file"] for position in changed])
+
+    monitor.mark("写入")
+    try:
+        wb = load_workbook(summary_file)
+    except Exception as e:
+        log(f"⚠ 无法打开汇总表（{e}），完整重新生成")
+        return None
+    styles.register(wb)
+    ws = wb.active
+    if not index_matches(ws, index):
+        log("⚠ 汇总表结构已被改动，完整重新生成")
+        return None
+
+    # 自下而上替换，前面块的行号不受后面平移的影响
+    first_row = index["total_row"]
+    for position, (file, stamp, rows, error, seconds) in reversed(list(zip(changed, results))):
+        rows = record(file, rows, error, seconds)
+        first_row = replace_block(ws, index, position, rows)
+        blocks[position]["source"] = stamp if error is None else None
+        log(f"↻ 已更新：{file}（{len(rows)} 行）")
+
+    monitor.mark("生成")
+    total_row = index["total_row"]
+    write_total_row(ws, total_row)
+    finish_rows(ws, first_row, total_row)
+
+    monitor.mark("保存")
     wb.save(summary_file)
-    return True
\ No newline at end of file
+    log(f"✅ 增量更新 {len(changed)} 个源文件，其余 {len(blocks) - len(changed)} 个未变化")
+
+    # 导出用的全部行：从更新后的汇总表读取（分销商列为合并单元格，向下填充）
+    all_rows = []
+    distributor = None
+    for row in ws.iter_rows(min_row=FIRST_DATA_ROW, max_row=total_row - 1, max_col=4, values_only=True):
+        distributor = row[0] if row[0] is not None else distributor
+        all_rows.append((distributor,) + tuple(row[1:4]))
+    return all_rows
+
+
+def export_summary(settings, base_dir, period, rows, report, monitor, log):
+    """导出（可选）"""
+    if not settings.get("export_formats"):
+        return
+    monitor.mark("导出")
+    try:
+        from function.export import columns_from_rows, export_folder, write_columns
+        columns = columns_from_rows(rows, period)
+        stem = os.path.join(export_folder(base_dir), f"售后汇总-{period}")
+        written = write_columns(columns, stem, settings["export_formats"], log)
+        for path in written:
+            log(f"📤 已导出 {len(columns['name'])} 行：{path}")
+        report.set("exports", written)
+    except Exception as e:
+        log(f"⚠ 导出失败: {e}")
+
+
+def analyze_returns(settings, base_dir, period, report, monitor, log):
+    """跨分销商退货分析（可选，读取对账结果缓存）"""
+    top_n = int(settings.get("analytics_top_n", 0) or 0)
+    if top_n <= 0:
+        return
+    monitor.mark("分析")
+    try:
+        from function.analytics import run_analytics
+        path = run_analytics(base_dir, period, top_n, log=log)
+        if path:
+            report.set("analytics_file", path)
+    except Exception as e:
+        log(f"⚠ 退货分析失败: {e}")
+
+
+def finish_summary(report, monitor, log):
+    monitor.stop()
+    report.set("memory", monitor.summary())
+    report_path = report.save()
+    if report_path:
+        log(f"📄 运行报告：{report_path}")
+    return True
@@ -0,0 +1,414 @@
+# function/worker.py
+"""
+文件隔离 - 在独立的工作进程中处理对账文件，并限制单个文件的耗时与内存
+
+开启后（settings.reconciliation.file_isolation，默认关闭），process_all_files 把每个文件交给工作进程：
+    工作进程启动时读取一次编码表，之后逐个处理主进程发来的文件；
+    输出、运行日志事件、内存记录与解析缓存的命中次数通过管道发回主进程，界面与运行报告与进程内处理时一致。
+工作进程只在一次 process_all_files 内复用，每次运行都要重新读取编码表、解析缓存从空开始，
+不能利用常驻服务（function/service.py）与跨批次的解析缓存，只建议在有超大或异常文件时开启。
+
+限制：
+    file_timeout_seconds    单个文件的处理时间上限（秒），由主进程计时，超时后强制结束工作进程
+    file_memory_limit_mb    工作进程的常驻内存上限（MB），由主进程在等待结果时检查，超出后强制结束工作进程；
+                            另有两层兜底：
+                              · 系统限制：POSIX 上工作进程启动时设置地址空间上限（RLIMIT_AS），Windows 上把工作进程
+                                放入限制提交内存的作业对象（Job Object）；超出时分配失败，工作进程随即退出。
+                                地址空间 / 提交内存包含预留而未使用的部分（线程栈、分配区等），比常驻内存大得多，
+                                因此设为上限的 HARD_LIMIT_FACTOR 倍再加 HARD_LIMIT_EXTRA_MB
+                              · 工作进程内的监视线程（无法读取其他进程内存的平台上由它检查）
+超限的文件记为失败并写明原因，下一个文件会启动新的工作进程继续处理，批次不中断。
+工作进程被强制结束时，对账文件先写入临时文件再替换（见 save_workbook_atomic），不会留下写了一半的工作簿。
+
+用法：
+    with FileWorker(mapping_file, settings) as worker:
+        ok, memory_record = worker.process(file_path, file_entry, journal)
+"""
+import os
+import sys
+import time
+import threading
+
+MEMORY_EXIT_CODE = 86       # 工作进程因内存超限自行退出时的退出码
+READY_TIMEOUT = 300         # 等待工作进程启动（导入模块、读取编码表）的最长时间（秒）
+POLL_INTERVAL = 0.2         # 主进程等待结果时的轮询间隔（秒）
+WATCH_INTERVAL = 0.1        # 工作进程内存监视线程的检查间隔（秒）
+HARD_LIMIT_FACTOR = 2       # 系统内存限制 = 上限 × HARD_LIMIT_FACTOR + HARD_LIMIT_EXTRA_MB
+HARD_LIMIT_EXTRA_MB = 2048
+
+MB = 1024 * 1024
+
+
+class WorkerLimitExceeded(RuntimeError):
+    """文件超出耗时或内存限制，工作进程已被结束"""
+
+
+class _PipeJournal:
+    """工作进程中的运行日志：事件发回主进程，由主进程的 RunJournal 写入"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def record(self, event, file_name=None, **fields):
+        self.conn.send(("journal", event, file_name, fields))
+
+
+def _watch_memory(limit_bytes):
+    """内存监视线程：常驻内存超过上限时立即结束本进程（不做清理，避免继续占用内存）"""
+    from function.monitor import current_rss
+
+    while True:
+        rss = current_rss()
+        if rss > limit_bytes:
+            try:
+                sys.__stderr__.write(f"工作进程内存 {rss / MB:.0f} MB 超出上限 {limit_bytes / MB:.0f} MB，退出\n")
+            except Exception:
+                pass
+            os._exit(MEMORY_EXIT_CODE)
+        time.sleep(WATCH_INTERVAL)
+
+
+def _hard_limit_bytes(limit_mb):
+    return int((limit_mb * HARD_LIMIT_FACTOR + HARD_LIMIT_EXTRA_MB) * MB)
+
+
+def _limit_address_space(limit_bytes):
+    """POSIX：设置本进程的地址空间上限，由内核强制执行（不能高于已有的硬限制）"""
+    try:
+        import resource
+    except ImportError:
+        return
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit_bytes = min(limit_bytes, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _create_job(pid, limit_bytes):
+    """
+    Windows：把进程放入限制提交内存的作业对象，返回作业句柄（失败时返回 None）
+
+    作业设置了 KILL_ON_JOB_CLOSE，关闭句柄（或主进程退出）时工作进程随之结束
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            "ReadOperationCount", "WriteOperationCount", "OtherOperationCount",
+            "ReadTransferCount", "WriteTransferCount", "OtherTransferCount")]
+
+    class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ("PerProcessUserTimeLimit", ctypes.c_int64),
+            ("PerJobUserTimeLimit", ctypes.c_int64),
+            ("LimitFlags", wintypes.DWORD),
+            ("MinimumWorkingSetSize", ctypes.c_size_t),
+            ("MaximumWorkingSetSize", ctypes.c_size_t),
+            ("ActiveProcessLimit", wintypes.DWORD),
+            ("Affinity", ctypes.c_size_t),
+            ("PriorityClass", wintypes.DWORD),
+            ("SchedulingClass", wintypes.DWORD),
+        ]
+
+    class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ("BasicLimitInformation", JOBOBJECT_BASIC_LIMIT_INFORMATION),
+            ("IoInfo", IO_COUNTERS),
+            ("ProcessMemoryLimit", ctypes.c_size_t),
+            ("JobMemoryLimit", ctypes.c_size_t),
+            ("PeakProcessMemoryUsed", ctypes.c_size_t),
+            ("PeakJobMemoryUsed", ctypes.c_size_t),
+        ]
+
+    JOB_OBJECT_LIMIT_PROCESS_MEMORY = 0x100
+    JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE = 0x2000
+    JOB_OBJECT_EXTENDED_LIMIT_INFORMATION_CLASS = 9
+    PROCESS_SET_QUOTA, PROCESS_TERMINATE = 0x0100, 0x0001
+
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    job = kernel32.CreateJobObjectW(None, None)
+    if not job:
+        return None
+    info = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+    info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_PROCESS_MEMORY | JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
+    info.ProcessMemoryLimit = limit_bytes
+    process = kernel32.OpenProcess(PROCESS_SET_QUOTA | PROCESS_TERMINATE, False, pid)
+    ok = bool(process) and bool(kernel32.SetInformationJobObject(
+        wintypes.HANDLE(job), JOB_OBJECT_EXTENDED_LIMIT_INFORMATION_CLASS, ctypes.byref(info), ctypes.sizeof(info)
+    )) and bool(kernel32.AssignProcessToJobObject(wintypes.HANDLE(job), wintypes.HANDLE(process)))
+    if process:
+        kernel32.CloseHandle(wintypes.HANDLE(process))
+    if not ok:
+        kernel32.CloseHandle(wintypes.HANDLE(job))
+        return None
+    return job
+
+
+def _close_job(job):
+    import ctypes
+    from ctypes import wintypes
+    ctypes.windll.kernel32.CloseHandle(wintypes.HANDLE(job))
+
+
+def _worker_main(conn, mapping_file, settings):
+    """工作进程入口：读取编码表后循环处理主进程发来的文件，收到 None 时退出"""
+    from function.reconciliation import OutputRedirector
+
+    sys.stdout = OutputRedirector(lambda line: conn.send(("log", line)))
+
+    limit_mb = float(settings.get("file_memory_limit_mb") or 0)
+    if limit_mb > 0:
+        if sys.platform != "win32":
+            _limit_address_space(_hard_limit_bytes(limit_mb))
+        threading.Thread(target=_watch_memory, args=(limit_mb * MB,), name="memory-watch", daemon=True).start()
+
+    from function.reconciliation import bundle_cache, get_mapping, process_file
+    from function.monitor import ResourceMonitor, current_rss
+
+    bundle_cache.resize(settings["bundle_cache_size"])
+    tax_distributor_map, code_info, version, _ = get_mapping(mapping_file)
+    monitor = ResourceMonitor.from_settings(settings)
+    monitor.start()
+    journal = _PipeJournal(conn)
+    conn.send(("ready", os.getpid(), round(current_rss() / MB, 1)))
+
+    while True:
+        file_path = conn.recv()
+        if file_path is None:
+            break
+        file_name = os.path.basename(file_path)
+        file_entry = {}
+        hits, misses = bundle_cache.hits, bundle_cache.misses
+
+        def stats():
+            """本文件的解析缓存命中次数（增量）与缓存条目数"""
+            return {"hits": bundle_cache.hits - hits, "misses": bundle_cache.misses - misses,
+                    "size": len(bundle_cache)}
+
+        try:
+            monitor.start_file(file_name, os.path.getsize(file_path))
+            ok = process_file(file_path, code_info, tax_distributor_map, version, settings, monitor, file_entry,
+                              journal)
+            monitor.end_file()
+            sys.stdout.flush()
+            conn.send(("done", ok, file_entry, monitor.files.pop(file_name, None), stats()))
+        except MemoryError:
+            # 超出系统内存限制：不再尝试发送结果（可能再次分配失败），按内存超限退出
+            os._exit(MEMORY_EXIT_CODE)
+        except Exception as e:
+            import traceback
+            monitor.end_file()
+            print(traceback.format_exc())
+            sys.stdout.flush()
+            conn.send(("error", str(e), file_entry, monitor.files.pop(file_name, None), stats()))
+
+    monitor.stop()
+    sys.stdout.flush()
+
+
+class FileWorker:
+    """主进程一侧：管理工作进程的启动、计时、结束与回收"""
+
+    def __init__(self, mapping_file, settings, log=print):
+        self.mapping_file = mapping_file
+        self.settings = settings
+        self.log = log
+        self.timeout = float(settings.get("file_timeout_seconds") or 0)
+        self.memory_limit_mb = float(settings.get("file_memory_limit_mb") or 0)
+        self.proc = None
+        self.conn = None
+        self._job = None            # Windows 作业对象句柄
+        self._over_memory = False   # 主进程发现内存超限并结束了工作进程
+        self.started_count = 0  # 启动过的工作进程数（含回收后重新启动的）
+        self.cache_hits = 0     # 各工作进程解析缓存的累计命中 / 未命中次数
+        self.cache_misses = 0
+        self.cache_size = 0     # 最近一个文件处理后工作进程中的缓存条目数
+        self.peak_rss_mb = 0.0  # 工作进程的内存峰值（含启动时读取编码表）
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ===============================
+    # 启停
+    # ===============================
+    def _start(self):
+        import multiprocessing
+
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_worker_main, args=(child_conn, self.mapping_file, self.settings),
+                              name="reconciliation-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        self.proc, self.conn = process, parent_conn
+        self._over_memory = False
+        self.started_count += 1
+        if self.memory_limit_mb > 0 and sys.platform == "win32":
+            try:
+                self._job = _create_job(process.pid, _hard_limit_bytes(self.memory_limit_mb))
+            except Exception:
+                self._job = None
+
+        deadline = time.monotonic() + READY_TIMEOUT
+        while True:
+            message = self._receive(deadline)
+            if message is None:
+                reason = self._exit_reason() or f"工作进程 {READY_TIMEOUT} 秒内未能启动"
+                self._kill()
+                raise RuntimeError(f"无法启动工作进程：{reason}")
+            if message[0] == "ready":
+                self.peak_rss_mb = max(self.peak_rss_mb, message[2])
+                return
+
+    def _kill(self):
+        if self.proc is None:
+            return
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(timeout=5)
+        self.conn.close()
+        self.proc = self.conn = None
+        if self._job is not None:
+            _close_job(self._job)
+            self._job = None
+
+    def close(self):
+        """通知工作进程退出；未能按时退出时强制结束"""
+        if self.proc is None:
+            return
+        try:
+            self.conn.send(None)
+            while self.conn.poll(5):
+                self._handle(self.conn.recv(), None)
+        except (OSError, EOFError):
+            pass
+        self.proc.join(timeout=5)
+        self._kill()
+
+    # ===============================
+    # 处理文件
+    # ===============================
+    def _exit_reason(self):
+        """工作进程已退出时返回原因，仍在运行时返回 None"""
+        if self.proc.is_alive():
+            return None
+        code = self.proc.exitcode
+        if self._over_memory or code == MEMORY_EXIT_CODE:
+            return f"内存超出上限 {self.memory_limit_mb:g} MB，已结束工作进程"
+        return f"工作进程意外退出（退出码 {code}）"
+
+    def _handle(self, message, journal):
+        """处理日志类消息；返回 True 表示已处理，结果类消息返回 False"""
+        kind = message[0]
+        if kind == "log":
+            self.log(message[1])
+            return True
+        if kind == "journal":
+            _, event, file_name, fields = message
+            if journal is not None:
+                journal.record(event, file_name, **fields)
+            return True
+        return False
+
+    def _check_memory(self):
+        """主进程一侧检查工作进程的常驻内存，超出上限时结束工作进程；读取不到内存时返回 False"""
+        if self.memory_limit_mb <= 0:
+            return False
+        from function.monitor import current_rss
+
+        rss_mb = current_rss(self.proc.pid) / MB
+        self.peak_rss_mb = max(self.peak_rss_mb, round(rss_mb, 1))
+        if rss_mb <= self.memory_limit_mb:
+            return False
+        self.log(f"工作进程内存 {rss_mb:.0f} MB 超出上限 {self.memory_limit_mb:g} MB，结束工作进程")
+        self._over_memory = True
+        self.proc.kill()
+        self.proc.join(timeout=5)
+        return True
+
+    def _receive(self, deadline, journal=None):
+        """等待下一条结果类消息；超过 deadline、内存超限或工作进程退出时返回 None"""
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                if self.conn.poll(POLL_INTERVAL if remaining is None else min(POLL_INTERVAL, remaining)):
+                    message = self.conn.recv()
+                    if not self._handle(message, journal):
+                        return message
+                    continue
+            except (OSError, EOFError):
+                # 管道已关闭：工作进程正在退出，等它结束以便读取退出码
+                self.proc.join(timeout=5)
+                return None
+            if not self.proc.is_alive() and not self.conn.poll():
+                return None
+            if self._check_memory():
+                return None
+
+    def cache_hit_rate(self):
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else 0.0
+
+    def _collect(self, memory_record, stats):
+        """累计工作进程发回的解析缓存命中次数与内存峰值"""
+        self.cache_hits += stats["hits"]
+        self.cache_misses += stats["misses"]
+        self.cache_size = stats["size"]
+        if memory_record is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb, memory_record.get("peak_rss_mb", 0))
+
+    def process(self, file_path, file_entry, journal=None):
+        """
+        在工作进程中处理一个文件
+
+        Args:
+            file_entry: 运行报告中该文件的记录，工作进程的处理结果合并到其中
+            journal: RunJournal，工作进程的 computed / saved 事件写入其中，可为 None
+
+        Returns:
+            (process_file 的返回值, 工作进程记录的该文件内存信息或 None)
+
+        Raises:
+            WorkerLimitExceeded: 超出耗时或内存限制（工作进程已结束，下次调用时重新启动）
+            RuntimeError: 工作进程中处理出错，或工作进程意外退出
+        """
+        if self.proc is None or not self.proc.is_alive():
+            if self.proc is not None:
+                self._kill()
+            self._start()
+
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout > 0 else None
+        self.conn.send(file_path)
+        message = self._receive(deadline, journal)
+
+        if message is None:
+            # 超时或工作进程已退出：结束并回收，下一个文件重新启动
+            crashed = (not self.proc.is_alive() and not self._over_memory
+                       and self.proc.exitcode != MEMORY_EXIT_CODE)
+            reason = self._exit_reason() or f"处理超过 {self.timeout:g} 秒，已结束工作进程"
+            self._kill()
+            file_entry.update(killed=True, seconds=round(time.monotonic() - started, 1))
+            raise (RuntimeError if crashed else WorkerLimitExceeded)(reason)
+
+        kind, *payload = message
+        if kind == "done":
+            ok, entry, memory_record, stats = payload
+            file_entry.update(entry)
+            self._collect(memory_record, stats)
+            return ok, memory_record
+        error, entry, memory_record, stats = payload
+        file_entry.update(entry)
+        self._collect(memory_record, stats)
+        raise RuntimeError(error)
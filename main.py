@@ -1,5 +1,6 @@
 # main.py (应用启动文件)
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from widgets_main_window import ModernWindow
 
@@ -16,4 +17,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后文件隔离的工作进程（见 function/worker.py）需要
     main()
\ No newline at end of file
@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+import math
+
+import pytest
+
+# 从仓库根目录导入 function 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def data_folder(tmp_path):
+    """最小的数据文件夹：编码表\\编码.xlsx（A1、B2 两个编码）与 1~3 号三个订单文件"""
+    import pandas as pd
+    from function import difftest
+
+    os.makedirs(tmp_path / "编码表")
+    pd.DataFrame(
+        [["A1", "货品A1", "成品", 10.0, math.nan], ["B2", "货品B2", "成品", 5.0, math.nan]],
+        columns=["货品商家编码", "名称", "产品类型", "供货价", "供货价（含税）"],
+    ).to_excel(tmp_path / "编码表" / "编码.xlsx", index=False)
+    for number in (1, 2, 3):
+        difftest.write_orders(["A1", "B2*2", "A1"], tmp_path / f"{number}号-测试.xlsx")
+    return str(tmp_path)
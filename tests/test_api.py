@@ -0,0 +1,60 @@
+# tests/test_api.py
+"""对账计算接口：DataFrame / 序列 / 分块输入结果一致，与对账流程写入的缓存一致"""
+import os
+import random
+
+import pandas as pd
+import pytest
+
+from function import api, difftest, result_store
+from function.reconciliation import MULTIPLE_CODE_REASON, process_all_files
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_chunked_input_matches_dataframe(seed):
+    rng = random.Random(seed)
+    map_df, codes = difftest.random_mapping(rng)
+    cells = difftest.random_cells(rng, map_df, codes, 50)
+    mapping = api.build_mapping(map_df)
+
+    whole = api.reconcile(pd.DataFrame({"商家编码": cells}, dtype=object), mapping, "1号")
+    values = [cell for cell in cells if cell is not None]
+    chunks = [values[start:start + 7] for start in range(0, len(values), 7)]
+    assert api.reconcile(iter(chunks), mapping, "1号", chunked=True) == whole
+    assert api.reconcile(cells, mapping, "1号") == whole
+    assert set(whole) >= {"rows", "unmatched", "missing_price", "gifts", "totals"}
+
+
+def test_gifts_and_totals():
+    map_df = pd.DataFrame(
+        [["A1", "货品A", "成品", 10.0, 12.0], ["G1", "赠品G", "赠品", 0.0, None]],
+        columns=["货品商家编码", "名称", "产品类型", "供货价", "供货价（含税）"],
+    ).assign(含税分销商=["2号", None])
+    mapping = api.build_mapping(map_df)
+
+    result = api.reconcile(["A1*2;G1", "A1", None], mapping, "1号")
+    assert result["gifts"] == {"G1": 1}
+    assert [(row["name"], row["count"]) for row in result["rows"]] == [("货品A", 3)]
+    assert result["totals"] == {"quantity": -3, "fee": -3, "amount": -27.0}
+    assert api.reconcile(["A1"], mapping, "2号")["use_tax_price"]
+
+
+def test_code_column_errors():
+    mapping = api.build_mapping(difftest.random_mapping(random.Random(0))[0])
+    orders = pd.DataFrame([["A1", "A1"]], columns=["商家编码", " 商家编码"])
+    with pytest.raises(ValueError, match=MULTIPLE_CODE_REASON):
+        api.reconcile(orders, mapping, "1号")
+    with pytest.raises(KeyError):
+        api.reconcile(pd.DataFrame({"编码": ["A1"]}), mapping, "1号")
+
+
+def test_process_file_caches_the_api_result(data_folder):
+    """对账流程只负责读写工作簿，缓存中的结果就是 api.reconcile 的结果（不含合计）"""
+    assert process_all_files(data_folder=data_folder)
+    map_df = pd.read_excel(os.path.join(data_folder, "编码表", "编码.xlsx"))
+    orders = pd.read_excel(os.path.join(data_folder, "1号-测试.xlsx"), sheet_name="Sheet1")
+
+    expected = api.reconcile(orders, map_df, "1号", file_name="1号-测试.xlsx")
+    cached = result_store.load_result(data_folder, "1号-测试.xlsx")
+    del expected["totals"], cached["source"]
+    assert cached == expected
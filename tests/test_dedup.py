@@ -0,0 +1,83 @@
+# tests/test_dedup.py
+"""重复订单检测：订单号规范化、同一文件重跑不算重复、跨文件重复订单与重复导出、长数字订单号"""
+import os
+import glob
+import json
+
+import pytest
+from openpyxl import Workbook
+
+from function import dedup, reconciliation
+
+
+def test_normalize_order_id():
+    assert dedup.normalize_order_id(" 123 ") == "123"
+    assert dedup.normalize_order_id(123.0) == "123"
+    assert dedup.normalize_order_id(123) == "123"
+    assert dedup.normalize_order_id(float("nan")) is None
+    assert dedup.normalize_order_id("  ") is None
+    assert dedup.normalize_order_id(None) is None
+    assert dedup.order_key("123") == dedup.order_key(dedup.normalize_order_id(123.0))
+    assert dedup.order_key("123") != dedup.order_key("124")
+
+
+def test_find_order_column_returns_header_as_written():
+    assert dedup.find_order_column(["商家编码", " 单号 ", "订单号"], ["订单号", "单号"]) == (3, "订单号")
+    assert dedup.find_order_column(["商家编码", " 单号 "], ["订单号", "单号"]) == (2, " 单号 ")
+    assert dedup.find_order_column(["商家编码"], ["订单号"]) == (None, None)
+
+
+def test_session_sources(tmp_path):
+    index = dedup.DedupIndex(str(tmp_path))
+    try:
+        session = index.begin_file("1号.xlsx", "2026-08")
+        assert session.check(["1", "2", "2"], ["A", "B", "B"]) == [False, False, False]
+        assert session.finish()["duplicate_rows"] == 0
+
+        # 同一文件在其他期间重新对账：不算重复，也不算重复导出
+        session = index.begin_file("1号.xlsx", "2026-09")
+        assert session.check(["1", "2", "2"], ["A", "B", "B"]) == [False, False, False]
+        assert session.finish()["duplicate_file"] is None
+
+        # 其他文件中出现的订单号算重复
+        session = index.begin_file("2号.xlsx", "2026-09")
+        assert session.check(["1", "9"], ["A", "Z"]) == [True, False]
+        result = session.finish()
+        assert result["duplicate_rows"] == 1 and result["duplicate_orders"] == 1
+
+        # 内容与其他文件完全相同：重复导出
+        session = index.begin_file("3号.xlsx", "2026-09")
+        session.check(["1", "2", "2"], ["A", "B", "B"])
+        assert session.finish()["duplicate_file"] == "1号.xlsx（2026-08）"
+    finally:
+        index.close()
+
+
+def _write_orders(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    ws.append(["订单号", "商家编码"])
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def _dedup_entry(data_folder, file_name):
+    reports = glob.glob(os.path.join(data_folder, "运行报告", "对账-*.json"))
+    with open(max(reports, key=os.path.getmtime), "r", encoding="utf-8") as f:
+        return json.load(f)["files"][file_name]["dedup"]
+
+
+@pytest.mark.parametrize("stream_mode", ["never", "always"])
+def test_long_numeric_order_ids_keep_every_digit(data_folder, monkeypatch, stream_mode):
+    """19 位数字订单号（文本单元格，列中有空行时 pandas 按数值会读成 float64）只差最后一位时不算重复"""
+    settings = dict(reconciliation.DEFAULT_SETTINGS, dedup_mode="report", stream_mode=stream_mode, sku_index=False)
+    monkeypatch.setattr(reconciliation, "load_settings", lambda: settings)
+    _write_orders(os.path.join(data_folder, "1号-测试.xlsx"), [["1234567890123456789", "A1"], [None, "B2"]])
+    _write_orders(os.path.join(data_folder, "2号-测试.xlsx"), [["1234567890123456788", "A1"], [None, "B2"]])
+    _write_orders(os.path.join(data_folder, "3号-测试.xlsx"), [["1234567890123456789", "B2"], [None, "A1"]])
+
+    for file_name, duplicate_rows in (("1号-测试.xlsx", 0), ("2号-测试.xlsx", 0), ("3号-测试.xlsx", 1)):
+        assert reconciliation.process_all_files(data_folder=data_folder, only_files=[file_name])
+        assert _dedup_entry(data_folder, file_name)["duplicate_rows"] == duplicate_rows
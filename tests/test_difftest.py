@@ -0,0 +1,61 @@
+# tests/test_difftest.py
+"""
+差分测试的固定种子子集：当前实现（含流式与 pandas 两种读取方式）必须与参考实现一致
+
+完整的随机测试见 python -m function.difftest --cases 500 --files
+"""
+import math
+import random
+
+import pandas as pd
+import pytest
+
+from function import difftest
+
+
+def _mapping(codes):
+    return pd.DataFrame(
+        [[code, f"货品{code}", "成品", 10.0, math.nan] for code in codes],
+        columns=["货品商家编码", "名称", "产品类型", "供货价", "供货价（含税）"],
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_random_cases(seed):
+    failure = difftest.run(cases=60, seed=seed, rows=40)
+    assert failure is None, failure and failure["differences"]
+
+
+@pytest.mark.parametrize("seed", [1, 7])
+def test_random_cases_from_files(seed):
+    failure = difftest.run(cases=15, seed=seed, rows=30, files=True)
+    assert failure is None, failure and failure["differences"]
+
+
+def test_numeric_code_column_with_blanks(tmp_path):
+    """纯数字的商家编码列含空行时，pandas 读成浮点数，流式读取为整数，两者都按编码 "1001" 统计"""
+    map_df = _mapping(["1001", "1002"])
+    cells = [1001, None, 1002, 1001]
+
+    file_path = tmp_path / "订单.xlsx"
+    difftest.write_orders(cells, file_path)
+    assert pd.read_excel(file_path, sheet_name="Sheet1")[difftest.CODE_COLUMN].dtype == float
+
+    assert difftest.compare(map_df, cells, False, files=True) == []
+    for variant in difftest.FILE_VARIANTS:
+        outcome = difftest.run_file(map_df, file_path, False, variant, random.Random(0))
+        assert outcome["code_counter"] == [("1001", 2), ("1002", 1)]
+        assert outcome["unmatched_codes"] == []
+
+
+def test_integer_float_cells_are_a_deliberate_change_from_the_baseline():
+    """参考实现保持最初的行为（1001.0 不匹配），当前实现按整数编码统计；两者只在输入端对齐"""
+    from function import reference
+
+    map_df = _mapping(["1001"])
+    baseline = reference.count_codes([1001.0], reference.build_code_info(map_df))
+    assert baseline[1] == {"1001.0"}
+
+    current = difftest.run_current(map_df, [1001.0], False, "chunks", random.Random(0))
+    assert current["unmatched_codes"] == []
+    assert current == difftest.run_reference(map_df, [1001.0], False)
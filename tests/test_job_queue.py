@@ -0,0 +1,125 @@
+# tests/test_job_queue.py
+"""共享文件夹队列：租约只能被一个进程持有，失效租约的回收与领取是同一个原子操作"""
+import os
+import threading
+
+from function.job_queue import JobQueue
+
+FILE_NAME = "1号-测试.xlsx"
+
+
+def _queue(data_folder, worker_id, lease_seconds=60):
+    return JobQueue(data_folder, "test", lease_seconds, worker_id=worker_id)
+
+
+def _expire(queue, generation):
+    os.utime(queue._lease_path(FILE_NAME, generation), (1, 1))
+
+
+def test_only_one_worker_claims_a_file(tmp_path):
+    a, b = _queue(str(tmp_path), "a"), _queue(str(tmp_path), "b")
+    try:
+        assert a.claim(FILE_NAME)
+        assert not b.claim(FILE_NAME)
+        assert a.status([FILE_NAME])["leased"] == [FILE_NAME]
+
+        a.complete(FILE_NAME, "成功")
+        assert not b.claim(FILE_NAME)
+        assert b.status([FILE_NAME])["done"] == [FILE_NAME]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_stale_lease_is_taken_over_by_next_generation(tmp_path):
+    a, b, c = (_queue(str(tmp_path), worker_id) for worker_id in "abc")
+    try:
+        assert a.claim(FILE_NAME)
+        _expire(a, 0)
+        assert b.claim(FILE_NAME)
+        assert b._held == {FILE_NAME: 1}
+        # 新租约未失效，其他进程不能再回收；旧租约文件保留
+        assert not c.claim(FILE_NAME)
+        assert os.path.exists(a._lease_path(FILE_NAME, 0))
+    finally:
+        for queue in (a, b, c):
+            queue.close()
+
+
+def test_released_lease_can_be_claimed_immediately(tmp_path):
+    a, b = _queue(str(tmp_path), "a"), _queue(str(tmp_path), "b")
+    try:
+        assert a.claim(FILE_NAME)
+        a.release(FILE_NAME)
+        assert a.status([FILE_NAME])["pending"] == [FILE_NAME]
+        assert b.claim(FILE_NAME)
+        assert b._held == {FILE_NAME: 1}
+    finally:
+        a.close()
+        b.close()
+
+
+def test_concurrent_recovery_has_a_single_winner(tmp_path):
+    first = _queue(str(tmp_path), "first")
+    assert first.claim(FILE_NAME)
+    first._held.clear()     # 模拟崩溃：不再刷新、也不释放
+    _expire(first, 0)
+
+    queues = [_queue(str(tmp_path), f"w{i}") for i in range(8)]
+    barrier = threading.Barrier(len(queues))
+    won = []
+
+    def attempt(queue):
+        barrier.wait()
+        if queue.claim(FILE_NAME):
+            won.append(queue.worker_id)
+
+    threads = [threading.Thread(target=attempt, args=(queue,)) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert len(won) == 1
+    finally:
+        for queue in queues + [first]:
+            queue.close()
+
+
+def test_heartbeat_notices_a_lost_lease(tmp_path):
+    a, b = _queue(str(tmp_path), "a", lease_seconds=1.5), _queue(str(tmp_path), "b", lease_seconds=1.5)
+    try:
+        assert a.claim(FILE_NAME)
+        a._stop_event.set()
+        a._heartbeat.join()
+        _expire(a, 0)
+        assert b.claim(FILE_NAME)
+
+        a._stop_event.clear()
+        thread = threading.Thread(target=a._heartbeat_loop, daemon=True)
+        thread.start()
+        threading.Event().wait(1)
+        a._stop_event.set()
+        thread.join()
+        assert a._held == {}
+        # 丢失租约的进程不会刷新别人的租约，也不会在结束时放弃它
+        a.close()
+        assert not b._is_stale(b._lease_path(FILE_NAME, 1))
+    finally:
+        b.close()
+
+
+def test_only_one_worker_finishes_the_batch(tmp_path):
+    a, b = _queue(str(tmp_path), "a"), _queue(str(tmp_path), "b")
+    try:
+        assert a.claim(FILE_NAME)
+        a.complete(FILE_NAME, "成功")
+        assert [b.claim_finish(), a.claim_finish()] == [True, False]
+
+        # 批次中又完成了新文件：再收尾一次
+        assert b.claim("2号-测试.xlsx")
+        b.complete("2号-测试.xlsx", "成功")
+        assert a.claim_finish() and not b.claim_finish()
+    finally:
+        a.close()
+        b.close()
@@ -0,0 +1,75 @@
+# tests/test_journal.py
+"""运行日志：按记录的文件列表续跑、按批次区分、跳过仍在运行的日志、过期清理"""
+import os
+import json
+import time
+
+from function import journal
+from function.reconciliation import process_all_files
+
+
+def _write_journal(data_folder, name, events, age_seconds=0):
+    folder = journal.journal_folder(data_folder)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{journal.JOURNAL_PREFIX}{name}.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    if age_seconds:
+        stamp = time.time() - age_seconds
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def _started(files, batch=None, host="其他电脑", pid=1):
+    return {"event": "run_started", "files": files, "batch": batch, "host": host, "pid": pid}
+
+
+def test_resume_uses_recorded_file_list(data_folder):
+    """中断的运行只处理了 1 号；续跑只处理记录中的 2 号，不处理当时未选中的 3 号"""
+    path = _write_journal(data_folder, "20260101-000000-1", [
+        _started(["1号-测试.xlsx", "2号-测试.xlsx"]),
+        {"event": "saved", "file": "1号-测试.xlsx"},
+        {"event": "started", "file": "2号-测试.xlsx"},
+    ], age_seconds=3600)
+
+    assert process_all_files(data_folder=data_folder, resume=True)
+
+    events = journal.read_events(path)
+    assert [e["file"] for e in events if e["event"] == "started"] == ["2号-测试.xlsx", "2号-测试.xlsx"]
+    assert events[-1]["event"] == "run_finished"
+    assert any(e["event"] == "run_resumed" and e["pid"] == os.getpid() for e in events)
+
+
+def test_latest_unfinished_is_scoped_by_batch(data_folder):
+    _write_journal(data_folder, "20260101-000000-1", [_started(["1号-测试.xlsx"], batch="A")], age_seconds=3600)
+    assert journal.latest_unfinished(data_folder) is None
+    assert journal.latest_unfinished(data_folder, "B") is None
+    assert journal.latest_unfinished(data_folder, "A") is not None
+
+
+def test_latest_unfinished_skips_live_owners(data_folder):
+    """同一批次中仍在运行的进程（本机进程存在 / 其他电脑心跳未超时）的日志不续跑，取更早的中断日志"""
+    older = _write_journal(data_folder, "20260101-000000-1",
+                           [_started(["1号-测试.xlsx"], batch="A")], age_seconds=3600)
+    _write_journal(data_folder, "20260101-000001-2", [_started(["2号-测试.xlsx"], batch="A")])
+    _write_journal(data_folder, "20260101-000002-3",
+                   [_started(["3号-测试.xlsx"], batch="A", host=journal.socket.gethostname(), pid=os.getppid())],
+                   age_seconds=3600)
+
+    assert journal.latest_unfinished(data_folder, "A") == older
+
+
+def test_latest_unfinished_stops_at_finished_run(data_folder):
+    _write_journal(data_folder, "20260101-000000-1", [_started(["1号-测试.xlsx"])], age_seconds=3600)
+    _write_journal(data_folder, "20260101-000001-2", [_started(["1号-测试.xlsx"]), {"event": "run_finished"}])
+    assert journal.latest_unfinished(data_folder) is None
+
+
+def test_prune_keeps_recent_and_live_journals(data_folder):
+    old = _write_journal(data_folder, "20250101-000000-1", [_started([])], age_seconds=40 * 86400)
+    recent = _write_journal(data_folder, "20260101-000000-2", [_started([])], age_seconds=86400)
+
+    assert journal.prune_journals(data_folder, 0) == 0
+    assert journal.prune_journals(data_folder, 30) == 1
+    assert not os.path.exists(old) and os.path.exists(recent)
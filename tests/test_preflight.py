@@ -0,0 +1,16 @@
+# tests/test_preflight.py
+"""预检：未匹配编码始终是列表（不统计时为空列表），报告可直接切片打印"""
+import os
+
+from function.preflight import check_file, print_preflight_report, run_preflight
+
+
+def test_unmatched_is_a_list(data_folder, capsys):
+    file_path = os.path.join(data_folder, "1号-测试.xlsx")
+    assert check_file(file_path)["unmatched"] == []
+
+    report = run_preflight(data_folder)
+    for item in report.files:
+        item["warnings"].append("测试")
+    print_preflight_report(report)
+    assert "未匹配" not in capsys.readouterr().out
@@ -0,0 +1,21 @@
+# tests/test_result_store.py
+"""结果缓存：只返回仍对应数据文件夹中对账文件的结果"""
+import os
+
+from function import result_store
+from function.reconciliation import process_all_files
+
+
+def test_load_results_skips_deleted_renamed_and_modified_files(data_folder):
+    assert process_all_files(data_folder=data_folder)
+    assert sorted(r["file"] for r in result_store.load_results(data_folder)) == [
+        "1号-测试.xlsx", "2号-测试.xlsx", "3号-测试.xlsx"]
+
+    os.remove(os.path.join(data_folder, "1号-测试.xlsx"))
+    os.rename(os.path.join(data_folder, "2号-测试.xlsx"), os.path.join(data_folder, "4号-测试.xlsx"))
+    with open(os.path.join(data_folder, "3号-测试.xlsx"), "ab") as f:
+        f.write(b"\0")
+
+    assert result_store.load_results(data_folder) == []
+    # 单个文件的缓存照常读取（对账时用于判断结果是否变化）
+    assert result_store.load_result(data_folder, "1号-测试.xlsx")["file"] == "1号-测试.xlsx"
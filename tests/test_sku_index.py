@@ -0,0 +1,92 @@
+# tests/test_sku_index.py
+"""编码索引：编码表变化后按变化的编码找出需要重算的文件"""
+import math
+import os
+
+import pandas as pd
+import pytest
+
+from function import difftest, reconciliation, sku_index
+
+# 1 号只用 A1，2 号只用 B2，3 号用 A1 且有未匹配的 C3；3 号使用含税价
+MAPPING = {
+    "A1": ["货品A1", "成品", 10.0, 11.0],
+    "B2": ["货品B2", "成品", 5.0, 6.0],
+}
+ORDERS = {"1号-测试.xlsx": ["A1"], "2号-测试.xlsx": ["B2*2"], "3号-测试.xlsx": ["A1", "C3"]}
+TAX_DISTRIBUTORS = ["3号"]
+
+
+def _write_mapping(data_folder, mapping, tax_distributors=TAX_DISTRIBUTORS):
+    rows = [[code] + values for code, values in mapping.items()]
+    df = pd.DataFrame(rows, columns=["货品商家编码", "名称", "产品类型", "供货价", "供货价（含税）"])
+    df["含税分销商"] = pd.Series(tax_distributors, dtype=object).reindex(df.index)
+    path = os.path.join(data_folder, "编码表", "编码.xlsx")
+    df.to_excel(path, index=False)
+    # 版本号取修改时间与大小，同一时刻重写时显式推进修改时间
+    stamp = os.stat(path).st_mtime + len(mapping) + len(tax_distributors)
+    os.utime(path, (stamp, stamp))
+
+
+@pytest.fixture
+def indexed_folder(data_folder, monkeypatch):
+    settings = dict(reconciliation.DEFAULT_SETTINGS, sku_index=True, sku_search_index=False)
+    monkeypatch.setattr(reconciliation, "load_settings", lambda: settings)
+    _write_mapping(data_folder, MAPPING)
+    for file_name, codes in ORDERS.items():
+        difftest.write_orders(codes, os.path.join(data_folder, file_name))
+    assert reconciliation.process_all_files(data_folder=data_folder)
+    yield data_folder
+    sku_index._indexes.pop(os.path.abspath(data_folder)).close()
+
+
+def _plan(data_folder, mapping, tax_distributors=TAX_DISTRIBUTORS):
+    _write_mapping(data_folder, mapping, tax_distributors)
+    _, affected, _, unaffected = sku_index.plan_reprice(data_folder)
+    return affected, unaffected
+
+
+def _changed(code, position, value):
+    mapping = {c: list(values) for c, values in MAPPING.items()}
+    mapping[code][position] = value
+    return mapping
+
+
+def test_index_records_usage_and_unmatched(indexed_folder):
+    index = sku_index.open_index(indexed_folder)
+    assert index.where("A1") == [("1号-测试.xlsx", "货品A1"), ("3号-测试.xlsx", "货品A1")]
+    assert index.where("C3") == [("3号-测试.xlsx", None)]
+
+
+def test_unchanged_mapping_affects_nothing(indexed_folder):
+    affected, unaffected = _plan(indexed_folder, MAPPING)
+    assert affected == {}
+    assert sorted(unaffected) == sorted(ORDERS)
+
+
+@pytest.mark.parametrize("mapping, expected", [
+    (_changed("B2", 2, 5.5), {"2号-测试.xlsx"}),                       # 供货价：使用 B2 的文件
+    (_changed("A1", 0, "新名称"), {"1号-测试.xlsx", "3号-测试.xlsx"}),  # 名称：使用 A1 的文件
+    (_changed("A1", 3, 12.0), {"3号-测试.xlsx"}),                       # 含税价：只取使用含税价的文件
+    (_changed("B2", 3, 7.0), set()),                                    # 使用 B2 的文件不用含税价
+    (dict(MAPPING, C3=["货品C3", "成品", 1.0, 1.0]), {"3号-测试.xlsx"}),  # 新增：原先未匹配的文件
+    ({"A1": MAPPING["A1"]}, {"2号-测试.xlsx"}),                          # 删除：使用该编码的文件
+    (_changed("B2", 1, "赠品"), set(ORDERS)),                            # 赠品类型变化：全部文件
+], ids=["price", "name", "tax-price", "tax-price-unused", "added", "removed", "gift"])
+def test_affected_files_follow_changed_codes(indexed_folder, mapping, expected):
+    affected, unaffected = _plan(indexed_folder, mapping)
+    assert set(affected) == expected
+    assert set(unaffected) == set(ORDERS) - expected
+
+
+def test_tax_distributor_change_affects_its_files(indexed_folder):
+    affected, _ = _plan(indexed_folder, MAPPING, tax_distributors=["3号", "1号"])
+    assert set(affected) == {"1号-测试.xlsx"}
+
+
+def test_reprice_promotes_unaffected_files(indexed_folder):
+    """重算后所有文件都按新编码表记录，再次比较时没有需要重算的文件"""
+    _write_mapping(indexed_folder, _changed("B2", 2, 5.5))
+    assert sku_index.reprice(indexed_folder)
+    _, affected, _, _ = sku_index.plan_reprice(indexed_folder)
+    assert affected == {}
@@ -0,0 +1,55 @@
+# tests/test_stall_monitor.py
+"""界面卡顿监控：预算检查（含正在进行的卡顿）、每次运行清零；统计部分不依赖 Qt"""
+import os
+import sys
+import time
+import subprocess
+
+from function.run_report import RunReport, register_section, unregister_section
+from function.stall_monitor import StallMonitor
+
+
+def _stall(monitor, ms):
+    """模拟主线程卡住 ms 毫秒后的一次心跳"""
+    monitor._last_beat = time.perf_counter() - monitor.interval - ms / 1000
+    monitor._beat()
+
+
+def test_budget_check():
+    monitor = StallMonitor(threshold_ms=100, interval_ms=50)
+    _stall(monitor, 20)
+    assert monitor.stall_count == 0 and monitor.within_budget(50)
+
+    _stall(monitor, 300)
+    assert monitor.stall_count == 1
+    assert 300 <= monitor.max_stall_ms() < 400
+    assert monitor.within_budget(500)
+    assert not monitor.within_budget(200)
+
+
+def test_budget_check_includes_ongoing_stall():
+    monitor = StallMonitor(threshold_ms=100, interval_ms=50)
+    monitor._last_beat = time.perf_counter() - 1
+    assert monitor.current_lag_ms() >= 900
+    assert not monitor.within_budget(500)
+    assert monitor.summary()["ongoing"]["duration_ms"] >= 900
+
+
+def test_stats_reset_when_a_run_starts(tmp_path):
+    monitor = StallMonitor(threshold_ms=100, interval_ms=50)
+    _stall(monitor, 300)
+    register_section("gui_stalls", monitor.summary, reset=monitor.reset)
+    try:
+        report = RunReport("对账", str(tmp_path))
+        assert monitor.stall_count == 0 and monitor.stalls == []
+        _stall(monitor, 200)
+        report.save()
+        assert report.data["gui_stalls"]["stall_count"] == 1
+    finally:
+        unregister_section("gui_stalls")
+
+
+def test_import_does_not_load_qt():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, function.stall_monitor; sys.exit('PySide6' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=root, timeout=60).returncode == 0
@@ -0,0 +1,76 @@
+# tests/test_summary.py
+"""汇总表增量更新：只替换有变化的源文件对应的行，结果与完整重新生成一致"""
+import glob
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+from function import difftest, reconciliation, summary
+
+
+@pytest.fixture
+def summary_folder(data_folder, monkeypatch):
+    """对账完成后的数据文件夹；汇总表写入 数据文件夹\\汇总表"""
+    settings = dict(reconciliation.DEFAULT_SETTINGS, sku_index=False, sku_search_index=False,
+                    analytics_top_n=0, export_formats=[])
+    monkeypatch.setattr(reconciliation, "load_settings", lambda: settings)
+    monkeypatch.setattr(reconciliation, "DATA_FOLDER", data_folder)
+    assert reconciliation.process_all_files(data_folder=data_folder)
+    return data_folder
+
+
+def _summary_sheet(data_folder):
+    """汇总表的全部单元格值与合并区域"""
+    path, = glob.glob(os.path.join(data_folder, "汇总表", "*售后汇总.xlsx"))
+    ws = load_workbook(path).active
+    return list(ws.iter_rows(values_only=True)), sorted(str(merged) for merged in ws.merged_cells.ranges)
+
+
+def _index(data_folder):
+    path, = glob.glob(summary.summary_index_path(data_folder, "*"))
+    return summary.load_summary_index(data_folder, os.path.basename(path)[len("summary-"):-len(".json")])
+
+
+def _reprocess(data_folder, file_name, codes):
+    difftest.write_orders(codes, os.path.join(data_folder, file_name))
+    assert reconciliation.process_all_files(data_folder=data_folder, only_files=[file_name])
+
+
+@pytest.mark.parametrize("initial, changed", [
+    (["A1", "B2*2", "A1"], ["A1"]),
+    (["A1"], ["A1", "B2*2", "B2"]),
+], ids=["shrink", "grow"])
+def test_incremental_matches_full_regeneration(summary_folder, initial, changed):
+    """2 号的结果行变少 / 变多后增量更新：其后的块与合计行随之平移，与完整重新生成逐格一致"""
+    _reprocess(summary_folder, "2号-测试.xlsx", initial)
+    summary.run_summary(output_callback=lambda msg: None, full=True)
+    before = _index(summary_folder)
+
+    _reprocess(summary_folder, "2号-测试.xlsx", changed)
+
+    messages = []
+    summary.run_summary(output_callback=messages.append)
+    assert any("增量更新 1 个源文件" in msg for msg in messages)
+    incremental, index = _summary_sheet(summary_folder), _index(summary_folder)
+
+    summary.run_summary(output_callback=lambda msg: None, full=True)
+    assert _summary_sheet(summary_folder) == incremental
+    assert _index(summary_folder) == index
+
+    # 只有 2 号及其后的块行号变化，1 号不变
+    assert index["blocks"][0] == before["blocks"][0]
+    assert index["blocks"][1]["source"] != before["blocks"][1]["source"]
+    assert index["blocks"][2]["start"] == index["blocks"][1]["end"] + 1 != before["blocks"][2]["start"]
+    assert index["total_row"] == index["blocks"][2]["end"] + 1
+
+
+def test_unchanged_sources_leave_summary_untouched(summary_folder):
+    summary.run_summary(output_callback=lambda msg: None, full=True)
+    path, = glob.glob(os.path.join(summary_folder, "汇总表", "*售后汇总.xlsx"))
+    mtime = os.stat(path).st_mtime_ns
+
+    messages = []
+    summary.run_summary(output_callback=messages.append)
+    assert any("无需更新" in msg for msg in messages)
+    assert os.stat(path).st_mtime_ns == mtime
@@ -0,0 +1,75 @@
+# tests/test_worker.py
+"""文件隔离的内存限制：主进程按常驻内存结束工作进程；POSIX 上地址空间上限由内核强制执行"""
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+
+from function import worker
+
+ALLOCATE = "x = bytearray({mb} * 1024 * 1024); import time; time.sleep(30)"
+
+
+class _Proc:
+    """把 subprocess.Popen 包装成 FileWorker 使用的 multiprocessing.Process 接口"""
+
+    def __init__(self, popen):
+        self.popen = popen
+        self.pid = popen.pid
+
+    def is_alive(self):
+        return self.popen.poll() is None
+
+    def kill(self):
+        self.popen.kill()
+
+    def join(self, timeout=None):
+        self.popen.wait(timeout)
+
+    @property
+    def exitcode(self):
+        return self.popen.poll()
+
+
+def test_parent_kills_worker_over_the_limit():
+    file_worker = worker.FileWorker(None, {"file_memory_limit_mb": 64}, log=lambda line: None)
+    file_worker.proc = _Proc(subprocess.Popen([sys.executable, "-c", ALLOCATE.format(mb=200)]))
+    try:
+        deadline = time.monotonic() + 20
+        while not file_worker._check_memory():
+            assert time.monotonic() < deadline, "工作进程未被结束"
+            time.sleep(0.1)
+        assert not file_worker.proc.is_alive()
+        assert "内存超出上限" in file_worker._exit_reason()
+        assert file_worker.peak_rss_mb > 64
+    finally:
+        if file_worker.proc.is_alive():
+            file_worker.proc.kill()
+
+
+def test_parent_leaves_worker_under_the_limit():
+    file_worker = worker.FileWorker(None, {"file_memory_limit_mb": 4096}, log=lambda line: None)
+    file_worker.proc = _Proc(subprocess.Popen([sys.executable, "-c", ALLOCATE.format(mb=1)]))
+    try:
+        assert not file_worker._check_memory()
+        assert file_worker.proc.is_alive()
+    finally:
+        file_worker.proc.kill()
+        file_worker.proc.join()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="RLIMIT_AS 只在 POSIX 上可用")
+def test_address_space_limit_makes_allocation_fail():
+    code = (
+        "from function import worker\n"
+        "worker._limit_address_space(512 * worker.MB)\n"
+        "try:\n"
+        "    bytearray(1024 * worker.MB)\n"
+        "except MemoryError:\n"
+        "    raise SystemExit(worker.MEMORY_EXIT_CODE)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, timeout=60)
+    assert result.returncode == worker.MEMORY_EXIT_CODE
@@ -2,9 +2,10 @@ from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QPushButton,
     QMessageBox, QGraphicsBlurEffect
 )
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QFont, QPainter, QPainterPath, QPen, QColor
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QFont, QPainter, QPen, QColor
 from widgets_draggable import DraggableMixin
+from window_frosted_glass import rounded_frame_path
 
 
 """
@@ -33,6 +34,10 @@ class FrostedMessageBox(QDialog, DraggableMixin):
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setFixedSize(300, 150)
 
+        # 圆角边框路径与画笔缓存，只在尺寸变化时重建
+        self._border_pen = QPen(self.BORDER_COLOR, 2)
+        self._frame_path = None
+
         self._init_blur_background()            # 初始化模糊背景层
         self._init_ui(title, text, icon)        # 初始化 UI 组件
         self.setCursorStyle()                   # 设置按钮鼠标样式
@@ -101,17 +106,18 @@ class FrostedMessageBox(QDialog, DraggableMixin):
         """窗口尺寸变化时同步模糊背景尺寸"""
         super().resizeEvent(event)
         self._blur_background.setGeometry(self.rect())
+        self._frame_path = None
 
     def paintEvent(self, event):
         """绘制圆角边框"""
+        if self._frame_path is None:
+            self._frame_path = rounded_frame_path(QRectF(self.rect()), 0, self.BORDER_RADIUS)
+
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
-        path = QPainterPath()
-        path.addRoundedRect(self.rect(), self.BORDER_RADIUS, self.BORDER_RADIUS)
-
-        painter.setPen(QPen(self.BORDER_COLOR, 2))
+        painter.setPen(self._border_pen)
         painter.setBrush(Qt.NoBrush)
-        painter.drawPath(path)
+        painter.drawPath(self._frame_path)
 
     # 拖拽支持
     # 覆盖了以下鼠标事件并显式调用DraggableMixin的方法，使窗口可以被鼠标左键拖动：
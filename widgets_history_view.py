@@ -0,0 +1,185 @@
+# widgets_history_view.py
+"""
+运行趋势窗口 - 查看最近若干次对账 / 汇总的耗时与内存趋势
+
+    ✅ 特性
+        • 数据来自运行历史（function/history），每次运行结束自动追加
+        • 折线图：总耗时（实线）与峰值内存（虚线），各自按最大值缩放；灰色横线为耗时中位数
+        • 下方列出最近一次运行相对中位数的性能回归
+"""
+import statistics
+
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QPen, QColor, QFont
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox
+from window_frosted_glass import FrostedGlassWidget
+from widgets_draggable import DraggableMixin
+
+ELAPSED_COLOR = QColor("#4682B4")
+MEMORY_COLOR = QColor("#B8860B")
+MEDIAN_COLOR = QColor(47, 79, 79, 90)
+
+
+class TrendChart(QWidget):
+    """耗时 / 内存折线图"""
+
+    MARGIN = 24
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.runs = []
+        self.setMinimumHeight(150)
+
+    def set_runs(self, runs):
+        self.runs = runs
+        self.update()
+
+    def _points(self, values, rect):
+        peak = max(values) or 1
+        step = rect.width() / max(len(values) - 1, 1)
+        return [
+            QPointF(rect.left() + i * step, rect.bottom() - rect.height() * value / peak)
+            for i, value in enumerate(values)
+        ]
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self.rect().adjusted(self.MARGIN, self.MARGIN // 2, -self.MARGIN // 2, -self.MARGIN)
+
+        painter.setPen(QPen(QColor("#4682B4"), 1))
+        painter.setBrush(QColor(255, 255, 255, 120))
+        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 10, 10)
+
+        font = QFont("Microsoft YaHei")
+        font.setPixelSize(10)
+        painter.setFont(font)
+
+        if len(self.runs) < 2:
+            painter.setPen(QColor("#2F4F4F"))
+            painter.drawText(self.rect(), Qt.AlignCenter, "运行次数不足，暂无趋势")
+            return
+
+        elapsed = [run.get("elapsed_seconds") or 0 for run in self.runs]
+        memory = [run.get("peak_rss_mb") or 0 for run in self.runs]
+
+        # 耗时中位数
+        peak = max(elapsed) or 1
+        median_y = rect.bottom() - rect.height() * statistics.median(elapsed) / peak
+        painter.setPen(QPen(MEDIAN_COLOR, 1, Qt.DashLine))
+        painter.drawLine(QPointF(rect.left(), median_y), QPointF(rect.right(), median_y))
+
+        for values, color, style in ((memory, MEMORY_COLOR, Qt.DashLine), (elapsed, ELAPSED_COLOR, Qt.SolidLine)):
+            if not any(values):
+                continue
+            painter.setPen(QPen(color, 2, style))
+            painter.drawPolyline(self._points(values, rect))
+
+        # 坐标标注
+        painter.setPen(QColor("#2F4F4F"))
+        painter.drawText(4, rect.top() + 8, f"{max(elapsed):.1f}s")
+        painter.setPen(MEMORY_COLOR)
+        painter.drawText(rect.right() - 60, rect.top() + 8, f"{max(memory):.0f} MB")
+        painter.setPen(QColor("#2F4F4F"))
+        first, last = self.runs[0].get("started_at") or "", self.runs[-1].get("started_at") or ""
+        painter.drawText(rect.left(), self.height() - 8, first[5:16].replace("T", " "))
+        painter.drawText(rect.right() - 70, self.height() - 8, last[5:16].replace("T", " "))
+
+
+class HistoryView(DraggableMixin, FrostedGlassWidget):
+    """运行趋势窗口"""
+
+    WINDOW_SIZE = (420, 320)
+    MAX_RUNS = 30
+
+    def __init__(self, parent=None):
+        FrostedGlassWidget.__init__(self, parent)
+        DraggableMixin.__init__(self)
+
+        self.setWindowTitle("运行趋势")
+        self.setFixedSize(*self.WINDOW_SIZE)
+        self.setWindowFlags(self.windowFlags() | Qt.Window | Qt.WindowStaysOnTopHint)
+        self._init_ui()
+
+    def _init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        # ===== 顶部栏
+        top_bar = QHBoxLayout()
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItems(["对账", "汇总"])
+        self.kind_combo.currentIndexChanged.connect(lambda _: self.load())
+        top_bar.addWidget(self.kind_combo)
+
+        title = QLabel("运行趋势")
+        font = title.font()
+        font.setFamily("Microsoft YaHei")
+        font.setPointSize(12)
+        font.setBold(True)
+        title.setFont(font)
+        title.setStyleSheet("color: #2F4F4F;")
+        top_bar.addStretch(1)
+        top_bar.addWidget(title, alignment=Qt.AlignCenter)
+        top_bar.addStretch(1)
+
+        close_btn = QPushButton()
+        close_btn.setFixedSize(12, 12)
+        close_btn.setStyleSheet("""
+            QPushButton { background-color: #FF5F56; border-radius: 6px; }
+            QPushButton:hover { background-color: #FF3B30; }
+        """)
+        close_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        close_btn.clicked.connect(self.close)
+        top_bar.addWidget(close_btn)
+        layout.addLayout(top_bar)
+
+        # ===== 折线图与回归信息
+        self.chart = TrendChart()
+        layout.addWidget(self.chart, 1)
+
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+        self.status_label.setStyleSheet('color: #2F4F4F; font-family: "Microsoft YaHei"; font-size: 10px;')
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+    def load(self, runs=None):
+        """
+        装载运行历史；不传时读取数据文件夹中的历史
+
+        Returns:
+            装载的运行次数
+        """
+        from function.history import find_regressions
+
+        if runs is None:
+            from function.reconciliation import DATA_FOLDER
+            from function.history import load_history
+            runs = load_history(DATA_FOLDER, self.kind_combo.currentText())
+
+        self.chart.set_runs(runs[-self.MAX_RUNS:])
+
+        if not runs:
+            self.status_label.setText("暂无运行历史")
+        else:
+            latest = runs[-1]
+            lines = [f"最近一次：{latest.get('files', 0)} 个文件，{latest.get('elapsed_seconds') or 0:.1f} 秒，"
+                     f"峰值内存 {latest.get('peak_rss_mb') or 0:.0f} MB"]
+            regressions = find_regressions(runs)
+            if regressions:
+                lines += [f"⚠ {item['label']} {item['value']} {item['unit']}（中位数 {item['median']}，"
+                          f"{item['ratio']} 倍）" for item in regressions]
+            else:
+                lines.append("✅ 未发现性能回归")
+            self.status_label.setText("\n".join(lines))
+        return len(runs)
+
+    def center_on_screen(self):
+        """居中显示在主屏幕"""
+        screen = QApplication.primaryScreen()
+        if screen:
+            geo = screen.availableGeometry()
+            self.move(geo.center().x() - self.width() // 2, geo.center().y() - self.height() // 2)
@@ -0,0 +1,270 @@
+# widgets_log_view.py
+"""
+日志面板 - 基于模型/视图的输出显示框
+
+    ✅ 特性
+        • 日志行数有上限，超过上限时丢弃最旧的行，内存有上限
+        • 新行先进入缓冲区，由定时器批量写入模型，避免逐行重排
+        • 按级别（错误/警告/成功/信息）、文件名或关键字筛选，不重建控件
+        • QListView + 统一行高，十万行级别仍可流畅滚动
+
+    ✅ 兼容 QTextEdit 的常用接口：append / clear / setText / toPlainText
+"""
+from PySide6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QTimer
+)
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QListView, QComboBox, QLineEdit, QAbstractItemView
+)
+
+LEVEL_ROLE = Qt.UserRole + 1
+FILE_ROLE = Qt.UserRole + 2
+
+# 日志级别颜色
+LEVEL_COLORS = {
+    "error": QColor("#B22222"),
+    "warning": QColor("#B8860B"),
+    "success": QColor("#2E8B57"),
+    "info": QColor("#2F4F4F"),
+}
+
+# 级别筛选下拉框选项
+LEVEL_FILTERS = [
+    ("全部", None),
+    ("错误", "error"),
+    ("警告", "warning"),
+    ("成功", "success"),
+    ("信息", "info"),
+]
+
+# 对账输出中标记"开始处理某文件"的前缀，用于给后续行打上文件名
+FILE_PREFIX = "正在处理: "
+
+
+def detect_level(text):
+    """根据输出中的标记符号判断日志级别"""
+    if "❌" in text or text.startswith("Traceback"):
+        return "error"
+    if "⚠" in text:
+        return "warning"
+    if "✅" in text:
+        return "success"
+    return "info"
+
+
+class LogModel(QAbstractListModel):
+    """定长日志模型：每行为 (文本, 级别, 文件名)"""
+
+    def __init__(self, max_lines=100000, parent=None):
+        super().__init__(parent)
+        self.max_lines = max(int(max_lines), 1)
+        self._lines = []
+        self._current_file = ""
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        text, level, file_name = self._lines[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == Qt.ForegroundRole:
+            return LEVEL_COLORS[level]
+        if role == LEVEL_ROLE:
+            return level
+        if role == FILE_ROLE:
+            return file_name
+        return None
+
+    def append_lines(self, lines):
+        """批量追加日志行，超出上限时先移除最旧的行"""
+        entries = []
+        for text in lines:
+            if text.startswith(FILE_PREFIX):
+                self._current_file = text[len(FILE_PREFIX):].strip()
+            entries.append((text, detect_level(text), self._current_file))
+
+        if len(entries) > self.max_lines:
+            entries = entries[-self.max_lines:]
+        if not entries:
+            return
+
+        overflow = len(self._lines) + len(entries) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self._lines[:overflow]
+            self.endRemoveRows()
+
+        first = len(self._lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self._lines.extend(entries)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._lines.clear()
+        self._current_file = ""
+        self.endResetModel()
+
+    def entry(self, row):
+        """直接读取 (文本, 级别, 文件名)，供筛选时绕过 QModelIndex"""
+        return self._lines[row]
+
+    def contains(self, keyword):
+        return any(keyword in text for text, _, _ in self._lines)
+
+    def plain_text(self):
+        return "\n".join(text for text, _, _ in self._lines)
+
+
+class LogFilterProxy(QSortFilterProxyModel):
+    """按级别与关键字（匹配文本或文件名）筛选"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._level = None
+        self._keyword = ""
+
+    def set_level(self, level):
+        self._level = level
+        self.invalidateFilter()
+
+    def set_keyword(self, keyword):
+        self._keyword = keyword.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._level is None and not self._keyword:
+            return True
+        text, level, file_name = self.sourceModel().entry(source_row)
+        if self._level is not None and level != self._level:
+            return False
+        if self._keyword:
+            return self._keyword in text.lower() or self._keyword in file_name.lower()
+        return True
+
+
+class LogView(QWidget):
+    """带筛选栏、批量刷新的日志面板"""
+
+    FLUSH_INTERVAL_MS = 100
+
+    def __init__(self, max_lines=100000, parent=None):
+        super().__init__(parent)
+        self._pending = []
+
+        self.model = LogModel(max_lines, self)
+        self.proxy = LogFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
+
+        self._init_ui()
+
+    def _init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+
+        # ===== 筛选栏
+        filter_bar = QHBoxLayout()
+        filter_bar.setSpacing(4)
+
+        self.level_combo = QComboBox()
+        for label, level in LEVEL_FILTERS:
+            self.level_combo.addItem(label, level)
+        self.level_combo.currentIndexChanged.connect(
+            lambda _: self.proxy.set_level(self.level_combo.currentData())
+        )
+
+        self.keyword_edit = QLineEdit()
+        self.keyword_edit.setPlaceholderText("筛选：关键字 / 文件名")
+        self.keyword_edit.setClearButtonEnabled(True)
+        self.keyword_edit.textChanged.connect(self.proxy.set_keyword)
+
+        for widget in (self.level_combo, self.keyword_edit):
+            widget.setStyleSheet("""
+                background: rgba(255, 255, 255, 120);
+                border: 1px solid #4682B4;
+                border-radius: 6px;
+                color: #2F4F4F;
+                font-family: "Microsoft YaHei";
+                font-size: 10px;
+            """)
+
+        filter_bar.addWidget(self.level_combo)
+        filter_bar.addWidget(self.keyword_edit, 1)
+        layout.addLayout(filter_bar)
+
+        # ===== 日志列表
+        self.list_view = QListView()
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.list_view.setStyleSheet("""
+            QListView {
+                background: rgba(255, 255, 255, 120);
+                border: 1px solid #4682B4;
+                border-radius: 10px;
+                padding: 8px;
+                color: #2F4F4F;
+                font-family: "Microsoft YaHei";
+                font-size: 10px;
+            }
+            QListView:focus {
+                border: 1px solid #1E90FF;
+            }
+        """)
+        layout.addWidget(self.list_view, 1)
+
+    # ===============================
+    # 兼容 QTextEdit 的接口
+    # ===============================
+    def append(self, text):
+        """追加文本（可含多行），由定时器批量刷新到界面"""
+        self._pending.extend(str(text).split("\n"))
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def setText(self, text):
+        self.clear()
+        self.append(text)
+        self.flush()
+
+    def clear(self):
+        self._pending.clear()
+        self.model.clear()
+
+    def toPlainText(self):
+        self.flush()
+        return self.model.plain_text()
+
+    def contains(self, keyword):
+        """日志中是否包含关键字（不拼接全文）"""
+        self.flush()
+        return self.model.contains(keyword)
+
+    # ===============================
+    # 批量刷新
+    # ===============================
+    def flush(self):
+        """把缓冲区中的行写入模型；原本停在底部时保持滚动到底部"""
+        self._flush_timer.stop()
+        if not self._pending:
+            return
+
+        scrollbar = self.list_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+
+        lines, self._pending = self._pending, []
+        self.model.append_lines(lines)
+
+        if at_bottom:
+            self.list_view.scrollToBottom()
@@ -3,9 +3,10 @@
 主窗口模块 - 实现带毛玻璃效果的现代化主界面
 """
 from window_frosted_glass import FrostedGlassWidget
-from PySide6.QtWidgets import QApplication, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTextEdit
+from PySide6.QtWidgets import QApplication, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit
 from PySide6.QtCore import Qt
 from widgets_draggable import DraggableMixin
+from widgets_log_view import LogView
 from config_manager import get_config_value, set_config_value
 
 
@@ -15,7 +16,10 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
     """
 
     # 主窗体尺寸常量
-    WINDOW_SIZE = (260, 350)
+    WINDOW_SIZE = (260, 470)
+
+    # 日志面板最多保留的行数
+    LOG_MAX_LINES = 100000
 
     # 按钮样式表
     BUTTON_STYLE = {
@@ -61,6 +65,11 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
         # 存储按钮引用
         self.btn_function1 = None
         self.btn_function2 = None
+        self.btn_results = None
+        self.search_edit = None
+        self.result_browser = None
+        self.history_view = None
+        self.stall_monitor = None
         self.reconciliation_thread = None
         self._is_closing = False  # 添加关闭标志
 
@@ -68,6 +77,12 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
         self._init_ui()
         self._load_window_position()
 
+        # 界面卡顿监控（统计写入运行报告）
+        from function.stall_monitor import StallMonitor
+        self.stall_monitor = StallMonitor.from_config(self)
+        if self.stall_monitor is not None:
+            self.stall_monitor.start()
+
     def _load_window_position(self):
         """加载窗口位置"""
         try:
@@ -108,6 +123,8 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
         main_layout.addLayout(self._create_top_bar())  # 顶部控制栏
         main_layout.addWidget(self._create_text_display())  # 文本显示框
         main_layout.addLayout(self._create_button_group())  # 按钮组（在文本框下面）
+        main_layout.addLayout(self._create_tool_group())  # 工具按钮组
+        main_layout.addWidget(self._create_search_box())  # 编码 / 名称查询
         main_layout.addStretch(1)
 
         self.setLayout(main_layout)
@@ -136,24 +153,10 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
         return top_bar
 
     def _create_text_display(self):
-        """创建文本显示框"""
-        self.text_display = QTextEdit()
-        self.text_display.setFixedHeight(200)
-        self.text_display.setStyleSheet("""
-            QTextEdit {
-                background: rgba(255, 255, 255, 120);
-                border: 1px solid #4682B4;
-                border-radius: 10px;
-                padding: 8px;
-                color: #2F4F4F;
-                font-family: "Microsoft YaHei";
-                font-size: 10px;
-            }
-            QTextEdit:focus {
-                border: 1px solid #1E90FF;
-            }
-        """)
-        self.text_display.setReadOnly(True)
+        """创建文本显示框（带筛选栏的日志面板）"""
+        max_lines = get_config_value("settings.log_max_lines", self.LOG_MAX_LINES)
+        self.text_display = LogView(max_lines)
+        self.text_display.setFixedHeight(230)
 
         # 设置初始提示文本
         initial_text = """分销商对账工具 v2.0
@@ -181,6 +184,45 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
 
         return button_layout
 
+    def _create_tool_group(self):
+        """创建工具按钮组（结果浏览等）"""
+        tool_layout = QHBoxLayout()
+        tool_layout.setSpacing(10)
+
+        self.btn_results = self._create_action_button("结果浏览", self.on_results_clicked)
+        tool_layout.addWidget(self.btn_results)
+
+        self.btn_history = self._create_action_button("运行趋势", self.on_history_clicked)
+        tool_layout.addWidget(self.btn_history)
+
+        return tool_layout
+
+    def _create_search_box(self):
+        """创建编码 / 名称查询框（回车查询，结果输出到日志面板）"""
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("查询编码 / 名称的退货分销商（回车）")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setStyleSheet("""
+            QLineEdit {
+                background: rgba(255, 255, 255, 150);
+                border: 1px solid #4682B4;
+                border-radius: 10px;
+                padding: 4px 8px;
+                color: #2F4F4F;
+                font-family: "Microsoft YaHei";
+                font-size: 10px;
+            }
+        """)
+        self.search_edit.returnPressed.connect(self.on_search)
+
+        # 后台预先读取查询索引
+        try:
+            from function.sku_search import preload
+            preload()
+        except Exception as e:
+            print(f"查询索引预加载失败: {e}")
+        return self.search_edit
+
     def _create_control_button(self, btn_type, callback):
         """创建控制按钮"""
         btn = QPushButton()
@@ -257,13 +299,9 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
             self.btn_function2.setEnabled(True)
 
     def update_output_display(self, message):
-        """更新输出显示"""
+        """更新输出显示（日志面板批量刷新，并自动保持在底部）"""
         if self.text_display:
             self.text_display.append(message)
-            # 滚动到底部
-            scrollbar = self.text_display.verticalScrollBar()
-            if scrollbar:
-                scrollbar.setValue(scrollbar.maximum())
 
     # 在 widgets_main_window.py 的 on_reconciliation_finished 方法中添加
     def on_reconciliation_finished(self, success, message):
@@ -273,7 +311,7 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
             self.text_display.append(message)
 
             # 如果有错误，添加处理建议
-            if not success and "多个'商家编码'字段" in self.text_display.toPlainText():
+            if not success and self.text_display.contains("多个'商家编码'字段"):
                 self.text_display.append("\n💡 处理建议：")
                 self.text_display.append("1. 请打开Excel文件检查列名")
                 self.text_display.append("2. 确保只有一个名为'商家编码'的列")
@@ -306,6 +344,64 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
         except Exception as e:
             self.text_display.append(f"❌ 执行失败：{e}")
 
+    def on_results_clicked(self):
+        """打开结果浏览窗口（数据来自对账结果缓存）"""
+        try:
+            from widgets_result_browser import ResultBrowser
+
+            if self.result_browser is None:
+                self.result_browser = ResultBrowser()
+                self.result_browser.center_on_screen()
+
+            rows = self.result_browser.load()
+            if rows == 0:
+                self.text_display.append("⚠ 暂无对账结果，请先执行对账")
+
+            self.result_browser.show()
+            self.result_browser.raise_()
+            self.result_browser.activateWindow()
+
+        except Exception as e:
+            self.text_display.append(f"❌ 打开结果浏览失败：{e}")
+
+    def on_search(self):
+        """按编码 / 名称前缀查询本月退货的分销商"""
+        text = self.search_edit.text().strip()
+        if not text:
+            return
+        try:
+            import time
+            from function.sku_search import search, format_result
+
+            started = time.perf_counter()
+            found = search(text)
+            elapsed = (time.perf_counter() - started) * 1000
+            for line in format_result(text, found):
+                self.text_display.append(line)
+            self.text_display.append(f"  （查询耗时 {elapsed:.0f} ms）")
+
+        except Exception as e:
+            self.text_display.append(f"❌ 查询失败：{e}")
+
+    def on_history_clicked(self):
+        """打开运行趋势窗口（数据来自运行历史）"""
+        try:
+            from widgets_history_view import HistoryView
+
+            if self.history_view is None:
+                self.history_view = HistoryView()
+                self.history_view.center_on_screen()
+
+            if self.history_view.load() == 0:
+                self.text_display.append("⚠ 暂无运行历史，请先执行对账或汇总")
+
+            self.history_view.show()
+            self.history_view.raise_()
+            self.history_view.activateWindow()
+
+        except Exception as e:
+            self.text_display.append(f"❌ 打开运行趋势失败：{e}")
+
     def closeEvent(self, event):
         """窗口关闭事件 - 保存当前位置"""
         try:
@@ -321,6 +417,15 @@ class ModernWindow(DraggableMixin, FrostedGlassWidget):
                     self.reconciliation_thread.terminate()
                     self.reconciliation_thread.wait()
 
+            # 关闭结果浏览窗口
+            if self.result_browser is not None:
+                self.result_browser.close()
+            if self.history_view is not None:
+                self.history_view.close()
+
+            if self.stall_monitor is not None:
+                self.stall_monitor.stop()
+
             # 保存窗口位置
             pos = [self.pos().x(), self.pos().y()]
             set_config_value("window_position", pos)
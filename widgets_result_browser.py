@@ -0,0 +1,337 @@
+# widgets_result_browser.py
+"""
+结果浏览窗口 - 在界面内查看各分销商的对账结果
+
+    ✅ 特性
+        • 数据来自对账结果缓存（function/result_store），不打开任何工作簿
+        • 表格模型把结果压缩为若干连续数组（分销商/名称/编码为字符串编号，价格/数量/金额为数值数组）
+        • 按需分批加载行（canFetchMore / fetchMore），几十万行也能立即打开
+        • 点击表头排序；按分销商下拉框或关键字（名称 / 编码）筛选
+"""
+import math
+from array import array
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtWidgets import (
+    QApplication, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QComboBox,
+    QTableView, QAbstractItemView, QHeaderView
+)
+from window_frosted_glass import FrostedGlassWidget
+from widgets_draggable import DraggableMixin
+
+
+class ResultTableModel(QAbstractTableModel):
+    """基于连续数组的只读结果表模型"""
+
+    COLUMNS = ["分销商", "名称", "编码", "供货价", "数量", "金额"]
+    FETCH_BATCH = 2000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._distributors = []     # 去重后的字符串表
+        self._names = []
+        self._codes = []
+        self._dist_ids = array("i")
+        self._name_ids = array("i")
+        self._code_ids = array("i")
+        self._prices = array("d")   # 缺失供货价记为 NaN
+        self._qtys = array("q")
+        self._amounts = array("d")
+
+        self._order = array("i")    # 筛选、排序后的行号
+        self._loaded = 0            # 已向视图暴露的行数
+        self._sort_column = None
+        self._sort_desc = False
+        self._filter_distributor = None
+        self._filter_keyword = ""
+
+    # ===============================
+    # 数据装载
+    # ===============================
+    def load_results(self, results):
+        """从结果缓存（load_results 的返回值）构建列数组"""
+        from function.result_store import sheet_values
+
+        string_ids = ({}, {}, {})
+        tables = ([], [], [])
+
+        def intern(kind, value):
+            ids = string_ids[kind]
+            if value not in ids:
+                ids[value] = len(tables[kind])
+                tables[kind].append(value)
+            return ids[value]
+
+        dist_ids, name_ids, code_ids = array("i"), array("i"), array("i")
+        prices, qtys, amounts = array("d"), array("q"), array("d")
+
+        for result in results:
+            dist_id = intern(0, result["distributor"])
+            for row in result["rows"]:
+                price, qty, _, amount = sheet_values(row)
+                dist_ids.append(dist_id)
+                name_ids.append(intern(1, row["name"]))
+                code_ids.append(intern(2, ", ".join(row.get("codes", {}))))
+                prices.append(float(price) if isinstance(price, (int, float)) else math.nan)
+                qtys.append(int(qty))
+                amounts.append(float(amount) if amount is not None else math.nan)
+
+        self.beginResetModel()
+        self._distributors, self._names, self._codes = tables
+        self._dist_ids, self._name_ids, self._code_ids = dist_ids, name_ids, code_ids
+        self._prices, self._qtys, self._amounts = prices, qtys, amounts
+        self._rebuild_order()
+        self.endResetModel()
+
+    def distributors(self):
+        return list(self._distributors)
+
+    def total_rows(self):
+        return len(self._order)
+
+    # ===============================
+    # 筛选与排序
+    # ===============================
+    def set_filter(self, distributor=None, keyword=""):
+        self._filter_distributor = distributor
+        self._filter_keyword = keyword.strip().lower()
+        self.beginResetModel()
+        self._rebuild_order()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """按列排序；column 为 -1 时恢复原始顺序（按分销商编号）"""
+        self._sort_column = column if column >= 0 else None
+        self._sort_desc = order == Qt.DescendingOrder
+        self.beginResetModel()
+        if self._sort_column is None:
+            self._rebuild_order()
+        else:
+            self._apply_sort()
+            self._loaded = min(self.FETCH_BATCH, len(self._order))
+        self.endResetModel()
+
+    def _rebuild_order(self):
+        rows = range(len(self._dist_ids))
+
+        if self._filter_distributor is not None:
+            try:
+                dist_id = self._distributors.index(self._filter_distributor)
+            except ValueError:
+                dist_id = -1
+            dist_ids = self._dist_ids
+            rows = [r for r in rows if dist_ids[r] == dist_id]
+
+        if self._filter_keyword:
+            # 先在去重后的字符串表上匹配，再按编号筛选行
+            keyword = self._filter_keyword
+            names = {i for i, s in enumerate(self._names) if keyword in s.lower()}
+            codes = {i for i, s in enumerate(self._codes) if keyword in s.lower()}
+            name_ids, code_ids = self._name_ids, self._code_ids
+            rows = [r for r in rows if name_ids[r] in names or code_ids[r] in codes]
+
+        self._order = array("i", rows)
+        self._apply_sort()
+        self._loaded = min(self.FETCH_BATCH, len(self._order))
+
+    def _apply_sort(self):
+        column = self._sort_column
+        if column is None:
+            return
+
+        if column <= 2:
+            ids, table = ((self._dist_ids, self._distributors),
+                          (self._name_ids, self._names),
+                          (self._code_ids, self._codes))[column]
+            # 字符串列按去重表的排名比较，避免逐行比较字符串
+            rank = [0] * len(table)
+            for position, index in enumerate(sorted(range(len(table)), key=table.__getitem__)):
+                rank[index] = position
+            key = lambda r: rank[ids[r]]
+        else:
+            values = (self._prices, self._qtys, self._amounts)[column - 3]
+            key = lambda r: (math.isnan(values[r]) if column != 4 else False, values[r])
+
+        self._order = array("i", sorted(self._order, key=key, reverse=self._sort_desc))
+
+    # ===============================
+    # Qt 模型接口
+    # ===============================
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._order)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.FETCH_BATCH, len(self._order) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._order[index.row()]
+        column = index.column()
+
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignVCenter | (Qt.AlignLeft if column <= 2 else Qt.AlignRight))
+        if role != Qt.DisplayRole:
+            return None
+
+        if column == 0:
+            return self._distributors[self._dist_ids[row]]
+        if column == 1:
+            return self._names[self._name_ids[row]]
+        if column == 2:
+            return self._codes[self._code_ids[row]]
+        if column == 4:
+            return str(self._qtys[row])
+        value = self._prices[row] if column == 3 else self._amounts[row]
+        return "" if math.isnan(value) else f"{value:g}"
+
+
+class ResultBrowser(DraggableMixin, FrostedGlassWidget):
+    """结果浏览窗口"""
+
+    WINDOW_SIZE = (640, 440)
+
+    def __init__(self, parent=None):
+        FrostedGlassWidget.__init__(self, parent)
+        DraggableMixin.__init__(self)
+
+        self.setWindowTitle("对账结果浏览")
+        self.setFixedSize(*self.WINDOW_SIZE)
+        self.setWindowFlags(self.windowFlags() | Qt.Window | Qt.WindowStaysOnTopHint)
+
+        self.model = ResultTableModel(self)
+        self._init_ui()
+
+    def _init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        # ===== 顶部栏
+        top_bar = QHBoxLayout()
+        title = QLabel("对账结果浏览")
+        font = title.font()
+        font.setFamily("Microsoft YaHei")
+        font.setPointSize(12)
+        font.setBold(True)
+        title.setFont(font)
+        title.setStyleSheet("color: #2F4F4F;")
+        top_bar.addStretch(1)
+        top_bar.addWidget(title, alignment=Qt.AlignCenter)
+        top_bar.addStretch(1)
+
+        close_btn = QPushButton()
+        close_btn.setFixedSize(12, 12)
+        close_btn.setStyleSheet("""
+            QPushButton { background-color: #FF5F56; border-radius: 6px; }
+            QPushButton:hover { background-color: #FF3B30; }
+        """)
+        close_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        close_btn.clicked.connect(self.close)
+        top_bar.addWidget(close_btn)
+        layout.addLayout(top_bar)
+
+        # ===== 筛选栏
+        filter_bar = QHBoxLayout()
+        self.distributor_combo = QComboBox()
+        self.distributor_combo.setMinimumWidth(160)
+        self.distributor_combo.currentIndexChanged.connect(self._apply_filter)
+
+        self.keyword_edit = QLineEdit()
+        self.keyword_edit.setPlaceholderText("筛选：名称 / 编码")
+        self.keyword_edit.setClearButtonEnabled(True)
+        self.keyword_edit.textChanged.connect(self._apply_filter)
+
+        self.count_label = QLabel()
+        self.count_label.setStyleSheet("color: #2F4F4F;")
+
+        filter_bar.addWidget(self.distributor_combo)
+        filter_bar.addWidget(self.keyword_edit, 1)
+        filter_bar.addWidget(self.count_label)
+        layout.addLayout(filter_bar)
+
+        # ===== 表格
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setStyleSheet("""
+            QTableView {
+                background: rgba(255, 255, 255, 150);
+                border: 1px solid #4682B4;
+                border-radius: 10px;
+                color: #2F4F4F;
+                font-family: "Microsoft YaHei";
+                font-size: 10px;
+            }
+        """)
+        for column, width in enumerate((150, 150, 110, 60, 50)):
+            self.table.setColumnWidth(column, width)
+        layout.addWidget(self.table, 1)
+
+        self.setLayout(layout)
+
+    def load(self, results=None):
+        """
+        装载结果；不传时读取对账结果缓存
+
+        Returns:
+            装载的行数
+        """
+        if results is None:
+            from function.reconciliation import DATA_FOLDER
+            from function.result_store import load_results
+            from function.summary import distributor_sort_key
+            results = sorted(load_results(DATA_FOLDER), key=lambda r: distributor_sort_key(r["file"]))
+
+        self.model.load_results(results)
+
+        self.distributor_combo.blockSignals(True)
+        self.distributor_combo.clear()
+        self.distributor_combo.addItem("全部分销商", None)
+        for distributor in self.model.distributors():
+            self.distributor_combo.addItem(distributor, distributor)
+        self.distributor_combo.blockSignals(False)
+
+        self._update_count()
+        return self.model.total_rows()
+
+    def _apply_filter(self, *_):
+        self.model.set_filter(self.distributor_combo.currentData(), self.keyword_edit.text())
+        self._update_count()
+
+    def _update_count(self):
+        self.count_label.setText(f"共 {self.model.total_rows()} 行")
+
+    def center_on_screen(self):
+        """居中显示在主屏幕"""
+        screen = QApplication.primaryScreen()
+        if screen:
+            geo = screen.availableGeometry()
+            self.move(geo.center().x() - self.width() // 2, geo.center().y() - self.height() // 2)
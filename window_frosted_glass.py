@@ -7,8 +7,11 @@ from PySide6.QtGui import (
     QBrush,
     QPainterPath,
     QPaintEvent,
+    QPixmap,
+    QResizeEvent,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QRectF
+import sys
 import ctypes
 from typing import Optional
 
@@ -16,6 +19,20 @@ from typing import Optional
     Windows专用毛玻璃效果窗口基类
 """
 
+# 平台能力检测（模块导入时执行一次）：非 Windows 平台没有 ctypes.windll，直接跳过亚克力特效
+ACRYLIC_SUPPORTED: bool = sys.platform == "win32" and hasattr(ctypes, "windll")
+
+
+def rounded_frame_path(rect: QRectF, border_width: float, radius: float) -> QPainterPath:
+    """按边框宽度内缩后的圆角路径（边框线条完整落在控件内）"""
+    path = QPainterPath()
+    path.addRoundedRect(
+        rect.adjusted(border_width / 2, border_width / 2, -border_width / 2, -border_width / 2),
+        radius,
+        radius
+    )
+    return path
+
 # Windows API类型定义
 class ACCENTPOLICY(ctypes.Structure):
     _fields_ = [
@@ -38,10 +55,11 @@ class FrostedGlassWidget(QWidget):
     """
 
     特性：
-    - Windows亚克力效果
+    - Windows亚克力效果（仅 Windows，其他平台自动跳过）
     - 圆角边框
     - 抗锯齿渲染
     - 可自定义样式
+    - 背景与边框预渲染为缓存位图，仅在尺寸或样式变化时重建
 
     使用方法：
     class MyWindow(FrostedGlassWidget):
@@ -64,6 +82,9 @@ class FrostedGlassWidget(QWidget):
         self._border_pen = QPen(self.BORDER_COLOR, self.BORDER_WIDTH)
         self._border_pen.setJoinStyle(Qt.RoundJoin)
 
+        # 预渲染的背景+边框位图（尺寸、缩放比例或样式变化时置空重建）
+        self._frame_cache: Optional[QPixmap] = None
+
         # 窗口属性设置
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setWindowFlags(self.windowFlags() | Qt.FramelessWindowHint)
@@ -73,6 +94,9 @@ class FrostedGlassWidget(QWidget):
 
     def _apply_windows_acrylic(self) -> None:
         """应用Windows亚克力特效"""
+        if not ACRYLIC_SUPPORTED:
+            return
+
         try:
             # 获取窗口句柄
             hwnd = ctypes.windll.user32.GetParent(self.winId())
@@ -97,42 +121,51 @@ class FrostedGlassWidget(QWidget):
         except Exception as e:
             print(f"Windows亚克力效果应用失败: {e}")
 
-    def paintEvent(self, event: QPaintEvent) -> None:
-        """绘制窗口"""
-        painter = QPainter(self)
+    def _render_frame(self) -> QPixmap:
+        """把背景与边框预渲染到位图中"""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
         painter.setRenderHints(
             QPainter.Antialiasing |
             QPainter.SmoothPixmapTransform
         )
 
         # 创建圆角路径
-        path = QPainterPath()
-        path.addRoundedRect(
-            self.rect().adjusted(
-                self.BORDER_WIDTH / 2,
-                self.BORDER_WIDTH / 2,
-                -self.BORDER_WIDTH / 2,
-                -self.BORDER_WIDTH / 2
-            ),
-            self.BORDER_RADIUS,
-            self.BORDER_RADIUS
-        )
+        path = rounded_frame_path(QRectF(self.rect()), self.BORDER_WIDTH, self.BORDER_RADIUS)
 
         # 绘制背景(亚克力效果由Windows处理，这里只绘制半透明层)
-        painter.save()
         painter.setPen(Qt.NoPen)
         painter.setBrush(self._background_brush)
         painter.drawPath(path)
-        painter.restore()
 
         # 绘制边框
-        painter.save()
         painter.setPen(self._border_pen)
         painter.setBrush(Qt.NoBrush)
         painter.drawPath(path)
-        painter.restore()
 
         painter.end()
+        return pixmap
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        """绘制窗口（直接贴缓存位图）"""
+        cache = self._frame_cache
+        if (cache is None
+                or cache.devicePixelRatio() != self.devicePixelRatioF()
+                or cache.deviceIndependentSize().toSize() != self.size()):
+            cache = self._frame_cache = self._render_frame()
+
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, cache)
+        painter.end()
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        """尺寸变化时丢弃缓存"""
+        self._frame_cache = None
+        super().resizeEvent(event)
 
     def update_style(self, **kwargs) -> None:
         """
@@ -155,4 +188,5 @@ class FrostedGlassWidget(QWidget):
         if 'radius' in kwargs:
             self.BORDER_RADIUS = kwargs['radius']
 
+        self._frame_cache = None
         self.update()
\ No newline at end of file